@@ -1,30 +1,46 @@
 # Where2Run_backend.py
 
 # 📦 Imports and API Setup
-import openrouteservice
-import folium
-import gpxpy
-import gpxpy.gpx
-import matplotlib.pyplot as plt
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
+# Heavy libraries (openrouteservice, folium, matplotlib, gpxpy) are imported where they are used, and
+# clients, caches and presets are built on first use — importing this module does no I/O.
 # from IPython.display import display -Presence of this code breaks the Streamlit app
 import numpy as np
-import pandas as pd
 import math
 import time
 import random
-from geopy.exc import GeocoderTimedOut
+import threading
+import functools
+import inspect
 import streamlit as st
 import requests
 import hashlib
 import json
 import os
+import io
+import distance_utils as du
+import tracing
+import map_render as mr
+import gpx_export
+from route import Route
+from elevation_service import ElevationService
+from dem_elevation import get_dem_provider
+from local_graph import get_route_graph
+from render_cache import RenderCache, RenderedRoute
+from elevation_analytics import analyze_elevation, centered_rolling_mean
+import environment_probe as env
+from overpass_client import OverpassClient
+from distance_controller import distance_controller_for, solve_distance
+from directions_cache import DirectionsCache
+from geocode_store import GeocodeStore
+from autocomplete import AutocompleteService, FRONTEND_DEBOUNCE_MS
+from presets import PRESET_RADIUS_MILES, get_preset_registry
+from canonical import RouteMemo, request_key, request_seed, snap_coords
+from route_library import get_route_library
+from http_client import get_http_session
 
 
 
 OVERPASS_CACHE_DIR = "cache/overpass"
-os.makedirs(OVERPASS_CACHE_DIR, exist_ok=True)
 
 OVERPASS_ENDPOINTS = [
     "https://overpass-api.de/api/interpreter",
@@ -32,63 +48,51 @@ OVERPASS_ENDPOINTS = [
     "https://z.overpass-api.de/api/interpreter"
 ]
 
+# 🛰️ Hedged client — races mirrors and tracks their health
+overpass_client = OverpassClient(OVERPASS_ENDPOINTS, session=get_http_session())
+
+def get_overpass_stats():
+    return overpass_client.stats()
+
 def _hash_query(query):
-    return hashlib.md5(query.encode('utf-8')).hexdigest()
+    # Whitespace-insensitive; environment queries are already built from canonical tile bounds
+    return hashlib.md5(" ".join(query.split()).encode('utf-8')).hexdigest()
 
+@tracing.traced("overpass")
 def run_overpass_query(query, cache_minutes=60):
     cache_key = _hash_query(query)
     cache_path = os.path.join(OVERPASS_CACHE_DIR, f"{cache_key}.json")
     if os.path.exists(cache_path) and (time.time() - os.path.getmtime(cache_path) < cache_minutes * 60):
+        tracing.incr("cache.hit")
         with open(cache_path, "r") as f:
             return json.load(f)
-    for endpoint in OVERPASS_ENDPOINTS:
-        try:
-            resp = requests.get(endpoint, params={"data": query}, timeout=30)
-            resp.raise_for_status()
-            result = resp.json()
-            with open(cache_path, "w") as f:
-                json.dump(result, f)
-            return result
-        except Exception as e:
-            print(f"Overpass API failed at {endpoint}: {e}")
-    return None
-
-def has_matching_environment(lat, lon, mode="suburban", radius=300):
-    tag_templates = {
-        "trail": [
-            'way["highway"~"path|footway|bridleway"](around:{radius},{lat},{lon});',
-            'way["surface"~"dirt|gravel|unpaved"](around:{radius},{lat},{lon});',
-            'way["leisure"="park"](around:{radius},{lat},{lon});'
-        ],
-        "suburban": ['way["highway"="residential"](around:{radius},{lat},{lon});'],
-        "urban": ['way["highway"~"primary|secondary|tertiary"](around:{radius},{lat},{lon});'],
-        "scenic": [
-            'way["leisure"="park"](around:{radius},{lat},{lon});',
-            'way["natural"~"wood|water"](around:{radius},{lat},{lon});',
-            'way["tourism"~"viewpoint"](around:{radius},{lat},{lon});'
-        ],
-        "shaded": [
-            'way["natural"="wood"](around:{radius},{lat},{lon});',
-            'way["landuse"="forest"](around:{radius},{lat},{lon});'
-        ]
-    }
-    tags = "\n".join(tag_templates.get(mode.lower(), [])).format(lat=lat, lon=lon, radius=radius)
-    query = f"[out:json][timeout:25];({tags});out center;"
-    result = run_overpass_query(query)
-    return bool(result and result.get("elements"))
+    tracing.incr("cache.miss")
+    result = overpass_client.query(query)
+    if result is not None:
+        os.makedirs(OVERPASS_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(result, f)
+    return result
+
+def has_matching_environment(lat, lon, mode="suburban", radius=300, scores=None):
+    # One combined Overpass query per tile covers all five modes (see environment_probe)
+    if scores is None:
+        scores = env.environment_scores(lat, lon, run_overpass_query, radius=radius)
+    return bool(scores and scores.get(mode.lower(), 0) > 0)
 
 def try_route_with_fallback(route_fn, *args, route_environment="Trail", **kwargs):
     lat, lon = kwargs.get("start_coords", (None, None))
-    if route_environment.lower() == "trail":
-        profile = "foot-hiking" if has_matching_environment(lat, lon, mode="trail") else "foot-walking"
-    elif route_environment.lower() == "suburban":
-        profile = "foot-walking" if has_matching_environment(lat, lon, mode="suburban") else "foot-walking"
-    elif route_environment.lower() == "urban":
-        profile = "foot-walking" if has_matching_environment(lat, lon, mode="urban") else "foot-walking"
-    elif route_environment.lower() == "scenic":
-        profile = "foot-hiking" if has_matching_environment(lat, lon, mode="scenic") else "foot-walking"
-    elif route_environment.lower() == "shaded":
-        profile = "foot-hiking" if has_matching_environment(lat, lon, mode="shaded") else "foot-walking"
+    mode = env.normalize_environment(route_environment) or ""   # "Prefer Trails" → "trail"
+    preferred_profiles = {
+        "trail": "foot-hiking",
+        "suburban": "foot-walking",
+        "urban": "foot-walking",
+        "scenic": "foot-hiking",
+        "shaded": "foot-hiking",
+    }
+    if mode in preferred_profiles:
+        scores = env.environment_scores(lat, lon, run_overpass_query)
+        profile = preferred_profiles[mode] if has_matching_environment(lat, lon, mode=mode, scores=scores) else "foot-walking"
     else:
         profile = "foot-walking"
 
@@ -99,104 +103,168 @@ def try_route_with_fallback(route_fn, *args, route_environment="Trail", **kwargs
         return route_fn(*args, profile="foot-walking", **kwargs)
 
 
-# 🔑 OpenRouteService API
-API_KEY = st.secrets["ORS_API_KEY"]
-client = openrouteservice.Client(key=API_KEY)
+# 💤 Lazily built components — secrets, clients, on-disk caches and presets are created on first use.
+# Module attributes (wr.client, wr.directions_cache, wr.bridges_route_coords, …) resolve through
+# __getattr__ below and are stored as ordinary globals once built, so assigning one (wr.client = …)
+# still swaps it out, as benchmarks and smoke scripts do.
+CACHE_PATH = "cache/geocode_cache.json"
 
-# Mapbox Token for Address Autocompletion
-MAPBOX_TOKEN = st.secrets["MAPBOX_TOKEN"]
+def _make_ors_client():
+    import openrouteservice
+    client = openrouteservice.Client(key=st.secrets["ORS_API_KEY"])
+    client._session = get_http_session()   # no session argument; share the pooled, per-host-limited one
+    return client
+
+def _make_geocode_store():
+    # SQLite store, seeded once from the legacy JSON file
+    store = GeocodeStore()
+    store.import_json(CACHE_PATH)
+    return store
+
+_component_factories = {
+    "API_KEY": lambda: st.secrets["ORS_API_KEY"],
+    "MAPBOX_TOKEN": lambda: st.secrets["MAPBOX_TOKEN"],
+    "client": _make_ors_client,
+    "directions_cache": lambda: DirectionsCache(),   # repeat legs are served from cache/directions
+    "elevation_service": lambda: ElevationService(_fetch_elevation_line, local_provider=get_dem_provider()),
+    "autocomplete_service": lambda: AutocompleteService(get_component("MAPBOX_TOKEN"), session=get_http_session()),
+    "geocode_store": _make_geocode_store,
+    "render_cache": lambda: RenderCache(),
+    "route_memo": lambda: RouteMemo(),
+    "bridges_route_coords": lambda: get_preset_route("bridges"),
+}
+_components_lock = threading.RLock()   # factories may build other components
+
+def get_component(name):
+    module_globals = globals()
+    if name in module_globals:
+        return module_globals[name]
+    with _components_lock:
+        if name not in module_globals:
+            module_globals[name] = _component_factories[name]()
+        return module_globals[name]
+
+def __getattr__(name):
+    if name in _component_factories:
+        return get_component(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_ors_client():
+    return get_component("client")
+
+# 🧭 Preset routes — packed registry with a start-point index (see presets.py)
+def get_preset_route(name):
+    return get_preset_registry().get(name)
+
+def nearby_presets(start_coords, radius_miles=PRESET_RADIUS_MILES):
+    # [(metadata, meters to the preset start)], nearest first; every preset when there is no start yet
+    registry = get_preset_registry()
+    if not start_coords:
+        return [(registry.metadata(name), None) for name in registry.names()]
+    return registry.nearby(start_coords[0], start_coords[1], radius_miles)
+
+# 🕸️ Routing backend: "auto" serves point-to-point legs from the local graph (cache/route_graph)
+# when it covers them and falls back to ORS; "ors" always calls ORS
+ROUTING_BACKEND = "auto"
+
+@tracing.traced("directions")
+def get_directions(coordinates, profile="foot-walking", format="geojson", options=None):
+    if ROUTING_BACKEND != "ors" and not options:
+        graph = get_route_graph()
+        if graph is not None:
+            local_route = graph.directions(coordinates, profile=profile, format=format)
+            if local_route is not None:
+                tracing.set_attr("backend", "local")
+                return local_route
+    tracing.set_attr("backend", "ors")
+    return get_component("directions_cache").get_or_fetch(get_ors_client(), coordinates, profile=profile, format=format, options=options)
+
+# 🔁 Exact-length loop from the local graph (None → caller falls back to ORS round_trip retries)
+@tracing.traced("local_loop")
+def generate_local_loop(origin, length_m, profile="foot-walking", seed=None):
+    if ROUTING_BACKEND == "ors" or length_m <= 0:
+        return None
+    graph = get_route_graph()
+    if graph is None:
+        return None
+    seed = random.randint(0, 10000) if seed is None else seed
+    solved = graph.round_trip(origin[0], origin[1], length_m, profile=profile, seed=seed)
+    if solved is None:
+        return None
+    latlon, meters = solved
+    print(f"🔁 Local loop of {meters / 1609.34:.2f} miles (target {length_m / 1609.34:.2f}, seed {seed})")
+    return Route(latlon)
 
-def mapbox_autocomplete(query):
-    url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{query}.json"
-    params = {
-        "access_token": MAPBOX_TOKEN,
-        "autocomplete": "true",
-        "limit": 5
-    }
-    resp = requests.get(url, params=params)
-    if resp.ok:
-        return [feature["place_name"] for feature in resp.json().get("features", [])]
-    return []
+# ⛰️ Elevation service — local DEM tiles (data/dem) when they cover the route, otherwise ORS
+# elevation_line in concurrent chunks, prefetched per leg while routing continues
+def _fetch_elevation_line(lonlat):
+    return get_ors_client().elevation_line(geometry=lonlat, format_in="polyline")["geometry"]["coordinates"]
 
-typed = st.text_input("Start typing your location")
-suggestions = mapbox_autocomplete(typed) if typed else []
-selected = st.selectbox("Choose a location", suggestions) if suggestions else None
+def get_elevation_service():
+    return get_component("elevation_service")
 
-if selected:
-    st.write("✅ Selected:", selected)
+# ⌨️ Shared autocomplete service (pooled session + prefix-aware cache), keyed by MAPBOX_TOKEN
+AUTOCOMPLETE_DEBOUNCE_MS = FRONTEND_DEBOUNCE_MS
+
+def get_autocomplete_service():
+    return get_component("autocomplete_service")
+
+def mapbox_autocomplete(query):
+    return get_autocomplete_service().search(query)
 
 def get_coords_from_place_name(place_name):
-    url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{place_name}.json"
-    params = {"access_token": st.secrets["MAPBOX_TOKEN"], "limit": 1}
-    resp = requests.get(url, params=params)
-    features = resp.json().get("features", [])
+    try:
+        features = get_autocomplete_service().fetch(place_name, limit=1, autocomplete=False)
+    except Exception as e:
+        print(f"⚠️ Mapbox geocode failed for '{place_name}': {e}")
+        return None
     if features:
         lon, lat = features[0]["center"]
         return lat, lon
     return None
 
 # ⌨️ Start Location Autocomplete
-def search_places(query):
-    url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{query}.json"
-    params = {
-        "access_token": st.secrets["MAPBOX_TOKEN"],
-        "autocomplete": "true",
-        "limit": 5
-    }
-    resp = requests.get(url, params=params)
-    results = resp.json().get("features", []) if resp.ok else []
-
+def search_places(query, channel=None):
     # ✅ Return place_name only so st_searchbox captures label
-    return [f["place_name"] for f in results]
-
+    return get_autocomplete_service().search(query, channel=channel)
 
-# 📄 Load Bridges Preset CSV
-bridges_preset = pd.read_csv("Preset Routes/bridges_preset_route.csv")
-bridges_route_coords = list(zip(bridges_preset["Latitude"], bridges_preset["Longitude"]))
 
 
 def locationiq_forward_geocode(place_name):
-    import requests
     api_key = st.secrets["LOCATIONIQ_API_KEY"]
     url = f"https://us1.locationiq.com/v1/search?key={api_key}&q={place_name}&format=json"
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
+        with tracing.span("locationiq") as span:
+            response = get_http_session().get(url, timeout=5)
+            response.raise_for_status()
+            span.incr("bytes", len(response.content))
         data = response.json()
         return [float(data[0]['lat']), float(data[0]['lon'])]
     except Exception as e:
         st.warning(f"LocationIQ error: {e}")
         return None
 
-CACHE_PATH = "cache/geocode_cache.json"
-
-def load_cache():
-    if os.path.exists(CACHE_PATH):
-        with open(CACHE_PATH, 'r') as f:
-            return json.load(f)
-    return {}
-
-def save_cache(cache):
-    with open(CACHE_PATH, 'w') as f:
-        json.dump(cache, f)
-
+# 🧠 Geocode cache — SQLite store (see _make_geocode_store)
+@tracing.traced("geocode")
 def cached_geocode(place_name, geocode_func, st_feedback=None):
-    cache = load_cache()
-    if place_name in cache:
+    coords = get_component("geocode_store").get(place_name)
+    tracing.incr("cache.hit" if coords else "cache.miss")
+    if coords:
         if st_feedback:
             st_feedback.caption(f"🧠 Cache hit: {place_name}")
-        return cache[place_name]
+        return coords
 
     coords = geocode_func(place_name)
     if coords:
         if st_feedback:
             st_feedback.caption(f"💾 Caching result for: {place_name} → {coords}")
-        cache[place_name] = coords
-        save_cache(cache)
+        get_component("geocode_store").put(place_name, coords)
     return coords
 
 
 # 🌍 OLD Geocoder using Nominatim
+# from geopy.geocoders import Nominatim
+# from geopy.exc import GeocoderTimedOut
 # def get_coordinates(address):
 #     geolocator = Nominatim(user_agent="where2run_geocoder", timeout=5)
 #     for _ in range(3):
@@ -220,13 +288,66 @@ def get_coordinates(address, st_feedback=None):
 
 # 📏 Route Distance Calculator
 def calculate_route_distance(coords):
-    total_distance = 0
-    for i in range(len(coords) - 1):
-        total_distance += geodesic(coords[i], coords[i + 1]).meters
-    return total_distance
+    if isinstance(coords, Route):
+        return coords.length_m   # memoized on the route
+    return du.route_distance(coords)
+
+
+# 📌 Shared routes — start/destination points are snapped to canonical points (canonical.py) and finished
+# routes memoized per canonical request, so users starting a few meters apart reuse each other's work.
+# lookup(**params) runs before the memo and its hits are never memoized (see _library_loop).
+def shared_route(kind, lookup=None):
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments
+            for name in ("start_coords", "dest_coords"):
+                if isinstance(params.get(name), (tuple, list)) and len(params[name]) == 2:
+                    params[name] = snap_coords(params[name])
+            if params.get("bridges_coords"):
+                params["bridges_coords"] = Route.from_coords(params["bridges_coords"])
+
+            if lookup is not None:
+                result = lookup(**params)
+                if result is not None:
+                    return result
+
+            key = request_key(kind, *params.values())
+            result, source = get_component("route_memo").get_or_compute(
+                key, lambda: fn(*bound.args, **bound.kwargs),
+                keep=lambda result: bool(result[0] if isinstance(result, tuple) else result)
+            )
+            tracing.incr(f"route_memo.{source}")
+            if source != "miss":
+                print(f"📌 Reusing {kind} route for canonical request")
+            return result
+        return wrapper
+    return decorator
+
+
+# 📚 Precomputed loops (python route_library.py) — checked before the route memo, so every request
+# rotates to the least-served stored loop; an explicit seed always generates live
+def _library_loop(start_coords, distance_miles, bridges_coords=None, profile="foot-walking", route_environment=None, seed=None, **_):
+    if seed is not None or bridges_coords or not (route_environment or profile == "foot-walking"):
+        return None
+    library = get_route_library()
+    if library is None:
+        return None
+    with tracing.span("route_library") as span:
+        route = library.find(start_coords, distance_miles * 1609.34, route_environment)
+        span.set("hit", route is not None)
+    if route is not None:
+        print(f"📚 Serving precomputed {route.length_miles:.2f} mi loop")
+    return route
 
 
-def generate_loop_route_with_preset_retry(start_coords, distance_miles, bridges_coords=None, max_attempts=8, profile="foot-walking", route_environment=None):
+@tracing.traced("route.loop")
+@shared_route("loop", lookup=_library_loop)
+def generate_loop_route_with_preset_retry(start_coords, distance_miles, bridges_coords=None, max_attempts=8, profile="foot-walking", route_environment=None, seed=None, variant=0):
     if route_environment:
         def inner(profile, **_):  # ✅ Handles dynamic profile + extra kwargs
             return generate_loop_route_with_preset_retry(
@@ -234,81 +355,96 @@ def generate_loop_route_with_preset_retry(start_coords, distance_miles, bridges_
                 distance_miles=distance_miles,
                 bridges_coords=bridges_coords,
                 max_attempts=max_attempts,
-                profile=profile
+                profile=profile,
+                seed=seed,
+                variant=variant
             )
         return try_route_with_fallback(inner, start_coords=start_coords, route_environment=route_environment)
 
 
     # Proceed with original routing logic using provided profile
+    # 📌 Seed from the canonical request: nearby users asking for the same loop send the same requests
+    if seed is None:
+        seed = request_seed("loop", start_coords, distance_miles, profile,
+                            Route.from_coords(bridges_coords).fingerprint if bridges_coords else "", variant=variant)
     original_target_meters = distance_miles * 1609.34
     allowed_range = (original_target_meters - 1207, original_target_meters + 1207)
-    reduction_factor = 0.85
-    attempt = 0
-
-    while attempt < max_attempts:
-        try:
-            route_coords = []
-            bridges_distance_m = 0
-
-            if bridges_coords:
-                print("✅ Including Bridges preset segment.")
-                bridges_distance_m = calculate_route_distance(bridges_coords)
-                print(f"🔍 Bridges segment distance: {bridges_distance_m / 1609:.2f} miles")
-
-                if start_coords != bridges_coords[0]:
-                    print("🔄 Routing to preset start...")
-                    to_bridges = client.directions(
-                        coordinates=[(start_coords[1], start_coords[0]), (bridges_coords[0][1], bridges_coords[0][0])],
-                        profile=profile, format="geojson"
-                    )
-                    to_bridges_coords = [(pt[1], pt[0]) for pt in to_bridges["features"][0]["geometry"]["coordinates"]]
-                    route_coords += to_bridges_coords
-
-                route_coords += bridges_coords
-
-            current_dist_m = calculate_route_distance(route_coords)
-            adjusted_remaining = max(0, (original_target_meters - current_dist_m) * reduction_factor)
-            print(f"🕕 Requesting round trip of ~{adjusted_remaining / 1609:.2f} miles")
-
-            origin = route_coords[-1] if route_coords else start_coords
-            num_points = max(10, min(int(adjusted_remaining / 500), 40))
-
-            round_trip = client.directions(
-                coordinates=[(origin[1], origin[0])],
-                profile=profile,
-                format="geojson",
-                options={
-                    "round_trip": {
-                        "length": adjusted_remaining,
-                        "points": num_points,
-                        "seed": random.randint(0, 10000)
-                    }
-                }
-            )
-            round_trip_coords = [(pt[1], pt[0]) for pt in round_trip["features"][0]["geometry"]["coordinates"]]
-            route_coords += round_trip_coords
-
-            total_meters = calculate_route_distance(route_coords)
-            print(f"🕕 Total final route distance: {total_meters / 1609:.2f} miles")
-
-            if allowed_range[0] <= total_meters <= allowed_range[1]:
-                print("🌟 Route distance within acceptable range.")
-                return route_coords
-            else:
-                print(f"⚠️ Distance out of range: Retrying... ({total_meters / 1609:.2f} mi)")
-                reduction_factor -= 0.05
-                attempt += 1
 
-        except Exception as e:
-            print(f"❌ Error generating loop route (Attempt {attempt + 1}):", e)
-            attempt += 1
+    # Fixed lead-in (start → preset → end of preset) is shared by every candidate
+    lead_segments = []
+    if bridges_coords:
+        bridges_coords = Route.from_coords(bridges_coords)
+        print("✅ Including Bridges preset segment.")
+        bridges_distance_m = calculate_route_distance(bridges_coords)
+        print(f"🔍 Bridges segment distance: {bridges_distance_m / 1609:.2f} miles")
+
+        if start_coords != bridges_coords[0]:
+            print("🔄 Routing to preset start...")
+            try:
+                to_bridges = get_directions(
+                    coordinates=[(start_coords[1], start_coords[0]), (bridges_coords[0][1], bridges_coords[0][0])],
+                    profile=profile, format="geojson"
+                )
+            except Exception as e:
+                print("❌ Error routing to preset start:", e)
+                return None
+            lead_segments.append(Route.from_ors_geojson(to_bridges))
+            get_elevation_service().prefetch(lead_segments[-1])
+
+        lead_segments.append(bridges_coords)
+        get_elevation_service().prefetch(bridges_coords)
+
+    lead_coords = Route.concat(lead_segments)
+    current_dist_m = calculate_route_distance(lead_coords)
+    origin = lead_coords[-1] if lead_coords else start_coords
+
+    # Local graph sizes the loop to the remaining distance in one solve
+    local_loop = generate_local_loop(origin, original_target_meters - current_dist_m, profile=profile, seed=seed)
+    if local_loop is not None:
+        local_route = Route.concat([lead_coords, local_loop])
+        if allowed_range[0] <= local_route.length_m <= allowed_range[1]:
+            return local_route
+        print(f"⚠️ Local loop of {local_route.length_miles:.2f} miles misses the target, trying ORS.")
+
+    def build_candidate(params):
+        adjusted_remaining, seed = params
+        print(f"🕕 Requesting round trip of ~{adjusted_remaining / 1609:.2f} miles (seed {seed})")
+
+        num_points = max(10, min(int(adjusted_remaining / 500), 40))
+        round_trip = get_directions(
+            coordinates=[(origin[1], origin[0])],
+            profile=profile,
+            format="geojson",
+            options={
+                "round_trip": {
+                    "length": adjusted_remaining,
+                    "points": num_points,
+                    "seed": seed
+                }
+            }
+        )
+        route_coords = Route.concat([lead_coords, Route.from_ors_geojson(round_trip)])
+        total_meters = calculate_route_distance(route_coords)
+        print(f"🕕 Candidate route distance: {total_meters / 1609:.2f} miles")
+        return route_coords, total_meters
+
+    # Requested round-trip length follows the learned requested→returned ratio
+    controller = distance_controller_for(
+        "round_trip", original_target_meters, origin, profile=profile, fixed_m=current_dist_m
+    )
+    route_coords, total_meters = solve_distance(
+        build_candidate, controller, allowed_range, max_attempts=max_attempts, seeds=random.Random(seed)
+    )
 
-    print("⚠️ Returning best-effort route despite missed margin.")
-    return route_coords if route_coords else None
+    if route_coords and not allowed_range[0] <= total_meters <= allowed_range[1]:
+        print(f"⚠️ Returning best-effort route despite missed margin. ({total_meters / 1609:.2f} mi)")
+    return route_coords
 
 
 # 🚩 Loop-with-Destination v3 — Smart Loop + Destination + Return
-def generate_loop_with_included_destination_v3(start_coords, target_miles, dest_coords, bridges_coords=None, max_attempts=8, profile="foot-walking", route_environment=None):
+@tracing.traced("route.loop_via_destination")
+@shared_route("loop_via_destination")
+def generate_loop_with_included_destination_v3(start_coords, target_miles, dest_coords, bridges_coords=None, max_attempts=8, profile="foot-walking", route_environment=None, variant=0):
     if route_environment:
         def inner(profile, **_):
             return generate_loop_with_included_destination_v3(
@@ -317,105 +453,91 @@ def generate_loop_with_included_destination_v3(start_coords, target_miles, dest_
                 dest_coords=dest_coords,
                 bridges_coords=bridges_coords,
                 max_attempts=max_attempts,
-                profile=profile
+                profile=profile,
+                variant=variant
             )
         return try_route_with_fallback(inner, start_coords=start_coords, route_environment=route_environment)
 
     # Proceed with original routing logic using provided profile
+    seed = request_seed("loop_via_destination", start_coords, dest_coords, target_miles, profile,
+                        Route.from_coords(bridges_coords).fingerprint if bridges_coords else "", variant=variant)
     target_total_meters = target_miles * 1609.34
     allowed_range = (target_total_meters - 1207, target_total_meters + 1207)
-    reduction_factor = 0.85
-    attempt = 0
 
     # Pre-calculate Destination → Start distance (for budget)
-    back_route = client.directions(
+    back_route = get_directions(
         coordinates=[(dest_coords[1], dest_coords[0]), (start_coords[1], start_coords[0])],
         profile=profile,
         format="geojson"
     )
-    back_coords = [(pt[1], pt[0]) for pt in back_route["features"][0]["geometry"]["coordinates"]]
+    back_coords = Route.from_ors_geojson(back_route)
+    get_elevation_service().prefetch(back_coords)
     back_meters = calculate_route_distance(back_coords)
 
-    best_coords = None
-    best_total_meters = float("inf")
-
-    while attempt < max_attempts:
-        try:
-            print(f"🕕 Attempt {attempt+1}: Requesting loop via destination (~{target_miles:.2f} mi budget)")
-
-            loop_budget_meters = max(target_total_meters - back_meters - 500, 500)
+    # Starting route (same for every attempt)
+    loop_coords = Route.empty()
+    origin_coords = start_coords
+    if bridges_coords:
+        print("✅ Including Bridges preset.")
+        to_bridges = get_directions(
+            coordinates=[(start_coords[1], start_coords[0]), (bridges_coords[0][1], bridges_coords[0][0])],
+            profile=profile, format="geojson"
+        )
+        loop_coords = Route.concat([Route.from_ors_geojson(to_bridges), Route.from_coords(bridges_coords)])
+        get_elevation_service().prefetch(loop_coords)
+        origin_coords = loop_coords[-1]
+    lead_meters = calculate_route_distance(loop_coords)
+
+    # Loop end → via → destination. ORS round trips close back on their origin, so this leg is the
+    # same for every candidate — route it once instead of once per attempt
+    via_point = ((origin_coords[0] + dest_coords[0]) / 2, (origin_coords[1] + dest_coords[1]) / 2)
+    to_dest_route = get_directions(
+        coordinates=[
+            (origin_coords[1], origin_coords[0]),
+            (via_point[1], via_point[0]),
+            (dest_coords[1], dest_coords[0])
+        ],
+        profile=profile, format="geojson"
+    )
+    to_dest_coords = Route.from_ors_geojson(to_dest_route)
+    get_elevation_service().prefetch(to_dest_coords)
+    to_dest_meters = calculate_route_distance(to_dest_coords)
 
-            # Starting route
-            loop_coords = []
-            if bridges_coords:
-                print("✅ Including Bridges preset.")
-                to_bridges = client.directions(
-                    coordinates=[(start_coords[1], start_coords[0]), (bridges_coords[0][1], bridges_coords[0][0])],
-                    profile=profile, format="geojson"
-                )
-                to_bridges_coords = [(pt[1], pt[0]) for pt in to_bridges["features"][0]["geometry"]["coordinates"]]
-                loop_coords += to_bridges_coords
-                loop_coords += bridges_coords
-                origin_coords = loop_coords[-1]
-            else:
-                origin_coords = start_coords
-
-            # Creative loop
-            round_trip = client.directions(
-                coordinates=[(origin_coords[1], origin_coords[0])],
-                profile=profile, format="geojson",
-                options={
-                    "round_trip": {
-                        "length": loop_budget_meters,
-                        "points": 12,
-                        "seed": random.randint(0, 10000)
-                    }
+    def build_candidate(params):
+        loop_budget_meters, seed = params
+        print(f"🕕 Requesting loop via destination (~{loop_budget_meters / 1609.34:.2f} mi loop budget, seed {seed})")
+
+        # Creative loop
+        round_trip = get_directions(
+            coordinates=[(origin_coords[1], origin_coords[0])],
+            profile=profile, format="geojson",
+            options={
+                "round_trip": {
+                    "length": loop_budget_meters,
+                    "points": 12,
+                    "seed": seed
                 }
-            )
-            loop_only_coords = [(pt[1], pt[0]) for pt in round_trip["features"][0]["geometry"]["coordinates"]]
-
-            # Midpoint to force passing through
-            mid_lat = (loop_only_coords[-1][0] + dest_coords[0]) / 2
-            mid_lon = (loop_only_coords[-1][1] + dest_coords[1]) / 2
-            via_point = (mid_lat, mid_lon)
-
-            # Route: loop → via → destination
-            to_dest_route = client.directions(
-                coordinates=[
-                    (loop_only_coords[-1][1], loop_only_coords[-1][0]),
-                    (via_point[1], via_point[0]),
-                    (dest_coords[1], dest_coords[0])
-                ],
-                profile=profile, format="geojson"
-            )
-            to_dest_coords = [(pt[1], pt[0]) for pt in to_dest_route["features"][0]["geometry"]["coordinates"]]
-            to_dest_meters = calculate_route_distance(to_dest_coords)
-
-            # Combine full route
-            full_coords = loop_coords + loop_only_coords + to_dest_coords + back_coords
-            total_meters = calculate_route_distance(full_coords)
-
-            print(f"📏 Full distance: {total_meters / 1609.34:.2f} mi")
-
-            # Distance validation
-            if allowed_range[0] <= total_meters <= allowed_range[1]:
-                print("✅ Distance within range — returning route.")
-                return full_coords
-
-            # Track best attempt
-            if abs(total_meters - target_total_meters) < abs(best_total_meters - target_total_meters):
-                best_coords = full_coords
-                best_total_meters = total_meters
-
-            reduction_factor -= 0.05
-            target_total_meters = max(target_total_meters * reduction_factor, 3200)
-            attempt += 1
-
-        except Exception as e:
-            print(f"❌ Error in attempt {attempt+1}:", e)
-            attempt += 1
+            }
+        )
+        loop_only_coords = Route.from_ors_geojson(round_trip)
+
+        # Combine full route
+        full_coords = Route.concat([loop_coords, loop_only_coords, to_dest_coords, back_coords])
+        total_meters = calculate_route_distance(full_coords)
+        print(f"📏 Full distance: {total_meters / 1609.34:.2f} mi")
+        return full_coords, total_meters
+
+    # Only the loop varies between attempts, so the budget follows the learned round-trip ratio
+    controller = distance_controller_for(
+        "round_trip", target_total_meters, origin_coords, profile=profile,
+        fixed_m=back_meters + lead_meters + to_dest_meters
+    )
+    best_coords, best_total_meters = solve_distance(
+        build_candidate, controller, allowed_range, max_attempts=max_attempts, seeds=random.Random(seed)
+    )
 
-    print("⚠️ Returning best-effort route.")
+    if best_coords and not allowed_range[0] <= best_total_meters <= allowed_range[1]:
+        print("⚠️ Returning best-effort route.")
     return best_coords if best_coords else None
 
 
@@ -509,10 +631,12 @@ def generate_loop_with_included_destination_v3(start_coords, target_miles, dest_
 #     return best_coords if best_coords else None
 
 # 🚩 Out-and-Back with Forced Directional Waypoint (Midpoint Waypoint Method)
+@tracing.traced("route.out_and_back")
+@shared_route("out_and_back")
 def generate_out_and_back_directional_route(
     start_coords, distance_miles, direction,
     max_attempts=5, profile="foot-walking",
-    route_environment=None
+    route_environment=None, variant=0
 ):
     # ✅ Early sanity check
     if isinstance(start_coords, str) or not isinstance(start_coords, (list, tuple)) or len(start_coords) != 2:
@@ -527,15 +651,16 @@ def generate_out_and_back_directional_route(
                 direction=direction,
                 max_attempts=max_attempts,
                 profile=profile,
-                route_environment=None  # prevent recursion
+                route_environment=None,  # prevent recursion
+                variant=variant
             )
         return try_route_with_fallback(inner, start_coords=start_coords, route_environment=route_environment)
 
     # ✅ Original routing logic
-    import math, time, random
+    import math, random
 
+    seed = request_seed("out_and_back", start_coords, distance_miles, direction.lower(), profile, variant=variant)
     target_total_meters = distance_miles * 1609.34
-    half_meters = target_total_meters / 2
     allowed_range = (target_total_meters - 1207, target_total_meters + 1207)
 
     heading_angles = {"n": 0, "e": 90, "s": 180, "w": 270}
@@ -544,55 +669,43 @@ def generate_out_and_back_directional_route(
         print("❌ Invalid direction — must be N/S/E/W.")
         return None
 
-    best_coords, best_total_meters = None, None
-    attempt = 0
-
-    while attempt < max_attempts:
-        try:
-            jitter_deg = random.uniform(-15, 15)
-            heading_deg = (heading_deg_base + jitter_deg) % 360
-            print(f"🔄 Attempt {attempt+1}: Forcing heading {heading_deg:.1f}°")
-
-            angle_rad = math.radians(heading_deg)
-            dx = half_meters * math.sin(angle_rad)
-            dy = half_meters * math.cos(angle_rad)
-
-            delta_lat = dy / 111320
-            delta_lon = dx / (40075000 * math.cos(math.radians(start_coords[0])) / 360)
-            midpoint = (start_coords[0] + delta_lat, start_coords[1] + delta_lon)
-
-            route = client.directions(
-                coordinates=[
-                    (start_coords[1], start_coords[0]),
-                    (midpoint[1], midpoint[0]),
-                    (start_coords[1], start_coords[0])
-                ],
-                profile=profile,
-                format="geojson"
-            )
-            coords = [(pt[1], pt[0]) for pt in route["features"][0]["geometry"]["coordinates"]]
-            total_meters = calculate_route_distance(coords)
-
-            print(f"📏 Route distance: {total_meters / 1609.34:.2f} mi")
-
-            if allowed_range[0] <= total_meters <= allowed_range[1]:
-                print("✅ Acceptable range met.")
-                return coords
-
-            if best_coords is None or abs(total_meters - target_total_meters) < abs(best_total_meters - target_total_meters if best_total_meters else float('inf')):
-                best_coords = coords
-                best_total_meters = total_meters
-
-            half_meters = max(half_meters * 0.95, 800)
-            attempt += 1
-            time.sleep(0.2)
+    def build_candidate(params):
+        candidate_half_meters, seed = params
+        heading_deg = (heading_deg_base + random.Random(seed).uniform(-15, 15)) % 360
+        print(f"🔄 Forcing heading {heading_deg:.1f}° at ~{candidate_half_meters / 1609:.2f} miles")
+
+        angle_rad = math.radians(heading_deg)
+        dx = candidate_half_meters * math.sin(angle_rad)
+        dy = candidate_half_meters * math.cos(angle_rad)
+
+        delta_lat = dy / 111320
+        delta_lon = dx / (40075000 * math.cos(math.radians(start_coords[0])) / 360)
+        midpoint = (start_coords[0] + delta_lat, start_coords[1] + delta_lon)
+
+        route = get_directions(
+            coordinates=[
+                (start_coords[1], start_coords[0]),
+                (midpoint[1], midpoint[0]),
+                (start_coords[1], start_coords[0])
+            ],
+            profile=profile,
+            format="geojson"
+        )
+        coords = Route.from_ors_geojson(route)
+        total_meters = calculate_route_distance(coords)
+        print(f"📏 Route distance: {total_meters / 1609.34:.2f} mi")
+        return coords, total_meters
 
-        except Exception as e:
-            print(f"❌ Error on attempt {attempt+1}:", e)
-            attempt += 1
+    # Midpoint offset follows the learned offset→route length ratio; each seed jitters the heading
+    controller = distance_controller_for(
+        "out_and_back", target_total_meters, start_coords, profile=profile, min_request_m=800
+    )
+    best_coords, best_total_meters = solve_distance(
+        build_candidate, controller, allowed_range, max_attempts=max_attempts, seeds=random.Random(seed)
+    )
 
-    print("⚠️ Returning best-effort fallback route.")
-    if best_coords:
+    if best_coords and not allowed_range[0] <= best_total_meters <= allowed_range[1]:
+        print("⚠️ Returning best-effort fallback route.")
         print(f"📏 Best effort distance: {best_total_meters / 1609.34:.2f} mi")
     return best_coords
 
@@ -600,14 +713,16 @@ def generate_out_and_back_directional_route(
 
 
 # 🚩 Destination Route Generator (simplified – no smart entry point)
+@tracing.traced("route.destination")
+@shared_route("destination")
 def generate_destination_route(start_coords, dest_coords, elevation_preference="Normal"):
     try:
-        route = client.directions(
+        route = get_directions(
             coordinates=[(start_coords[1], start_coords[0]), (dest_coords[1], dest_coords[0])],
             profile="foot-walking",
             format="geojson"
         )
-        coords = [(pt[1], pt[0]) for pt in route["features"][0]["geometry"]["coordinates"]]
+        coords = Route.from_ors_geojson(route)
         total_meters = calculate_route_distance(coords)
         print(f"📏 Estimated one-way distance: {total_meters / 1609:.2f} miles")
         return coords, total_meters / 1609.34
@@ -617,13 +732,15 @@ def generate_destination_route(start_coords, dest_coords, elevation_preference="
 
 
 # 🚩 Round Trip Destination Route
+@tracing.traced("route.destination_round_trip")
+@shared_route("destination_round_trip")
 def generate_destination_round_trip(start_coords, dest_coords):
     try:
-        route = client.directions(
+        route = get_directions(
             coordinates=[(start_coords[1], start_coords[0]), (dest_coords[1], dest_coords[0]), (start_coords[1], start_coords[0])],
             profile="foot-walking", format="geojson"
         )
-        coords = [(pt[1], pt[0]) for pt in route["features"][0]["geometry"]["coordinates"]]
+        coords = Route.from_ors_geojson(route)
         total_meters = calculate_route_distance(coords)
         print(f"📏 Estimated round-trip distance: {total_meters / 1609:.2f} miles")
         return coords
@@ -632,134 +749,127 @@ def generate_destination_round_trip(start_coords, dest_coords):
         return None
 
 # 🚩 Improved Destination Extension Route with Retry + Margin + Detailed Distance Print
-def generate_extended_destination_route(start_coords, dest_coords, target_miles, max_attempts=5):
+@tracing.traced("route.extended_destination")
+@shared_route("extended_destination")
+def generate_extended_destination_route(start_coords, dest_coords, target_miles, max_attempts=5, variant=0):
+    seed = request_seed("extended_destination", start_coords, dest_coords, target_miles, variant=variant)
     target_total_meters = target_miles * 1609.34
     allowed_range = (target_total_meters - 1207, target_total_meters + 1207)
-    attempt = 0
-    reduction_factor = 0.85  # same starting factor as loop routes
 
     # Calculate one-way distance first
-    to_dest_route = client.directions(
+    to_dest_route = get_directions(
         coordinates=[(start_coords[1], start_coords[0]), (dest_coords[1], dest_coords[0])],
         profile="foot-walking",
         format="geojson"
     )
-    to_dest_coords = [(pt[1], pt[0]) for pt in to_dest_route["features"][0]["geometry"]["coordinates"]]
+    to_dest_coords = Route.from_ors_geojson(to_dest_route)
+    get_elevation_service().prefetch(to_dest_coords)
     to_dest_meters = calculate_route_distance(to_dest_coords)
 
     loop_length_meters = max((target_total_meters - to_dest_meters), 500)
 
-    best_coords = None
-    best_total_meters = 0
-
-    while attempt < max_attempts:
-        try:
-            print(f"🔄 Attempt {attempt+1}: Generating loop of ~{loop_length_meters / 1609:.2f} miles at start, then to destination.")
-
-            # Generate loop first
-            round_trip = client.directions(
-                coordinates=[(start_coords[1], start_coords[0])],
-                profile="foot-walking",
-                format="geojson",
-                options={
-                    "round_trip": {
-                        "length": loop_length_meters,
-                        "points": 20,
-                        "seed": random.randint(0, 10000)
-                    }
-                }
-            )
-            loop_coords = [(pt[1], pt[0]) for pt in round_trip["features"][0]["geometry"]["coordinates"]]
-
-            # Combine full route
-            full_coords = loop_coords + to_dest_coords
-            total_meters = calculate_route_distance(full_coords)
-            total_miles = total_meters / 1609.34
+    local_loop = generate_local_loop(start_coords, loop_length_meters, seed=seed)
+    if local_loop is not None:
+        local_route = Route.concat([local_loop, to_dest_coords])
+        if allowed_range[0] <= local_route.length_m <= allowed_range[1]:
+            return local_route
+        print(f"⚠️ Local loop of {local_route.length_miles:.2f} miles misses the target, trying ORS.")
 
-            print(f"📏 Total extended loop segment distance: {calculate_route_distance(loop_coords)/1609.34:.2f} miles")
-            print(f"📏 To-destination segment distance: {to_dest_meters/1609.34:.2f} miles")
-            print(f"📏 Total route distance: {total_miles:.2f} miles")
+    def build_candidate(params):
+        candidate_loop_meters, seed = params
+        print(f"🔄 Generating loop of ~{candidate_loop_meters / 1609:.2f} miles at start, then to destination.")
 
-            # Check if within margin
-            if allowed_range[0] <= total_meters <= allowed_range[1]:
-                print("🌟 Extended route distance within acceptable range.")
-                return full_coords
+        # Generate loop first
+        round_trip = get_directions(
+            coordinates=[(start_coords[1], start_coords[0])],
+            profile="foot-walking",
+            format="geojson",
+            options={
+                "round_trip": {
+                    "length": candidate_loop_meters,
+                    "points": 20,
+                    "seed": seed
+                }
+            }
+        )
+        loop_coords = Route.from_ors_geojson(round_trip)
 
-            # Save best attempt so far
-            if best_coords is None or abs(total_meters - target_total_meters) < abs(best_total_meters - target_total_meters):
-                best_coords = full_coords
-                best_total_meters = total_meters
+        # Combine full route
+        full_coords = Route.concat([loop_coords, to_dest_coords])
+        total_meters = calculate_route_distance(full_coords)
 
-            # Adjust for next attempt
-            reduction_factor -= 0.05
-            loop_length_meters = max(loop_length_meters * reduction_factor, 500)
-            attempt += 1
+        print(f"📏 Total extended loop segment distance: {calculate_route_distance(loop_coords)/1609.34:.2f} miles")
+        print(f"📏 To-destination segment distance: {to_dest_meters/1609.34:.2f} miles")
+        print(f"📏 Total route distance: {total_meters / 1609.34:.2f} miles")
+        return full_coords, total_meters
 
-        except Exception as e:
-            print("❌ Error generating extended destination route:", e)
-            attempt += 1
+    controller = distance_controller_for(
+        "round_trip", target_total_meters, start_coords, fixed_m=to_dest_meters
+    )
+    best_coords, best_total_meters = solve_distance(
+        build_candidate, controller, allowed_range, max_attempts=max_attempts, seeds=random.Random(seed)
+    )
 
-    print("⚠️ Returning best-effort extended route despite missed margin.")
+    if best_coords and not allowed_range[0] <= best_total_meters <= allowed_range[1]:
+        print("⚠️ Returning best-effort extended route despite missed margin.")
     return best_coords if best_coords else None
 
 
 
 # ⬆️ Elevation Data Fetcher
+@tracing.traced("elevation")
 def get_elevation_for_coords(coords):
-    try:
-        if not coords:
-            return None
-        ors_coords = [(lon, lat) for lat, lon in coords]
-        elevation_data = client.elevation_line(geometry=ors_coords, format_in="polyline")
-        return elevation_data
-    except Exception as e:
-        print("❌ Elevation fetch error:", e)
+    # Route with .elevation (meters) filled in; legs prefetched while routing are stitched, not refetched
+    if not coords:
         return None
+    return get_elevation_service().elevation_for(coords)
 
 # ⬆️⬇️ Ascent & Descent Calculator (returns feet)
 def calculate_ascent_descent(elevation_data):
-    if not elevation_data or "geometry" not in elevation_data:
+    profile = analyze_elevation(elevation_data)
+    if profile is None:
         return 0, 0
-    elevations = [pt[2] for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    ascent = sum(max(0, elevations[i + 1] - elevations[i]) for i in range(len(elevations) - 1))
-    descent = sum(max(0, elevations[i] - elevations[i + 1]) for i in range(len(elevations) - 1))
-    ascent_ft = ascent * 3.28084
-    descent_ft = descent * 3.28084
-    return ascent_ft, descent_ft
+    return profile.ascent_ft, profile.descent_ft
 
 # 🔍 Elevation-Colored Route Map + Legend
-def plot_route_with_elevation(coords, elevation_data):
+# render_mode="compact" merges simplified segments into one layer per color bucket;
+# "segments" keeps the old one-PolyLine-per-segment output.
+def plot_route_with_elevation(coords, elevation_data, render_mode="compact"):
     if not coords or not elevation_data:
         return None
 
-    elevations = [pt[2] for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
+    coords = Route.from_coords(coords)
+    elevations = analyze_elevation(elevation_data).elevation_ft
     min_elev, max_elev = min(elevations), max(elevations)
     color_scale = np.interp(elevations, [min_elev, max_elev], [0, 1])
+    if len(color_scale) != len(coords):
+        # Elevation samples don't line up with the route — stretch them along it
+        color_scale = np.interp(np.linspace(0, 1, len(coords)), np.linspace(0, 1, len(color_scale)), color_scale)
 
     def get_color(val):
         return f"#{int(255 * (1 - val)):02X}{int(255 * val):02X}AA"
 
+    import folium
     m = folium.Map(location=coords[0], zoom_start=13)
 
-    for i in range(len(coords) - 1):
-        folium.PolyLine([coords[i], coords[i + 1]],
-                        color=get_color(color_scale[i]), weight=5).add_to(m)
+    if render_mode == "segments":
+        points = coords.tolist()
+        for i in range(len(points) - 1):
+            folium.PolyLine([points[i], points[i + 1]],
+                            color=get_color(color_scale[i]), weight=5).add_to(m)
+    else:
+        for bucket, lines in mr.bucketed_polylines(coords.latlon, color_scale).items():
+            folium.PolyLine(lines, color=get_color(mr.bucket_value(bucket)), weight=5).add_to(m)
 
     # Mile markers
-    total_dist = 0
-    mile = 1
-    for i in range(1, len(coords)):
-        seg_dist = geodesic(coords[i - 1], coords[i]).miles
-        total_dist += seg_dist
-        if total_dist >= mile:
-            folium.Marker(
-                coords[i],
-                icon=folium.DivIcon(html=f"""
-                    <div style=\"background:blue;color:white;border-radius:50%;width:30px;height:30px;
-                    display:flex;align-items:center;justify-content:center;font-weight:bold;\">
-                    {mile}</div>""")
-            ).add_to(m)
-            mile += 1
+    for mile, i in enumerate(du.mile_marker_indices(coords.cumulative_m), start=1):
+        folium.Marker(
+            coords[i],
+            icon=folium.DivIcon(html=f"""
+                <div style=\"background:blue;color:white;border-radius:50%;width:30px;height:30px;
+                display:flex;align-items:center;justify-content:center;font-weight:bold;\">
+                {mile}</div>""")
+        ).add_to(m)
 
     folium.Marker(coords[0], popup="Start", icon=folium.Icon(color="green")).add_to(m)
     folium.Marker(coords[-1], popup="End", icon=folium.Icon(color="red")).add_to(m)
@@ -785,14 +895,11 @@ def plot_route_with_elevation(coords, elevation_data):
 
 # 📈 Elevation Area Chart (returns fig)
 def plot_elevation_area_chart(elevation_data):
-    elevations = [pt[2] for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    elevations_ft = [e * 3.28084 for e in elevations]
-
-    segment_distances = [0]
-    coords = [(pt[1], pt[0]) for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    for i in range(1, len(coords)):
-        segment_distances.append(segment_distances[-1] + geodesic(coords[i - 1], coords[i]).miles)
+    profile = analyze_elevation(elevation_data)
+    elevations_ft = profile.elevation_ft
+    segment_distances = profile.distance_mi
 
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.fill_between(segment_distances, elevations_ft, color='lightblue', alpha=0.7)
     ax.plot(segment_distances, elevations_ft, color='blue', linewidth=2)
@@ -805,17 +912,11 @@ def plot_elevation_area_chart(elevation_data):
 
 # 📈 Cumulative Elevation Gain Plot (returns fig)
 def plot_cumulative_elevation_gain(elevation_data):
-    elevations = [pt[2] * 3.28084 for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    cumulative_gain = [0]
-    for i in range(1, len(elevations)):
-        delta = elevations[i] - elevations[i - 1]
-        cumulative_gain.append(cumulative_gain[-1] + max(0, delta))
-
-    segment_distances = [0]
-    coords = [(pt[1], pt[0]) for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    for i in range(1, len(coords)):
-        segment_distances.append(segment_distances[-1] + geodesic(coords[i - 1], coords[i]).miles)
+    profile = analyze_elevation(elevation_data)
+    cumulative_gain = profile.cumulative_gain_ft
+    segment_distances = profile.distance_mi
 
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.plot(segment_distances, cumulative_gain, color='green', linewidth=2)
     ax.set_title("Cumulative Elevation Gain (ft)")
@@ -827,21 +928,15 @@ def plot_cumulative_elevation_gain(elevation_data):
 
 # 📈 Moving Average Grade % Plot (returns fig)
 def plot_moving_average_grade(elevation_data, window_size=5):
-    elevations = [pt[2] for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    segment_distances = [0]
-    coords = [(pt[1], pt[0]) for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
-    for i in range(1, len(coords)):
-        segment_distances.append(segment_distances[-1] + geodesic(coords[i - 1], coords[i]).miles)
-
-    grade_percent = []
-    for i in range(1, len(elevations)):
-        delta_elev_ft = (elevations[i] - elevations[i - 1]) * 3.28084
-        delta_dist_mi = segment_distances[i] - segment_distances[i - 1]
-        grade = (delta_elev_ft / (delta_dist_mi * 5280)) * 100 if delta_dist_mi > 0 else 0
-        grade_percent.append(grade)
+    profile = analyze_elevation(elevation_data, window_size=window_size)
+    segment_distances = profile.distance_mi
 
-    grade_percent_smoothed = pd.Series(grade_percent).rolling(window=window_size, min_periods=1, center=True).mean()
+    if profile.window_size == window_size:
+        grade_percent_smoothed = profile.grade_pct_smoothed
+    else:
+        grade_percent_smoothed = centered_rolling_mean(profile.grade_pct, window_size)
 
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.plot(segment_distances[1:], grade_percent_smoothed, color='purple', linewidth=2)
     ax.set_title(f"Moving Average Grade (window = {window_size})")
@@ -852,9 +947,10 @@ def plot_moving_average_grade(elevation_data, window_size=5):
     return fig
 
 # 🏃‍♂️ Run Summary Printer (Streamlit safe)
-def print_run_summary(route_coords, elevation_data, st):
+def format_run_summary(route_coords, elevation_data):
     true_miles = calculate_route_distance(route_coords) / 1609.34
-    ascent, descent = calculate_ascent_descent(elevation_data)
+    profile = analyze_elevation(elevation_data)
+    ascent, descent = (profile.ascent_ft, profile.descent_ft) if profile else (0, 0)
     net_change = ascent - descent
     net_change_abs = abs(net_change)
 
@@ -865,25 +961,88 @@ def print_run_summary(route_coords, elevation_data, st):
     ⬇️ **Descent:** {descent:.0f} ft  
     ↕️ **Net Elevation Change:** {net_change_abs:.0f} ft
     """
+    metrics = {"miles": true_miles, "ascent_ft": ascent, "descent_ft": descent, "net_change_ft": net_change}
+    return metrics, summary
+
+def print_run_summary(route_coords, elevation_data, st):
+    _, summary = format_run_summary(route_coords, elevation_data)
     st.markdown(summary)
 
-# 📁 GPX Export
-def save_route_as_gpx(coords, filename="running_route.gpx"):
-    if not coords:
-        print("❌ No route coordinates to save.")
-        return
+# 📁 GPX Export (fast=True writes the XML directly; fast=False builds gpxpy objects)
+@tracing.traced("gpx")
+def route_to_gpx_bytes(coords, fast=True, start_time=None):
+    if fast:
+        gpx_bytes = gpx_export.route_to_gpx_bytes(coords, start_time=start_time)
+        tracing.incr("bytes", len(gpx_bytes))
+        return gpx_bytes
 
+    import gpxpy.gpx
+    route = Route.from_coords(coords)
     gpx = gpxpy.gpx.GPX()
     gpx_track = gpxpy.gpx.GPXTrack()
     gpx.tracks.append(gpx_track)
     gpx_segment = gpxpy.gpx.GPXTrackSegment()
     gpx_track.segments.append(gpx_segment)
 
-    for lat, lon in coords:
-        gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon))
+    elevations = route.elevation.tolist() if route.elevation is not None else [None] * len(route)
+    for (lat, lon), ele in zip(route, elevations):
+        gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon, elevation=ele))
+
+    return gpx.to_xml().encode("utf-8")
+
+def save_route_as_gpx(coords, filename="running_route.gpx"):
+    if not coords:
+        print("❌ No route coordinates to save.")
+        return
 
-    with open(filename, "w") as f:
-        f.write(gpx.to_xml())
+    with open(filename, "wb") as f:
+        for chunk in gpx_export.iter_gpx_bytes(coords):
+            f.write(chunk)
 
     print(f"✅ GPX route saved as: {filename}")
 
+# 🖼️ Memoized Render Pipeline — elevation, map, charts, summary and GPX once per distinct route
+def _figure_png(fig):
+    import matplotlib.pyplot as plt
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+@tracing.traced("render")
+def render_route(route_coords):
+    route = Route.from_coords(route_coords)
+
+    def render():
+        print("🖼️ Rendering route (render cache miss)")
+        tracing.incr("cache.miss")
+        elevation_data = get_elevation_for_coords(route)
+        profile = analyze_elevation(elevation_data)
+
+        map_html, charts = None, {}
+        if profile:
+            with tracing.span("render.map") as span:
+                map_html = plot_route_with_elevation(route, profile).get_root().render()
+                span.incr("bytes", len(map_html))
+            with tracing.span("render.charts") as span:
+                charts = {
+                    "elevation_profile": _figure_png(plot_elevation_area_chart(profile)),
+                    "cumulative_gain": _figure_png(plot_cumulative_elevation_gain(profile)),
+                    "moving_average_grade": _figure_png(plot_moving_average_grade(profile)),
+                }
+                span.incr("bytes", sum(len(png) for png in charts.values()))
+
+        summary, summary_markdown = format_run_summary(route, profile)
+        map_height = min(800, 400 + int(route.length_miles * 20))
+        return RenderedRoute(
+            key=route.fingerprint,
+            map_html=map_html,
+            map_height=map_height,
+            summary=summary,
+            summary_markdown=summary_markdown,
+            charts=charts,
+            # Elevation-bearing geometry when we have it, so the GPX carries <ele>
+            gpx_bytes=route_to_gpx_bytes(profile.route if profile else route),
+        )
+
+    return get_component("render_cache").get_or_render(route.fingerprint, render)
@@ -0,0 +1,89 @@
+# async_backend.py
+# ⚡ asyncio shim over Where2Run_backend. This is thread offload, not an async pipeline: each call runs
+# the regular synchronous backend on a bounded worker pool and the event loop awaits the result, so
+# an async web service can call the backend without blocking its loop. It does not add concurrency
+# beyond ROUTE_WORKERS threads per process — requests past that queue on the event loop.
+#
+#     import asyncio, async_backend as ab
+#     routes = await asyncio.gather(*(ab.generate_loop(start, miles) for start, miles in requests))
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+import Where2Run_backend as wr
+from http_client import HOST_LIMITS, ORS_HOST
+
+# Every ORS call goes through the pooled session in http_client.py, whose per-host slots are blocking
+# semaphores held for exactly the duration of the HTTP request. Route generation is ORS-bound, so the
+# pool matches the ORS limit: more workers would only park threads waiting for an ORS slot.
+ROUTE_WORKERS = HOST_LIMITS[ORS_HOST]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ROUTE_WORKERS, thread_name_prefix="where2run-async")
+    return _executor
+
+
+async def _run(fn, *args, **kwargs):
+    # The caller's span carries over, so worker spans nest under the request that awaited them
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), tracing.bind(functools.partial(fn, *args, **kwargs)))
+
+
+# 🏃 Route generators — same arguments and results as their Where2Run_backend counterparts
+async def generate_loop(start_coords, distance_miles, **kwargs):
+    return await _run(wr.generate_loop_route_with_preset_retry, start_coords, distance_miles, **kwargs)
+
+
+async def generate_loop_with_destination(start_coords, target_miles, dest_coords, **kwargs):
+    return await _run(wr.generate_loop_with_included_destination_v3, start_coords, target_miles, dest_coords, **kwargs)
+
+
+async def generate_out_and_back(start_coords, distance_miles, direction, **kwargs):
+    return await _run(wr.generate_out_and_back_directional_route, start_coords, distance_miles, direction, **kwargs)
+
+
+async def generate_destination(start_coords, dest_coords, **kwargs):
+    return await _run(wr.generate_destination_route, start_coords, dest_coords, **kwargs)
+
+
+async def generate_destination_round_trip(start_coords, dest_coords):
+    return await _run(wr.generate_destination_round_trip, start_coords, dest_coords)
+
+
+async def generate_extended_destination(start_coords, dest_coords, target_miles, **kwargs):
+    return await _run(wr.generate_extended_destination_route, start_coords, dest_coords, target_miles, **kwargs)
+
+
+# ⛰️ Elevation, 🔎 geocoding and rendering
+async def get_elevation(coords):
+    return await _run(wr.get_elevation_for_coords, coords)
+
+
+async def geocode(address):
+    return await _run(wr.get_coordinates, address)
+
+
+async def search_places(query, channel=None):
+    return await _run(wr.search_places, query, channel=channel)
+
+
+async def render_route(route_coords):
+    return await _run(wr.render_route, route_coords)
+
+
+def shutdown(wait=True):
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
@@ -0,0 +1,137 @@
+# autocomplete.py
+# ⌨️ Mapbox autocomplete service — pooled session, prefix-aware cache, debounce + stale-query cancellation
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from http_client import get_http_session
+
+MAPBOX_PLACES_URL = "https://api.mapbox.com/geocoding/v5/mapbox.places/{query}.json"
+MIN_QUERY_LENGTH = 3
+RESULT_LIMIT = 5
+REQUEST_TIMEOUT_S = 4
+CACHE_SIZE = 2048
+CACHE_TTL_S = 6 * 60 * 60
+MAX_CHANNELS = 4096           # one per searchbox per browser session; oldest are forgotten
+SERVER_DEBOUNCE_MS = 0        # st_searchbox already debounces in the browser
+FRONTEND_DEBOUNCE_MS = 250    # passed to st_searchbox(debounce=...)
+
+
+def normalize_query(query):
+    return " ".join(str(query).split()).lower()
+
+
+def _matches(place_name, query_tokens):
+    # Every typed token must prefix some word in the suggestion ("moreh" → "Morehead")
+    words = place_name.lower().replace(",", " ").split()
+    return all(any(word.startswith(token) for word in words) for token in query_tokens)
+
+
+class AutocompleteService:
+    def __init__(self, token, min_query_length=MIN_QUERY_LENGTH, limit=RESULT_LIMIT,
+                 debounce_ms=SERVER_DEBOUNCE_MS, timeout=REQUEST_TIMEOUT_S,
+                 cache_size=CACHE_SIZE, cache_ttl_s=CACHE_TTL_S, session=None):
+        self.token = token
+        self.min_query_length = min_query_length
+        self.limit = limit
+        self.debounce_ms = debounce_ms
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache_ttl_s = cache_ttl_s
+
+        self.session = session or get_http_session()   # pooled, per-host limited (http_client.py)
+        self._cache = OrderedDict()     # normalized query -> (stored_at, [place_name, ...])
+        self._generations = OrderedDict()   # channel -> latest query generation
+        self._lock = threading.Lock()
+
+    # 🧠 Result cache
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if not entry:
+                return None
+            if time.time() - entry[0] > self.cache_ttl_s:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _cache_put(self, key, results):
+        with self._lock:
+            self._cache[key] = (time.time(), results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _from_prefix(self, key):
+        # Reuse the longest cached prefix when its suggestions still hold for the longer query:
+        # either it was exhaustive (< limit results) or every suggestion still matches.
+        tokens = key.split()
+        for end in range(len(key) - 1, self.min_query_length - 1, -1):
+            prefix_results = self._cache_get(key[:end])
+            if prefix_results is None:
+                continue
+            narrowed = [name for name in prefix_results if _matches(name, tokens)]
+            if len(prefix_results) < self.limit or len(narrowed) == len(prefix_results):
+                return narrowed
+            return None
+        return None
+
+    # ⏱️ Stale-query tracking — a newer query on the same channel supersedes older ones
+    def _begin(self, channel):
+        if channel is None:
+            return None
+        with self._lock:
+            generation = self._generations.get(channel, 0) + 1
+            self._generations[channel] = generation
+            self._generations.move_to_end(channel)
+            while len(self._generations) > MAX_CHANNELS:
+                self._generations.popitem(last=False)
+            return generation
+
+    def _is_stale(self, channel, generation):
+        if channel is None:
+            return False
+        with self._lock:
+            return self._generations.get(channel) != generation
+
+    # 🌐 Network
+    def fetch(self, query, limit=None, autocomplete=True):
+        url = MAPBOX_PLACES_URL.format(query=quote(query, safe=""))
+        params = {"access_token": self.token, "limit": limit or self.limit}
+        if autocomplete:
+            params["autocomplete"] = "true"
+        resp = self.session.get(url, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json().get("features", [])
+
+    def search(self, query, channel=None):
+        key = normalize_query(query or "")
+        if len(key) < self.min_query_length:
+            return []
+
+        cached = self._cache_get(key)
+        if cached is None:
+            cached = self._from_prefix(key)
+            if cached is not None:
+                self._cache_put(key, cached)
+        if cached is not None:
+            return cached
+
+        generation = self._begin(channel)
+        if self.debounce_ms:
+            time.sleep(self.debounce_ms / 1000)
+            if self._is_stale(channel, generation):
+                return []
+
+        try:
+            results = [feature["place_name"] for feature in self.fetch(query)]
+        except Exception as e:
+            print(f"⚠️ Mapbox autocomplete failed for '{query}': {e}")
+            return []
+
+        self._cache_put(key, results)
+        # Still cached above, but an outdated answer is not shown
+        return [] if self._is_stale(channel, generation) else results
@@ -0,0 +1,111 @@
+# benchmarks/bench_async.py
+# ⚡ Concurrent route requests — the same batch of loop requests served one after another through the
+# sync backend and all at once through async_backend.py. Upstreams are synthetic (benchmarks/replay.py)
+# with a fixed per-request latency, so the numbers show waiting on APIs, not CPU.
+#
+#     python benchmarks/bench_async.py
+#     python benchmarks/bench_async.py --requests 64 --latency-ms 120
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offline_suite import ORS_HOST, REPLAY_SECRETS, _reset_state, scratch_dir
+from replay import FixtureStore, ReplayAdapter, SyntheticUpstream, install
+
+DEFAULT_REQUESTS = 32
+DEFAULT_LATENCY_MS = 80
+CENTER = (35.2271, -80.8431)
+
+
+class SlowUpstream(SyntheticUpstream):
+    def __init__(self, latency_ms):
+        self.latency_s = latency_ms / 1000
+
+    def respond(self, request):
+        time.sleep(self.latency_s)
+        return super().respond(request)
+
+
+def _requests(n, seed):
+    # Distinct starts ~1 km apart so nothing is shared between requests
+    rng = random.Random(seed)
+    return [((CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05)), rng.choice((3, 4, 5, 6)))
+            for _ in range(n)]
+
+
+def run(wr, mode, batch, latency_ms, workdir):
+    import async_backend as ab
+    from http_client import LimitedSession
+    _reset_state(wr, workdir)
+    session = LimitedSession()
+    wr.get_ors_client()._session = session
+
+    store = FixtureStore(os.path.join(workdir, "synthetic.jsonl.gz"))   # in memory only, never saved
+    adapter = ReplayAdapter(store, mode="synthetic", upstream=SlowUpstream(latency_ms))
+    uninstall = install(adapter)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            if mode == "sync":
+                routes = [wr.generate_loop_route_with_preset_retry(start, miles) for start, miles in batch]
+            else:
+                async def serve():
+                    return await asyncio.gather(*(ab.generate_loop(start, miles) for start, miles in batch))
+                routes = asyncio.run(serve())
+            elapsed = time.perf_counter() - started
+        wr.get_elevation_service().close()
+    finally:
+        uninstall()
+    return {
+        "seconds": elapsed,
+        "routes": sum(1 for route in routes if route),
+        "ors_calls": adapter.calls.get(ORS_HOST, 0),
+        "peak_in_flight": session.stats().get(ORS_HOST, {}).get("peak", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential sync vs concurrent async loop requests.")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="synthetic upstream latency")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import streamlit as st
+    st.secrets = REPLAY_SECRETS
+    import Where2Run_backend as wr
+    import async_backend as ab
+    from http_client import HOST_LIMITS
+
+    with scratch_dir("where2run-async-") as workdir:
+        batch = _requests(args.requests, args.seed)
+        print(f"{args.requests} loop requests, {args.latency_ms:.0f} ms upstream latency, "
+              f"{ab.ROUTE_WORKERS} route workers, ORS limit {HOST_LIMITS[ORS_HOST]} in flight\n")
+        print(f"{'mode':<6} | {'wall s':>7} | {'req/s':>6} | {'routes':>6} | {'ORS calls':>9} | {'peak ORS in flight':>18}")
+        results = {}
+        for mode in ("sync", "async"):
+            r = results[mode] = run(wr, mode, batch, args.latency_ms, workdir)
+            print(f"{mode:<6} | {r['seconds']:>7.2f} | {args.requests / r['seconds']:>6.1f} | {r['routes']:>6} | "
+                  f"{r['ors_calls']:>9} | {r['peak_in_flight']:>18}")
+        ab.shutdown()
+        # Concurrent requests learn distance priors in a different order, so routes may differ —
+        # every request must still get one, without going over the ORS limit
+        ok = (results["async"]["routes"] == results["sync"]["routes"]
+              and results["async"]["peak_in_flight"] <= HOST_LIMITS[ORS_HOST])
+        print(f"\n{'✅' if ok else '❌'} async served {results['async']['routes']}/{args.requests} routes "
+              f"within the ORS limit")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
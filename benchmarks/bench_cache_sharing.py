@@ -0,0 +1,120 @@
+# benchmarks/bench_cache_sharing.py
+# 📌 Cache sharing across nearby users — simulated users start within a few dozen meters of popular
+# spots (parks, gyms, run clubs) and ask for the usual routes; compares raw coordinates against
+# canonical snapping (canonical.py), served one by one and 8 at a time. Upstreams are synthetic
+# (benchmarks/replay.py), no network. With snapping, sharing happens in the route memo — a shared
+# route never reaches the directions cache — so the directions hit rate stays near zero.
+#
+#     python benchmarks/bench_cache_sharing.py
+#     python benchmarks/bench_cache_sharing.py --users 200 --jitter-m 40
+
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import io
+import math
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offline_suite import ORS_HOST, REPLAY_SECRETS, _reset_state, scratch_dir
+from replay import FixtureStore, ReplayAdapter, SyntheticUpstream, install
+
+HOTSPOTS = {
+    "Freedom Park": (35.1935, -80.8436),
+    "Romare Bearden Park": (35.2262, -80.8469),
+    "Dowd YMCA": (35.2138, -80.8337),
+    "NoDa run club": (35.2467, -80.8056),
+}
+DESTINATION = (35.2271, -80.8431)   # Uptown
+DEFAULT_USERS = 80
+DEFAULT_JITTER_M = 25
+CONCURRENT_USERS = 8
+
+
+def _requests(wr, users, jitter_m, seed):
+    rng = random.Random(seed)
+    for _ in range(users):
+        lat, lon = rng.choice(list(HOTSPOTS.values()))
+        angle, radius = rng.uniform(0, 2 * math.pi), jitter_m * rng.random() ** 0.5
+        start = (lat + radius * math.cos(angle) / 111320,
+                 lon + radius * math.sin(angle) / (111320 * math.cos(math.radians(lat))))
+        kind = rng.choice(["loop3", "loop5", "out_and_back", "destination"])
+        if kind == "loop3":
+            yield kind, lambda s=start: wr.generate_loop_route_with_preset_retry(s, 3)
+        elif kind == "loop5":
+            yield kind, lambda s=start: wr.generate_loop_route_with_preset_retry(s, 5)
+        elif kind == "out_and_back":
+            yield kind, lambda s=start: wr.generate_out_and_back_directional_route(s, 4, "n")
+        else:
+            yield kind, lambda s=start: wr.generate_destination_route(s, DESTINATION)[0]
+
+
+def run(wr, snap_m, users, jitter_m, seed, workdir, concurrency=1):
+    import canonical
+    canonical.SNAP_GRID_METERS = snap_m
+    _reset_state(wr, workdir)
+    random.seed(seed)
+
+    store = FixtureStore(os.path.join(workdir, "synthetic.jsonl.gz"))   # in memory only, never saved
+    adapter = ReplayAdapter(store, mode="synthetic", upstream=SyntheticUpstream())
+    uninstall = install(adapter)
+    def serve(generate):
+        route = generate()
+        if route:
+            wr.get_elevation_for_coords(route)
+        return route
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            generators = [generate for _, generate in _requests(wr, users, jitter_m, seed)]
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                routes = list(pool.map(serve, generators))
+        wr.get_elevation_service().close()
+    finally:
+        uninstall()
+
+    cache, memo = wr.directions_cache, wr.route_memo
+    fingerprints = [route.fingerprint for route in routes if route]
+    lookups = cache.hits + cache.misses
+    shared = memo.hits + memo.waits   # waits joined a generation already in flight
+    return {
+        "ors_calls": adapter.calls.get(ORS_HOST, 0),
+        "directions_hit_rate": cache.hits / lookups if lookups else 0.0,
+        "route_hit_rate": shared / (shared + memo.misses) if shared + memo.misses else 0.0,
+        "distinct_routes": len(set(fingerprints)),
+        "routes": len(fingerprints),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache sharing across nearby users, raw vs snapped coordinates.")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--jitter-m", type=float, default=DEFAULT_JITTER_M, help="max distance from the hotspot")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import streamlit as st
+    st.secrets = REPLAY_SECRETS
+    import canonical
+    import Where2Run_backend as wr
+
+    with scratch_dir("where2run-sharing-") as workdir:
+        print(f"{args.users} users within {args.jitter_m:.0f} m of {len(HOTSPOTS)} hotspots\n")
+        print(f"{'coordinates':<18} | {'at once':>7} | {'ORS calls':>9} | {'per user':>8} | {'route hit rate':>14} | "
+              f"{'directions hit rate':>19} | {'renders needed':>14}")
+        snapped = f"snapped {canonical.SNAP_GRID_METERS} m"
+        for label, snap_m in (("raw", 0), (snapped, canonical.SNAP_GRID_METERS)):
+            for concurrency in (1, CONCURRENT_USERS):
+                r = run(wr, snap_m, args.users, args.jitter_m, args.seed, workdir, concurrency)
+                print(f"{label:<18} | {concurrency:>7} | {r['ors_calls']:>9} | {r['ors_calls'] / args.users:>8.2f} | "
+                      f"{r['route_hit_rate']:>14.1%} | {r['directions_hit_rate']:>19.1%} | "
+                      f"{r['distinct_routes']:>7}/{r['routes']:<6}")
+
+
+if __name__ == "__main__":
+    main()
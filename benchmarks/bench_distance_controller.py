@@ -0,0 +1,135 @@
+# benchmarks/bench_distance_controller.py
+# 🎯 Attempts per route: fixed reduction_factor schedule vs the adaptive distance controller,
+# then latency vs ORS quota for the controller's wave sizes (sequential rounds × ORS latency)
+#
+#     python benchmarks/bench_distance_controller.py
+#
+# Routing is simulated: a round trip requested at L meters comes back at L × true_ratio × noise,
+# where noise is lognormal (ORS seeds make lengths jitter) — no network calls.
+
+import contextlib
+import io
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_controller import (DEFAULT_RATIOS, RETRY_WAVE_SIZE, SINGLE_GUESS_ROUNDS, DistanceController,
+                                 DistancePriors, region_key, solve_distance)
+
+ROUTES_PER_SCENARIO = 500
+MAX_ATTEMPTS = 8
+TOLERANCE_M = 1207
+NOISE_SIGMA = 0.08
+ORS_LATENCY_MS = 800            # typical round_trip response time
+WAVE_SETTINGS = {               # label -> (single-guess rounds, retry wave size)
+    "1 (sequential)": (MAX_ATTEMPTS, 1),
+    "1→2": (1, 2),
+    f"1×{SINGLE_GUESS_ROUNDS}→{RETRY_WAVE_SIZE} (default)": (SINGLE_GUESS_ROUNDS, RETRY_WAVE_SIZE),
+    "1×2→3": (2, 3),
+    "3": (0, 3),
+}
+
+
+def simulated_router(true_ratio, fixed_m, rng):
+    def build_candidate(params):
+        requested, _ = params
+        return [(0.0, 0.0)], fixed_m + requested * true_ratio * rng.lognormal(0, NOISE_SIGMA)
+    return build_candidate
+
+
+def fixed_schedule(build_candidate, target_m, fixed_m, allowed_range):
+    # The old loop: request (target - fixed) × 0.85, 0.80, 0.75, … until one lands in range
+    for attempt in range(MAX_ATTEMPTS):
+        requested = max((target_m - fixed_m) * (0.85 - 0.05 * attempt), 0)
+        _, meters = build_candidate((requested, attempt))
+        if allowed_range[0] <= meters <= allowed_range[1]:
+            return attempt + 1, True
+    return MAX_ATTEMPTS, False
+
+
+class CountingController(DistanceController):
+    # Each next_requests() call is one wave — one sequential ORS round trip of latency. Every request
+    # in a wave is sent (real calls are in flight before the first one answers), so all count as quota.
+    rounds = 0
+    requests_sent = 0
+
+    def next_requests(self, n, spread=0.04):
+        self.rounds += 1
+        self.requests_sent += n
+        return super().next_requests(n, spread)
+
+
+def adaptive(build_candidate, target_m, fixed_m, allowed_range, priors, waves=(SINGLE_GUESS_ROUNDS, RETRY_WAVE_SIZE)):
+    key = region_key("round_trip", "foot-walking", 35.22, -80.84)
+    prior = (priors.get(key) if priors else None) or DEFAULT_RATIOS["round_trip"]
+    controller = CountingController(target_m, fixed_m=fixed_m, prior_ratio=prior, priors=priors, prior_key=key)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, meters = solve_distance(build_candidate, controller, allowed_range, max_attempts=MAX_ATTEMPTS,
+                                   single_guess_rounds=waves[0], retry_wave_size=waves[1], seeds=random.Random(0))
+    return controller.requests_sent, allowed_range[0] <= meters <= allowed_range[1], controller.rounds
+
+
+def run(true_ratio, strategy, seed=11):
+    rng = np.random.default_rng(seed)
+    priors = DistancePriors(path=None) if strategy == "adaptive+priors" else None
+    attempts, hits = [], 0
+    for _ in range(ROUTES_PER_SCENARIO):
+        target_m = rng.uniform(3, 15) * 1609.34
+        fixed_m = rng.choice([0.0, rng.uniform(0.5, 2.5) * 1609.34])
+        allowed_range = (target_m - TOLERANCE_M, target_m + TOLERANCE_M)
+        build_candidate = simulated_router(true_ratio, fixed_m, rng)
+        if strategy == "fixed":
+            n, hit = fixed_schedule(build_candidate, target_m, fixed_m, allowed_range)
+        else:
+            n, hit, _ = adaptive(build_candidate, target_m, fixed_m, allowed_range, priors)
+        attempts.append(n)
+        hits += hit
+    return float(np.mean(attempts)), hits / ROUTES_PER_SCENARIO
+
+
+def run_waves(true_ratio, waves, seed=11):
+    # ORS calls, rounds (≈ latency) and worst case per route with learned priors
+    rng = np.random.default_rng(seed)
+    priors = DistancePriors(path=None)
+    calls, rounds = [], []
+    for _ in range(ROUTES_PER_SCENARIO):
+        target_m = rng.uniform(3, 15) * 1609.34
+        fixed_m = rng.choice([0.0, rng.uniform(0.5, 2.5) * 1609.34])
+        allowed_range = (target_m - TOLERANCE_M, target_m + TOLERANCE_M)
+        # Length noise keyed by seed, so every wave size sees the same candidate for the same seed
+        route_seed = int(rng.integers(1 << 30))
+
+        def build_candidate(params):
+            noise = np.random.default_rng((route_seed, params[1])).lognormal(0, NOISE_SIGMA)
+            return [(0.0, 0.0)], fixed_m + params[0] * true_ratio * noise
+
+        n_calls, _, n_rounds = adaptive(build_candidate, target_m, fixed_m, allowed_range, priors, waves)
+        calls.append(n_calls)
+        rounds.append(n_rounds)
+    return float(np.mean(calls)), float(np.mean(rounds)), int(max(rounds))
+
+
+def main():
+    print(f"{ROUTES_PER_SCENARIO} routes per row, ±{TOLERANCE_M} m window, {NOISE_SIGMA:.0%} length noise\n")
+    print(f"{'true ratio':>10} | {'strategy':<16} | {'ORS calls/route':>15} | {'hit rate':>8}")
+    for true_ratio in (1.0, 1.18, 1.35, 1.6):
+        for strategy in ("fixed", "adaptive", "adaptive+priors"):
+            mean_attempts, hit_rate = run(true_ratio, strategy)
+            print(f"{true_ratio:>10.2f} | {strategy:<16} | {mean_attempts:>15.2f} | {hit_rate:>8.1%}")
+
+    print(f"\nWave size: latency vs quota (adaptive+priors, {ORS_LATENCY_MS} ms per ORS round trip)\n")
+    print(f"{'true ratio':>10} | {'wave sizes':<16} | {'ORS calls/route':>15} | {'rounds/route':>12} | "
+          f"{'mean latency':>12} | {'worst latency':>13}")
+    for true_ratio in (1.0, 1.6):
+        for label, waves in WAVE_SETTINGS.items():
+            calls, rounds, worst = run_waves(true_ratio, waves)
+            print(f"{true_ratio:>10.2f} | {label:<16} | {calls:>15.2f} | {rounds:>12.2f} | "
+                  f"{rounds * ORS_LATENCY_MS / 1000:>11.2f}s | {worst * ORS_LATENCY_MS / 1000:>12.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_import.py
+# ⏱️ Cold import budget for Where2Run_backend — every Streamlit worker and benchmark pays it
+#
+#     python benchmarks/bench_import.py
+#     python benchmarks/bench_import.py --repeat 10 --budget-ms 300
+#
+# Each run is a fresh interpreter started in an empty working directory: streamlit is imported
+# first (the app has it loaded already), then the backend is timed on its own. Fails when the
+# median goes over budget, when a deferred heavy library gets imported, or when the import
+# writes anything to disk.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 400
+DEFAULT_REPEAT = 5
+# Only needed once a route is generated or rendered
+DEFERRED_MODULES = ("openrouteservice", "folium", "matplotlib", "gpxpy", "geopy", "pandas")
+
+PROBE = """
+import json, sys, time
+import streamlit
+started = time.perf_counter()
+import Where2Run_backend
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({"ms": elapsed_ms, "modules": sorted(m for m in sys.modules if "." not in m)}))
+"""
+
+
+def run_once():
+    with tempfile.TemporaryDirectory(prefix="where2run-import-") as workdir:
+        env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=workdir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        created = sorted(os.listdir(workdir))
+    result = json.loads(out.strip().splitlines()[-1])
+    result["created"] = created
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of Where2Run_backend.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    times = [run["ms"] for run in runs]
+    loaded = sorted({m for run in runs for m in run["modules"] if m in DEFERRED_MODULES})
+    created = sorted({path for run in runs for path in run["created"]})
+
+    median = statistics.median(times)
+    print(f"⏱️ import Where2Run_backend: median {median:.0f} ms, min {min(times):.0f} ms, "
+          f"max {max(times):.0f} ms over {len(times)} runs (budget {args.budget_ms:.0f} ms)")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"deferred modules imported eagerly: {', '.join(loaded)}")
+    if created:
+        failures.append(f"import created files: {', '.join(created)}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Within budget, no heavy imports, no files written.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+# benchmarks/bench_map_render.py
+# 🗺️ Rendered map payload size + render time: per-segment PolyLines vs compact bucketed layers
+#
+#     python benchmarks/bench_map_render.py
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Where2Run_backend as wr
+from route import Route
+
+
+def synthetic_route(miles=10.0, points=3000, seed=7):
+    # Deterministic wandering route starting in uptown Charlotte, with rolling elevation
+    rng = np.random.default_rng(seed)
+    step_m = miles * 1609.34 / points
+    heading = np.cumsum(rng.normal(0, 0.15, points))
+    lat = 35.2271 + np.cumsum(np.cos(heading) * step_m / 111320)
+    lon = -80.8431 + np.cumsum(np.sin(heading) * step_m / (111320 * np.cos(np.radians(35.2271))))
+    elevation = 220 + 25 * np.sin(np.linspace(0, 6 * np.pi, points)) + rng.normal(0, 0.5, points)
+    return Route(np.column_stack([lat, lon]), elevation)
+
+
+def main():
+    for miles, points in [(3.0, 1000), (10.0, 3000), (26.2, 8000)]:
+        route = synthetic_route(miles, points)
+        results = {}
+        for mode in ("segments", "compact"):
+            started = time.perf_counter()
+            html = wr.plot_route_with_elevation(route, route, render_mode=mode).get_root().render()
+            results[mode] = (len(html.encode("utf-8")), time.perf_counter() - started)
+
+        seg_bytes, seg_s = results["segments"]
+        cmp_bytes, cmp_s = results["compact"]
+        print(f"{miles:>5.1f} mi / {points:>5} pts | segments {seg_bytes / 1024:>8.1f} KiB {seg_s * 1000:>7.0f} ms"
+              f" | compact {cmp_bytes / 1024:>7.1f} KiB {cmp_s * 1000:>6.0f} ms"
+              f" | {seg_bytes / cmp_bytes:>5.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_route_library.py
+# 📚 Precomputed route library — fills a temporary library for a few popular starts, then serves
+# simulated loop requests (users near those starts, common distances) with and without it.
+# Upstreams are synthetic (benchmarks/replay.py), no network.
+#
+#     python benchmarks/bench_route_library.py
+#     python benchmarks/bench_route_library.py --users 200 --k 2
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_cache_sharing import HOTSPOTS
+from offline_suite import ORS_HOST, REPLAY_SECRETS, _reset_state, scratch_dir
+from replay import FixtureStore, ReplayAdapter, SyntheticUpstream, install
+
+MILES = (3, 4, 5, 6)
+ENVIRONMENTS = (None, "trail")
+DEFAULT_USERS = 80
+DEFAULT_JITTER_M = 25
+
+
+def _requests(users, jitter_m, seed):
+    rng = random.Random(seed)
+    for _ in range(users):
+        lat, lon = rng.choice(list(HOTSPOTS.values()))
+        angle, radius = rng.uniform(0, 2 * math.pi), jitter_m * rng.random() ** 0.5
+        start = (lat + radius * math.cos(angle) / 111320,
+                 lon + radius * math.sin(angle) / (111320 * math.cos(math.radians(lat))))
+        yield start, rng.choice(MILES), rng.choice(ENVIRONMENTS)
+
+
+@contextlib.contextmanager
+def _synthetic(workdir):
+    store = FixtureStore(os.path.join(workdir, "synthetic.jsonl.gz"))   # in memory only, never saved
+    adapter = ReplayAdapter(store, mode="synthetic", upstream=SyntheticUpstream())
+    uninstall = install(adapter)
+    try:
+        yield adapter
+    finally:
+        uninstall()
+
+
+def build(wr, library, k, workdir):
+    import route_library
+    _reset_state(wr, workdir)
+
+    def generate(start, miles, environment, seed):
+        return wr.generate_loop_route_with_preset_retry(start, miles, route_environment=environment, seed=seed)
+
+    started = time.perf_counter()
+    with _synthetic(workdir) as adapter, contextlib.redirect_stdout(io.StringIO()):
+        for start in HOTSPOTS.values():
+            route_library.fill(library, generate, wr.get_elevation_for_coords, start, MILES, ENVIRONMENTS, k)
+        wr.get_elevation_service().close()
+    return time.perf_counter() - started, adapter.calls.get(ORS_HOST, 0)
+
+
+def serve(wr, library, users, jitter_m, seed, workdir):
+    import route_library
+    _reset_state(wr, workdir)
+    route_library._library = library   # None → live generation only
+    random.seed(seed)
+
+    latencies, fingerprints = [], []
+    with _synthetic(workdir) as adapter, contextlib.redirect_stdout(io.StringIO()):
+        for start, miles, environment in _requests(users, jitter_m, seed):
+            started = time.perf_counter()
+            route = wr.generate_loop_route_with_preset_retry(start, miles, route_environment=environment)
+            if route:
+                wr.get_elevation_for_coords(route)
+                fingerprints.append(route.fingerprint)
+            latencies.append((time.perf_counter() - started) * 1000)
+        wr.get_elevation_service().close()
+    route_library._library = None
+    return {
+        "ors_calls": adapter.calls.get(ORS_HOST, 0),
+        "p50_ms": statistics.median(latencies),
+        "p90_ms": statistics.quantiles(latencies, n=10)[-1],
+        "distinct_routes": len(set(fingerprints)),
+        "routes": len(fingerprints),
+    }
+
+
+def main():
+    import route_library
+    parser = argparse.ArgumentParser(description="Loop requests served from a precomputed library vs live.")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--jitter-m", type=float, default=DEFAULT_JITTER_M, help="max distance from the hotspot")
+    parser.add_argument("--k", type=int, default=route_library.CANDIDATES_PER_KEY, help="loops per key")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    import streamlit as st
+    st.secrets = REPLAY_SECRETS
+    import Where2Run_backend as wr
+
+    with scratch_dir("where2run-library-") as workdir, scratch_dir("where2run-library-db-") as library_dir:
+        library = route_library.RouteLibrary(os.path.join(library_dir, "route_library.sqlite3"))   # _reset_state wipes workdir
+        seconds, calls = build(wr, library, args.k, workdir)
+        stats = library.stats()
+        print(f"📚 Filled {stats['routes']} loops over {stats['keys']} keys in {seconds:.1f} s ({calls} ORS calls)\n")
+
+        print(f"{'serving':<10} | {'ORS calls':>9} | {'per user':>8} | {'p50 ms':>7} | {'p90 ms':>7} | "
+              f"{'library hit rate':>16} | {'distinct loops':>14}")
+        for label, lib in (("live", None), ("library", library)):
+            library.hits = library.misses = 0
+            r = serve(wr, lib, args.users, args.jitter_m, args.seed, workdir)
+            lookups = library.hits + library.misses
+            hit_rate = library.hits / lookups if lookups else 0.0
+            print(f"{label:<10} | {r['ors_calls']:>9} | {r['ors_calls'] / args.users:>8.2f} | {r['p50_ms']:>7.1f} | "
+                  f"{r['p90_ms']:>7.1f} | {hit_rate:>16.1%} | {r['distinct_routes']:>7}/{r['routes']:<6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# benchmarks/offline_suite.py
+# 🧪 Offline benchmark suite — replays recorded ORS / Overpass / Mapbox / LocationIQ responses
+# through benchmarks/replay.py, so every scenario runs with fixed seeds and no API keys or network.
+#
+#     python benchmarks/offline_suite.py                      # replay + compare with the baseline
+#     python benchmarks/offline_suite.py --save-baseline      # accept the current numbers
+#     python benchmarks/offline_suite.py --record live        # re-record fixtures (real keys needed)
+#     python benchmarks/offline_suite.py --record synthetic   # re-seed fixtures from fake upstreams
+#     python benchmarks/offline_suite.py --scenario loop --repeat 10
+#
+# Reports p50/p90/max latency, ORS and total HTTP calls, CPU time and peak traced memory per scenario.
+# Call counts must be identical on every run and never exceed the baseline. Timings are compared after
+# scaling the baseline by a CPU calibration run, so a slower or busier machine doesn't read as a regression.
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from replay import FixtureStore, ReplayAdapter, SyntheticUpstream, install
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines", "offline_suite.json")
+CACHE_DIR = os.path.join(ROOT, "cache")
+DEFAULT_REPEAT = 5
+ORS_HOST = "api.openrouteservice.org"
+
+# Regression thresholds against the saved baseline
+LATENCY_TOLERANCE = 1.5         # ×baseline (scaled to this machine's speed), plus LATENCY_SLACK_MS
+LATENCY_SLACK_MS = 15
+MEMORY_TOLERANCE = 1.25
+
+START = (35.2271, -80.8431)     # Uptown Charlotte
+DEST = (35.2012, -80.8443)      # Freedom Park
+REPLAY_SECRETS = {
+    "ORS_API_KEY": "replay",
+    "MAPBOX_TOKEN": "replay",
+    "LOCATIONIQ_API_KEY": "replay",
+}
+
+
+def _scenarios(wr):
+    return {
+        "loop": lambda: wr.generate_loop_route_with_preset_retry(START, 6, seed=101),
+        "loop_preset": lambda: wr.generate_loop_route_with_preset_retry(
+            START, 8, bridges_coords=wr.bridges_route_coords, seed=102),
+        "loop_trail": lambda: wr.generate_loop_route_with_preset_retry(
+            START, 5, route_environment="trail", seed=103),
+        "out_and_back": lambda: wr.generate_out_and_back_directional_route(START, 6, "n"),
+        "loop_with_destination": lambda: wr.generate_loop_with_included_destination_v3(START, 7, DEST),
+        "destination": lambda: wr.generate_destination_route(START, DEST),
+        "destination_round_trip": lambda: wr.generate_destination_round_trip(START, DEST),
+        "extended_destination": lambda: wr.generate_extended_destination_route(START, DEST, 6),
+        "elevation": lambda: wr.get_elevation_for_coords(wr.bridges_route_coords),
+        "render": lambda: wr.render_route(wr.bridges_route_coords),
+        "geocode": lambda: (wr.search_places("400 E Morehead"), wr.get_coordinates("400 E Morehead St, Charlotte, NC")),
+    }
+
+
+@contextlib.contextmanager
+def scratch_dir(prefix="where2run-bench-"):
+    # Temp workdir for _reset_state's caches. Benchmarks must never write to the repo's cache/,
+    # so anything that shows up there during the run is an error.
+    before = _repo_cache_files()
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield workdir
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    leaked = sorted(_repo_cache_files() - before)
+    if leaked:
+        raise RuntimeError(f"❌ Benchmark wrote to {CACHE_DIR}: {', '.join(leaked[:5])}")
+
+
+def _repo_cache_files():
+    return {os.path.relpath(os.path.join(d, f), ROOT) for d, _, files in os.walk(CACHE_DIR) for f in files}
+
+
+def _reset_state(wr, workdir):
+    # Cold caches for every run so each repetition issues the same requests
+    import distance_controller
+    import environment_index
+    import environment_probe
+    import local_graph
+    import route_library
+    from autocomplete import AutocompleteService
+    from canonical import RouteMemo
+    from directions_cache import DirectionsCache
+    from elevation_service import ElevationService
+    from geocode_store import GeocodeStore
+    from overpass_client import OverpassClient
+    from render_cache import RenderCache
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(os.path.join(workdir, "overpass"))
+    wr.directions_cache = DirectionsCache(cache_dir=None)
+    wr.elevation_service = ElevationService(wr._fetch_elevation_line)
+    wr.render_cache = RenderCache()
+    wr.route_memo = RouteMemo()
+    route_library._library, route_library._library_loaded = None, True   # live generation only
+    wr.geocode_store = GeocodeStore(db_path=os.path.join(workdir, "geocode.sqlite3"))
+    wr.OVERPASS_CACHE_DIR = os.path.join(workdir, "overpass")
+    wr.overpass_client = OverpassClient(wr.OVERPASS_ENDPOINTS)
+    wr.autocomplete_service = AutocompleteService(wr.MAPBOX_TOKEN)
+    environment_probe.ENVIRONMENT_CACHE_DIR = os.path.join(workdir, "environment")
+    environment_probe._memory_cache.clear()
+    environment_index._index, environment_index._index_loaded = None, True
+    distance_controller._priors = distance_controller.DistancePriors(path=None)
+    local_graph._graph, local_graph._graph_loaded = None, True
+
+
+def calibrate(runs=7):
+    # Fixed NumPy + pure-Python workload; the fastest of several runs is this machine's speed
+    import numpy as np
+    timings = []
+    for _ in range(runs):
+        started = time.process_time()
+        rng = np.random.default_rng(0)
+        points = rng.uniform(-1, 1, size=(200_000, 2))
+        np.sqrt(np.sin(points[:, 0]) ** 2 + np.cos(points[:, 1]) ** 2).sum()
+        json.dumps([{"i": i, "v": [i * 0.5] * 8} for i in range(20_000)])
+        sum(i * i for i in range(300_000))
+        timings.append((time.process_time() - started) * 1000)
+    return round(min(timings), 2)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run_once(wr, fn, adapter, seed, workdir, name):
+    _reset_state(wr, workdir)
+    random.seed(seed)
+    adapter.calls.clear()
+    try:
+        fn()
+    except Exception as e:
+        print(f"❌ {name} raised: {e}")
+    wr.elevation_service.close()   # wait for prefetches so their calls land in this run
+
+
+def run_scenario(wr, name, fn, adapter, repeat, seed, workdir):
+    misses_before = sum(adapter.misses.values())
+
+    # Warm-up (lazy imports, first-call costs), then one run under tracemalloc for peak memory —
+    # kept apart from the timed runs because tracing allocations slows everything down
+    _run_once(wr, fn, adapter, seed, workdir, name)
+    tracemalloc.start()
+    _run_once(wr, fn, adapter, seed, workdir, name)
+    peak_mib = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+
+    walls, cpus, ors_calls, http_calls = [], [], [], []
+    for _ in range(repeat):
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        _run_once(wr, fn, adapter, seed, workdir, name)
+        walls.append((time.perf_counter() - started) * 1000)
+        cpus.append((time.process_time() - cpu_started) * 1000)
+        ors_calls.append(adapter.calls.get(ORS_HOST, 0))
+        http_calls.append(sum(adapter.calls.values()))
+
+    return {
+        "p50_ms": round(_percentile(walls, 50), 1),
+        "p90_ms": round(_percentile(walls, 90), 1),
+        "max_ms": round(max(walls), 1),
+        "cpu_ms": round(statistics.mean(cpus), 1),
+        "peak_mib": round(peak_mib, 2),
+        "ors_calls": max(ors_calls),
+        "http_calls": max(http_calls),
+        "call_counts_vary": len(set(ors_calls)) > 1 or len(set(http_calls)) > 1,
+        "fixture_misses": sum(adapter.misses.values()) - misses_before,
+    }
+
+
+def compare(results, baseline):
+    regressions = []
+    print(f"\n{'scenario':<24} {'p50 ms':>16} {'cpu ms':>16} {'peak MiB':>16} {'ORS calls':>14}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<24} {current['p50_ms']:>16} {current['cpu_ms']:>16} {current['peak_mib']:>16} "
+                  f"{current['ors_calls']:>14}   (no baseline)")
+            continue
+
+        def cell(metric):
+            old, new = base[metric], current[metric]
+            delta = (new - old) / old * 100 if old else 0.0
+            return f"{new:g} ({delta:+.0f}%)"
+
+        print(f"{name:<24} {cell('p50_ms'):>16} {cell('cpu_ms'):>16} {cell('peak_mib'):>16} {cell('ors_calls'):>14}")
+        # > 1 when this machine is slower now than when the baseline was saved
+        speed = current["calibration_ms"] / base.get("calibration_ms", current["calibration_ms"])
+        if current["p50_ms"] > base["p50_ms"] * speed * LATENCY_TOLERANCE + LATENCY_SLACK_MS:
+            regressions.append(f"{name}: p50 {base['p50_ms']} → {current['p50_ms']} ms (machine speed ×{speed:.2f})")
+        if current["cpu_ms"] > base["cpu_ms"] * speed * LATENCY_TOLERANCE + LATENCY_SLACK_MS:
+            regressions.append(f"{name}: CPU {base['cpu_ms']} → {current['cpu_ms']} ms (machine speed ×{speed:.2f})")
+        if current["peak_mib"] > base["peak_mib"] * MEMORY_TOLERANCE + 1:
+            regressions.append(f"{name}: peak memory {base['peak_mib']} → {current['peak_mib']} MiB")
+        if current["ors_calls"] > base["ors_calls"]:
+            regressions.append(f"{name}: ORS calls {base['ors_calls']} → {current['ors_calls']}")
+        if current["http_calls"] > base["http_calls"]:
+            regressions.append(f"{name}: HTTP calls {base['http_calls']} → {current['http_calls']}")
+    for name, current in results.items():
+        if current["call_counts_vary"]:
+            regressions.append(f"{name}: call counts differ between runs — make the scenario deterministic")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Where2Run benchmark suite (recorded HTTP fixtures).")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per scenario")
+    parser.add_argument("--seed", type=int, default=2024, help="random seed applied before every run")
+    parser.add_argument("--record", choices=("live", "synthetic"), help="record fixtures instead of replaying")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_PATH}")
+    parser.add_argument("--no-fail", action="store_true", help="exit 0 even when regressions are found")
+    args = parser.parse_args()
+
+    if args.record != "live":
+        import streamlit as st
+        st.secrets = REPLAY_SECRETS   # replayed requests never reach a real API
+
+    import Where2Run_backend as wr
+
+    scenarios = _scenarios(wr)
+    selected = args.scenario or list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)} — choose from {', '.join(scenarios)}")
+
+    results = {}
+    calibration_ms = calibrate()
+    print(f"🧮 CPU calibration: {calibration_ms} ms")
+    with scratch_dir() as workdir:
+        for name in selected:
+            store = FixtureStore(os.path.join(FIXTURE_DIR, f"{name}.jsonl.gz"))
+            mode = args.record or "replay"
+            adapter = ReplayAdapter(store, mode=mode, upstream=SyntheticUpstream() if mode == "synthetic" else None)
+            uninstall = install(adapter)
+            try:
+                if args.record:
+                    store.entries.clear()
+                    _run_once(wr, scenarios[name], adapter, args.seed, workdir, name)
+                    store.save()
+                    print(f"📼 Recorded {len(store.entries)} responses for {name}")
+                    continue
+                results[name] = run_scenario(wr, name, scenarios[name], adapter, args.repeat, args.seed, workdir)
+            finally:
+                uninstall()
+            r = results[name]
+            print(f"⏱️ {name:<24} p50 {r['p50_ms']:>8.1f} ms  p90 {r['p90_ms']:>8.1f} ms  cpu {r['cpu_ms']:>8.1f} ms  "
+                  f"peak {r['peak_mib']:>6.2f} MiB  ORS {r['ors_calls']:>5g}  HTTP {r['http_calls']:>5g}"
+                  + (f"  ⚠️ {r['fixture_misses']} fixture misses" if r["fixture_misses"] else ""))
+
+    if args.record:
+        return 0
+
+    # Slowest of the calibrations around the runs — catches load that starts mid-suite
+    calibration_ms = max(calibration_ms, calibrate())
+    for r in results.values():
+        r["calibration_ms"] = calibration_ms
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r") as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        varying = [name for name, r in results.items() if r["call_counts_vary"]]
+        if varying:
+            print(f"\n❌ Not saving: call counts differ between runs for {', '.join(varying)}")
+            return 1
+        baseline.update(results)
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\n✅ Baseline saved → {BASELINE_PATH}")
+        return 0
+
+    regressions = compare(results, baseline)
+    if regressions:
+        print("\n❌ Regressions against baseline:")
+        for line in regressions:
+            print(f"   {line}")
+        return 0 if args.no_fail else 1
+    print("\n✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# benchmarks/replay.py
+# 📼 Record/replay HTTP transport for offline benchmarks — every requests.Session (ORS client,
+# Overpass, Mapbox, LocationIQ) is routed through one adapter that serves recorded responses.
+#
+# Modes:
+#   replay     serve fixtures; unknown requests fail with 599 and are counted as misses
+#   live       forward to the real APIs (needs real keys in st.secrets) and record the responses
+#   synthetic  answer from SyntheticUpstream (deterministic fake APIs) and record — used to seed
+#              the fixtures checked into benchmarks/fixtures when no API keys are at hand
+
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+from collections import Counter
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SECRET_PARAMS = {"key", "api_key", "access_token"}
+
+
+def request_key(method, url, body):
+    # Method + host/path + non-secret query params + canonical JSON body
+    parts = urlsplit(url)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if k not in SECRET_PARAMS))
+    if body:
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+    digest = hashlib.sha1((body or "").encode("utf-8")).hexdigest()[:16]
+    return f"{method} {parts.netloc}{unquote(parts.path)}?{query}#{digest}"
+
+
+class FixtureStore:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, status, content_type, body):
+        with self._lock:
+            self.entries[key] = {"key": key, "status": status, "content_type": content_type, "body": body}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for key in sorted(self.entries):
+                f.write(json.dumps(self.entries[key], separators=(",", ":")) + "\n")
+
+
+class ReplayAdapter(HTTPAdapter):
+    def __init__(self, store, mode="replay", upstream=None):
+        super().__init__()
+        self.store = store
+        self.mode = mode
+        self.upstream = upstream
+        self.calls = Counter()       # host -> request count
+        self.misses = Counter()      # key -> count of replay misses
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def _response(self, request, status, content_type, body):
+        response = requests.Response()
+        response.status_code = status
+        response._content = body.encode("utf-8")
+        response.headers["Content-Type"] = content_type
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "OK" if status < 400 else "Replay"
+        return response
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        with self._lock:
+            self.calls[urlsplit(request.url).netloc] += 1
+
+        if self.mode == "replay":
+            entry = self.store.get(key)
+            if entry is None:
+                with self._lock:
+                    self.misses[key] += 1
+                return self._response(request, 599, "text/plain", f"No fixture for {key}")
+            status, content_type, body = entry["status"], entry["content_type"], entry["body"]
+        elif self.mode == "synthetic":
+            status, body = self.upstream.respond(request)
+            content_type = "application/json"
+            self.store.put(key, status, content_type, body)
+        else:
+            live = super().send(request, **kwargs)
+            status, content_type, body = live.status_code, live.headers.get("Content-Type", ""), live.text
+            self.store.put(key, status, content_type, body)
+
+        with self._lock:
+            self.bytes += len(body)
+        return self._response(request, status, content_type, body)
+
+
+def install(adapter):
+    # Every Session — including the throwaway ones behind requests.get — resolves to the adapter
+    original = requests.Session.get_adapter
+    requests.Session.get_adapter = lambda session, url: adapter
+    return lambda: setattr(requests.Session, "get_adapter", original)
+
+
+# 🧪 Deterministic stand-ins for the upstream APIs (seeded from the request itself)
+class SyntheticUpstream:
+    ROUND_TRIP_RATIO = 1.15      # ORS round trips come back a bit longer than requested
+    DETOUR_FACTOR = 1.25         # street distance over straight-line distance
+    SPACING_M = 25
+
+    def respond(self, request):
+        parts = urlsplit(request.url)
+        body = json.loads(request.body) if request.body else {}
+        seed = int(request_key(request.method, request.url, request.body).rsplit("#", 1)[1], 16)
+        rng = random.Random(seed)
+        if parts.netloc == "api.openrouteservice.org" and "/directions/" in parts.path:
+            return 200, json.dumps(self._directions(body, rng))
+        if parts.netloc == "api.openrouteservice.org" and parts.path.endswith("/elevation/line"):
+            return 200, json.dumps(self._elevation(body))
+        if "overpass" in parts.netloc:
+            return 200, json.dumps(self._overpass(rng))
+        if parts.netloc == "api.mapbox.com":
+            return 200, json.dumps(self._mapbox(unquote(parts.path.rsplit("/", 1)[1][:-5]), rng))
+        if "locationiq" in parts.netloc:
+            return 200, json.dumps([{"lat": f"{35.2 + rng.uniform(-0.05, 0.05):.6f}",
+                                     "lon": f"{-80.84 + rng.uniform(-0.05, 0.05):.6f}"}])
+        return 404, json.dumps({"error": f"no synthetic upstream for {parts.netloc}{parts.path}"})
+
+    @staticmethod
+    def _meters(lonlat):
+        total = 0.0
+        for (lon1, lat1), (lon2, lat2) in zip(lonlat, lonlat[1:]):
+            dy = (lat2 - lat1) * 111320
+            dx = (lon2 - lon1) * 111320 * math.cos(math.radians(lat1))
+            total += math.hypot(dx, dy)
+        return total
+
+    def _directions(self, body, rng):
+        coordinates = body["coordinates"]
+        round_trip = (body.get("options") or {}).get("round_trip")
+        if round_trip:
+            lon0, lat0 = coordinates[0]
+            target = round_trip["length"] * self.ROUND_TRIP_RATIO * rng.lognormvariate(0, 0.08)
+            n = max(int(target / self.SPACING_M), 12)
+            phase = rng.uniform(0, 2 * math.pi)
+            wobble = [rng.uniform(0.05, 0.2) for _ in range(3)]
+            shape = []
+            for k in range(n + 1):
+                t = 2 * math.pi * k / n
+                r = 1 + sum(w * math.sin((i + 2) * t + phase) for i, w in enumerate(wobble))
+                shape.append((r * math.sin(t + phase), r * math.cos(t + phase)))
+            shape = [(x - shape[0][0], y - shape[0][1]) for x, y in shape]   # loop starts and ends at the origin
+            scale_m = target / max(sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(shape, shape[1:])), 1e-9)
+            points = [[lon0 + x * scale_m / (111320 * math.cos(math.radians(lat0))), lat0 + y * scale_m / 111320]
+                      for x, y in shape]
+        else:
+            points = [list(coordinates[0])]
+            for (lon1, lat1), (lon2, lat2) in zip(coordinates, coordinates[1:]):
+                straight = self._meters([[lon1, lat1], [lon2, lat2]])
+                n = max(int(straight * self.DETOUR_FACTOR / self.SPACING_M), 2)
+                amp_deg = straight * rng.uniform(0.12, 0.2) / 111320
+                norm = max(math.hypot(lon2 - lon1, lat2 - lat1), 1e-12)
+                perp = (-(lat2 - lat1) / norm, (lon2 - lon1) / norm)
+                for k in range(1, n + 1):
+                    t = k / n
+                    off = amp_deg * math.sin(math.pi * t) * math.sin(3 * math.pi * t)
+                    points.append([lon1 + (lon2 - lon1) * t + perp[0] * off, lat1 + (lat2 - lat1) * t + perp[1] * off])
+        points = [[round(lon, 6), round(lat, 6)] for lon, lat in points]
+        distance = self._meters(points)
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": points},
+                "properties": {"summary": {"distance": distance, "duration": distance / 1.4}},
+            }],
+        }
+
+    @staticmethod
+    def _elevation(body):
+        return {
+            "type": "LineString",
+            "geometry": {"type": "LineString", "coordinates": [
+                [lon, lat, round(220 + 25 * math.sin(lat * 900) + 15 * math.cos(lon * 700), 1)]
+                for lon, lat in body["geometry"]
+            ]},
+        }
+
+    @staticmethod
+    def _overpass(rng):
+        tag_choices = [
+            {"highway": "footway"}, {"highway": "path"}, {"leisure": "park"}, {"natural": "wood"},
+            {"highway": "residential"}, {"landuse": "residential"}, {"highway": "primary"}, {"waterway": "river"},
+        ]
+        return {"elements": [
+            {"type": "way", "id": i, "tags": rng.choice(tag_choices)} for i in range(rng.randint(5, 60))
+        ]}
+
+    @staticmethod
+    def _mapbox(query, rng):
+        return {"features": [{
+            "place_name": f"{query.title()} {i + 1}, Charlotte, North Carolina, United States",
+            "center": [-80.84 + rng.uniform(-0.05, 0.05), 35.2 + rng.uniform(-0.05, 0.05)],
+        } for i in range(5)]}
@@ -0,0 +1,147 @@
+# canonical.py
+# 📌 Coordinate canonicalization — start/destination points snap to a shared grid cell (then to the
+# nearest local-graph node when one is close), and ORS seeds derive from the snapped request, so
+# users starting a few meters apart issue identical requests. Finished routes are memoized under
+# the canonical request key, which also makes the elevation and render caches hit for them.
+# Routes therefore start at the snapped point, not the exact input: up to ~35 m to the cell center
+# plus up to SNAP_NODE_METERS to the nearest graph node, so roughly 75 m away at most. The same
+# inputs give the same route; callers pass variant=1, 2, … to ask for a different one.
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+SNAP_GRID_METERS = 50       # grid cell size; 0 disables snapping (raw points, per-request seeds)
+SNAP_NODE_METERS = 40       # max distance from the cell center to a routable local-graph node
+KEY_DECIMALS = 6
+ROUTE_MEMO_SIZE = 256
+ROUTE_MEMO_TTL_MINUTES = 60
+
+
+def _lon_step(row, step_m):
+    center_lat = (row + 0.5) * step_m / 111320
+    return step_m / (111320 * max(math.cos(math.radians(center_lat)), 1e-6))
+
+
+def grid_cell(lat, lon, step_m=SNAP_GRID_METERS):
+    # Rows are step_m tall; each row's columns are step_m wide at the row's center latitude
+    row = math.floor(lat / (step_m / 111320))
+    return row, math.floor(lon / _lon_step(row, step_m))
+
+
+def grid_center(lat, lon, step_m=SNAP_GRID_METERS):
+    row, col = grid_cell(lat, lon, step_m)
+    return (row + 0.5) * step_m / 111320, (col + 0.5) * _lon_step(row, step_m)
+
+
+def snap_point(lat, lon, step_m=None, graph=None):
+    step_m = SNAP_GRID_METERS if step_m is None else step_m
+    if step_m <= 0:
+        return float(lat), float(lon)
+    if graph is None:
+        from local_graph import get_route_graph
+        graph = get_route_graph()
+    # Always the cell's point — even a start sitting right on a node — so one cell, one key
+    lat, lon = grid_center(lat, lon, step_m)
+    if graph is not None:
+        # Snapped from the cell center, so every point in the cell lands on the same node
+        node = graph.nearest_node(lat, lon, max_snap_m=SNAP_NODE_METERS)
+        if node is not None:
+            lat, lon = graph.latlon[node]
+    return round(float(lat), KEY_DECIMALS), round(float(lon), KEY_DECIMALS)
+
+
+def snap_coords(coords, step_m=None):
+    # (lat, lon) → canonical (lat, lon); None passes through
+    if coords is None:
+        return None
+    return snap_point(coords[0], coords[1], step_m=step_m)
+
+
+def canonical_key(lat, lon, step_m=None):
+    lat, lon = snap_point(lat, lon, step_m=step_m)
+    return f"{lat:.{KEY_DECIMALS}f},{lon:.{KEY_DECIMALS}f}"
+
+
+def request_key(*parts):
+    # Coordinates as fixed-precision text, routes by fingerprint, everything else by repr
+    def fmt(part):
+        if isinstance(part, (tuple, list)) and all(isinstance(v, (int, float)) for v in part):
+            return ",".join(f"{float(v):.{KEY_DECIMALS}f}" for v in part)
+        if hasattr(part, "fingerprint"):
+            return part.fingerprint
+        return repr(part)
+    return "|".join(fmt(part) for part in parts)
+
+
+def request_seed(*parts, variant=0):
+    # Deterministic ORS seed (0–10000) for a canonical request — same request, same first candidate.
+    # variant > 0 re-rolls it ("🎲 Try a different route"), so the same inputs can still give a new route.
+    if variant:
+        parts += ("variant", variant)
+    return int(hashlib.sha1(request_key(*parts).encode("utf-8")).hexdigest()[:8], 16) % 10001
+
+
+# 🧠 Finished routes per canonical request key (in memory, LRU + TTL). Concurrent requests for a
+# key that is still being generated wait for that generation instead of starting their own.
+class RouteMemo:
+    def __init__(self, max_entries=ROUTE_MEMO_SIZE, ttl_minutes=ROUTE_MEMO_TTL_MINUTES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_minutes * 60
+        self._entries = OrderedDict()   # key -> (stored_at, result)
+        self._in_flight = {}            # key -> Future of the result being generated
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, keep=bool):
+        # → (result, "hit" | "wait" | "miss"); only results passing keep() are memoized
+        with self._lock:
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._in_flight[key] = Future()
+            else:
+                self.waits += 1
+        if not owner:
+            return pending.result(), "wait"
+
+        try:
+            result = self.get(key)
+            if result is not None:
+                pending.set_result(result)
+                return result, "hit"
+            result = compute()
+            if keep(result):
+                self.put(key, result)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(result)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return result, "miss"
@@ -0,0 +1,181 @@
+# dem_elevation.py
+# 🏔️ Local DEM elevation — memory-mapped 1°×1° raster tiles with vectorized bilinear sampling
+#
+# Drop SRTM .hgt tiles (N35W081.hgt, 1" or 3") into data/dem and they are used as-is.
+# GeoTIFF tiles (e.g. Copernicus GLO-30) are converted once to .npy + .json with rasterio:
+#     python dem_elevation.py Copernicus_DSM_10_N35_00_W081_00_DEM.tif
+# Points outside the available tiles come back as NaN so callers can fall back to ORS.
+
+import argparse
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEM_DIR = "data/dem"
+MAX_OPEN_TILES = 16
+HGT_VOID = -32768
+
+_provider = None
+_provider_loaded = False
+_provider_lock = threading.Lock()
+
+
+def tile_name(lat_floor, lon_floor):
+    ns = "N" if lat_floor >= 0 else "S"
+    ew = "E" if lon_floor >= 0 else "W"
+    return f"{ns}{abs(lat_floor):02d}{ew}{abs(lon_floor):03d}"
+
+
+class DEMTile:
+    # bounds are the centers of the corner pixels: (south, west, north, east); row 0 is the north edge
+    def __init__(self, data, bounds, nodata=None):
+        self.data = data
+        self.south, self.west, self.north, self.east = bounds
+        self.nodata = nodata
+
+    @classmethod
+    def from_hgt(cls, path, lat_floor, lon_floor):
+        side = int(round(math.sqrt(os.path.getsize(path) // 2)))
+        data = np.memmap(path, dtype=">i2", mode="r", shape=(side, side))
+        return cls(data, (lat_floor, lon_floor, lat_floor + 1, lon_floor + 1), nodata=HGT_VOID)
+
+    @classmethod
+    def from_npy(cls, path):
+        with open(f"{os.path.splitext(path)[0]}.json", "r") as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), meta["bounds"], nodata=meta.get("nodata"))
+
+    def sample(self, lat, lon):
+        rows, cols = self.data.shape
+        y = (self.north - lat) / (self.north - self.south) * (rows - 1)
+        x = (lon - self.west) / (self.east - self.west) * (cols - 1)
+        r0 = np.clip(np.floor(y).astype(np.intp), 0, rows - 2)
+        c0 = np.clip(np.floor(x).astype(np.intp), 0, cols - 2)
+        fy = np.clip(y - r0, 0.0, 1.0)
+        fx = np.clip(x - c0, 0.0, 1.0)
+
+        # Fancy indexing only touches the pages under the route
+        z00 = self.data[r0, c0].astype(np.float64)
+        z01 = self.data[r0, c0 + 1].astype(np.float64)
+        z10 = self.data[r0 + 1, c0].astype(np.float64)
+        z11 = self.data[r0 + 1, c0 + 1].astype(np.float64)
+
+        elevation = (z00 * (1 - fx) + z01 * fx) * (1 - fy) + (z10 * (1 - fx) + z11 * fx) * fy
+        if self.nodata is not None:
+            void = (z00 == self.nodata) | (z01 == self.nodata) | (z10 == self.nodata) | (z11 == self.nodata)
+            elevation[void] = np.nan
+        return elevation
+
+
+class DEMElevationProvider:
+    def __init__(self, dem_dir=DEM_DIR, max_open_tiles=MAX_OPEN_TILES):
+        self.dem_dir = dem_dir
+        self.max_open_tiles = max_open_tiles
+        self._tiles = OrderedDict()   # (lat_floor, lon_floor) -> DEMTile, or None when not on disk
+        self._lock = threading.Lock()
+
+    def _open_tile(self, lat_floor, lon_floor):
+        name = tile_name(lat_floor, lon_floor)
+        hgt_path = os.path.join(self.dem_dir, f"{name}.hgt")
+        npy_path = os.path.join(self.dem_dir, f"{name}.npy")
+        if os.path.exists(hgt_path):
+            return DEMTile.from_hgt(hgt_path, lat_floor, lon_floor)
+        if os.path.exists(npy_path):
+            return DEMTile.from_npy(npy_path)
+        return None
+
+    def _tile(self, lat_floor, lon_floor):
+        key = (lat_floor, lon_floor)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+            try:
+                tile = self._open_tile(lat_floor, lon_floor)
+            except Exception as e:
+                print(f"⚠️ Could not open DEM tile {tile_name(lat_floor, lon_floor)}: {e}")
+                tile = None
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_open_tiles:
+                self._tiles.popitem(last=False)
+            return tile
+
+    def sample(self, latlon):
+        # Elevation in meters for each (lat, lon); NaN where no tile covers the point
+        latlon = np.asarray(latlon, dtype=np.float64).reshape(-1, 2)
+        elevation = np.full(len(latlon), np.nan)
+        if not len(latlon):
+            return elevation
+
+        lat_floor = np.floor(latlon[:, 0]).astype(int)
+        lon_floor = np.floor(latlon[:, 1]).astype(int)
+        cells = lat_floor * 1000 + lon_floor
+        for cell in np.unique(cells):
+            mask = cells == cell
+            first = np.argmax(mask)
+            tile = self._tile(int(lat_floor[first]), int(lon_floor[first]))
+            if tile is not None:
+                elevation[mask] = tile.sample(latlon[mask, 0], latlon[mask, 1])
+        return elevation
+
+    def covers(self, latlon):
+        return bool(np.isfinite(self.sample(latlon)).all())
+
+
+def get_dem_provider(dem_dir=DEM_DIR):
+    # Loaded lazily once per process; no DEM directory just means "always use ORS"
+    global _provider, _provider_loaded
+    if _provider_loaded:
+        return _provider
+    with _provider_lock:
+        if not _provider_loaded:
+            if os.path.isdir(dem_dir) and any(f.endswith((".hgt", ".npy")) for f in os.listdir(dem_dir)):
+                _provider = DEMElevationProvider(dem_dir)
+                print(f"🏔️ Local DEM elevation enabled from {dem_dir}")
+            _provider_loaded = True
+    return _provider
+
+
+# 🏗️ GeoTIFF → .npy tile conversion
+def convert_geotiff(source_path, dem_dir=DEM_DIR):
+    try:
+        import rasterio
+    except ImportError:
+        raise ImportError("❌ Converting GeoTIFF tiles needs rasterio (pip install rasterio).")
+
+    with rasterio.open(source_path) as src:
+        data = src.read(1)
+        transform = src.transform
+        nodata = src.nodata
+
+    # Pixel-center bounds of the corner pixels
+    west = transform.c + transform.a / 2
+    north = transform.f + transform.e / 2
+    east = west + transform.a * (data.shape[1] - 1)
+    south = north + transform.e * (data.shape[0] - 1)
+
+    name = tile_name(int(math.floor(south + 1e-9)), int(math.floor(west + 1e-9)))
+    os.makedirs(dem_dir, exist_ok=True)
+    np.save(os.path.join(dem_dir, f"{name}.npy"), data.astype(np.float32))
+    with open(os.path.join(dem_dir, f"{name}.json"), "w") as f:
+        json.dump({
+            "bounds": [south, west, north, east],
+            "nodata": float(nodata) if nodata is not None else None,
+            "source": os.path.basename(source_path),
+        }, f, indent=2)
+
+    print(f"✅ DEM tile converted: {name} ({data.shape[0]}×{data.shape[1]}) → {dem_dir}")
+    return name
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert GeoTIFF DEM tiles into memory-mappable .npy tiles.")
+    parser.add_argument("sources", nargs="+", help="1°×1° GeoTIFF DEM tiles")
+    parser.add_argument("--out", default=DEM_DIR, help=f"DEM directory (default {DEM_DIR})")
+    args = parser.parse_args()
+    for source in args.sources:
+        convert_geotiff(source, args.out)
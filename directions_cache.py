@@ -0,0 +1,228 @@
+# directions_cache.py
+# 🗺️ Persistent ORS directions cache — LRU + TTL in memory, size-capped store on disk
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import tracing
+
+DIRECTIONS_CACHE_DIR = "cache/directions"
+COORD_PRECISION = 5                        # ~1 m at our latitudes
+DIRECTIONS_TTL_MINUTES = 7 * 24 * 60       # street networks change slowly
+MAX_MEMORY_BYTES = 32 * 1024 * 1024
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def make_directions_key(coordinates, profile, format="geojson", options=None, precision=COORD_PRECISION):
+    # Coordinates are ORS-ordered (lon, lat); options carry the round_trip seed when present
+    normalized = {
+        "coordinates": [[round(float(lon), precision), round(float(lat), precision)] for lon, lat in coordinates],
+        "profile": profile,
+        "format": format,
+        "options": options or {},
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DirectionsCache:
+    def __init__(self, cache_dir=DIRECTIONS_CACHE_DIR, precision=COORD_PRECISION,
+                 ttl_minutes=DIRECTIONS_TTL_MINUTES, max_memory_bytes=MAX_MEMORY_BYTES,
+                 max_disk_bytes=MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.precision = precision
+        self.ttl_seconds = ttl_minutes * 60
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()   # key -> (stored_at, payload bytes)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()          # in-memory index only — file I/O never holds it
+        self._disk_lock = threading.Lock()     # _disk_bytes and the file swaps it counts
+        self._evict_lock = threading.Lock()    # one disk eviction sweep at a time
+        self._in_flight = {}                   # key -> Future of the payload one thread is fetching
+        self.hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".json"))
+        else:
+            self._disk_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, stored_at):
+        return time.time() - stored_at > self.ttl_seconds
+
+    # 🧠 In-memory tier
+    def _remember(self, key, stored_at, payload):
+        old = self._memory.pop(key, None)
+        if old:
+            self._memory_bytes -= len(old[1])
+        if len(payload) > self.max_memory_bytes:
+            return
+        self._memory[key] = (stored_at, payload)
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _forget(self, key):
+        old = self._memory.pop(key, None)
+        if old:
+            self._memory_bytes -= len(old[1])
+
+    # 💾 Disk tier (mtime doubles as last-access time for LRU eviction). Called without self._lock:
+    # entries are written to a tmp file and swapped in with os.replace, so readers see a whole entry
+    # or none. Only the swap/unlink and the byte count share _disk_lock — the data I/O never does.
+    def _disk_total(self):
+        with self._disk_lock:
+            return self._disk_bytes
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                record = json.loads(f.read())
+        except (OSError, ValueError):
+            return None, None
+        stored_at = record.get("stored_at", 0)
+        if self._expired(stored_at):
+            self._remove_file(path)
+            return None, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return stored_at, json.dumps(record["response"]).encode("utf-8")
+
+    def _write_disk(self, key, stored_at, response):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        data = json.dumps({"stored_at": stored_at, "response": response}).encode("utf-8")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            with self._disk_lock:
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(data) - previous
+                over = self._disk_bytes > self.max_disk_bytes
+        except OSError as e:
+            print(f"⚠️ Could not write directions cache entry: {e}")
+            return
+        if over:
+            self._evict_disk()
+
+    def _remove_file(self, path):
+        try:
+            with self._disk_lock:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        # Another thread already sweeping will bring the total down for us too
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = sorted(
+                (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in entries:
+                if self._disk_total() <= self.max_disk_bytes * 0.9:
+                    break
+                self._remove_file(entry.path)
+        finally:
+            self._evict_lock.release()
+
+    # 🔍 Public API
+    def get(self, key):
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and not self._expired(cached[0]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(cached[1])
+            if cached:
+                self._forget(key)
+
+        if self.cache_dir:
+            stored_at, payload = self._read_disk(key)
+            if payload is not None:
+                with self._lock:
+                    self._remember(key, stored_at, payload)
+                    self.hits += 1
+                return json.loads(payload)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, response):
+        return len(self._store(key, response))
+
+    def _store(self, key, response):
+        stored_at = time.time()
+        payload = json.dumps(response).encode("utf-8")
+        with self._lock:
+            self._remember(key, stored_at, payload)
+        if self.cache_dir:
+            self._write_disk(key, stored_at, response)
+        return payload
+
+    def get_or_fetch(self, client, coordinates, profile, format="geojson", options=None):
+        key = make_directions_key(coordinates, profile, format, options, precision=self.precision)
+        cached = self.get(key)
+        if cached is not None:
+            tracing.incr("cache.hit")
+            return cached
+
+        # Single flight: concurrent misses on one key share the first caller's ORS request
+        with self._lock:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            tracing.incr("cache.wait")
+            return json.loads(pending.result())
+
+        tracing.incr("cache.miss")
+        kwargs = {"options": options} if options else {}
+        try:
+            with tracing.span("ors.directions", profile=profile) as span:
+                response = client.directions(coordinates=coordinates, profile=profile, format=format, **kwargs)
+                payload = self._store(key, response)
+                span.incr("bytes", len(payload))
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(payload)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_total(),
+            }
@@ -0,0 +1,193 @@
+# distance_controller.py
+# 🎯 Adaptive distance targeting — learn the requested→returned length ratio instead of fixed
+# reduction_factor steps, seeded by per-region/profile priors kept from past requests
+
+import json
+import math
+import os
+import random
+import threading
+
+import tracing
+from route_candidates import pick_first_acceptable
+
+DISTANCE_PRIORS_PATH = "cache/distance_priors.json"
+PRIOR_REGION_DEG = 0.1          # priors are shared across a ~10 km cell
+PRIOR_WEIGHT = 0.25             # the prior counts as this many observations
+PRIOR_EWMA_ALPHA = 0.2
+SINGLE_GUESS_ROUNDS = 2         # rounds that send only the model's best guess (prior, then first refit)…
+RETRY_WAVE_SIZE = 2             # …before fanning out concurrent candidates on the hard cases
+REQUEST_STEP_M = 200            # requests are rounded to this step so retries reuse cached directions
+
+# Returned/requested length ratios before anything is learned
+DEFAULT_RATIOS = {
+    "round_trip": 1 / 0.85,           # ORS round_trip overshoots — the old first reduction_factor
+    "out_and_back": 2.5,              # midpoint offset → out + back along streets
+}
+
+_priors = None
+_priors_lock = threading.Lock()
+
+
+def region_key(kind, profile, lat, lon, cell_deg=PRIOR_REGION_DEG):
+    return f"{kind}:{profile}:{math.floor(lat / cell_deg)}:{math.floor(lon / cell_deg)}"
+
+
+class DistancePriors:
+    def __init__(self, path=DISTANCE_PRIORS_PATH, alpha=PRIOR_EWMA_ALPHA):
+        self.path = path
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._ratios = {}   # region key -> {"ratio", "count"}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._ratios = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Could not read distance priors: {e}")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._ratios.get(key)
+            return entry["ratio"] if entry else None
+
+    def update(self, key, ratio):
+        with self._lock:
+            entry = self._ratios.get(key)
+            if entry:
+                entry["ratio"] = (1 - self.alpha) * entry["ratio"] + self.alpha * ratio
+                entry["count"] += 1
+            else:
+                self._ratios[key] = {"ratio": ratio, "count": 1}
+            snapshot = json.dumps(self._ratios)
+        if self.path:
+            try:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not write distance priors: {e}")
+
+
+def get_distance_priors():
+    global _priors
+    with _priors_lock:
+        if _priors is None:
+            _priors = DistancePriors()
+    return _priors
+
+
+class DistanceController:
+    # Models returned_total ≈ fixed_m + ratio × requested and picks the request that lands on target_m.
+    # ratio is a least-squares fit through the origin over every observation, with the prior
+    # counted as PRIOR_WEIGHT pseudo-observations at the prior's own suggested request.
+    def __init__(self, target_m, fixed_m=0.0, prior_ratio=1.0, min_request_m=500, max_request_m=None,
+                 priors=None, prior_key=None, step_m=REQUEST_STEP_M):
+        self.target_m = target_m
+        self.fixed_m = fixed_m
+        self.prior_ratio = prior_ratio
+        self.min_request_m = min_request_m
+        self.max_request_m = max_request_m
+        self.priors = priors
+        self.prior_key = prior_key
+        self.step_m = step_m
+        self.observations = []   # (requested_m, returned variable meters)
+        self._lock = threading.Lock()
+
+    @property
+    def attempts(self):
+        return len(self.observations)
+
+    @property
+    def ratio(self):
+        with self._lock:
+            observations = list(self.observations)
+        q_ref = max(self.target_m - self.fixed_m, 1.0) / self.prior_ratio
+        num = PRIOR_WEIGHT * self.prior_ratio * q_ref * q_ref
+        den = PRIOR_WEIGHT * q_ref * q_ref
+        for requested, returned in observations:
+            num += requested * returned
+            den += requested * requested
+        return max(num / den, 0.05)
+
+    def observe(self, requested_m, returned_total_m):
+        if requested_m <= 0:
+            return
+        with self._lock:
+            self.observations.append((requested_m, max(returned_total_m - self.fixed_m, 0.0)))
+
+    def _quantize(self, requested):
+        if self.step_m:
+            requested = max(round(requested / self.step_m), 1) * self.step_m
+        requested = max(requested, self.min_request_m)
+        if self.max_request_m:
+            requested = min(requested, self.max_request_m)
+        return requested
+
+    def next_request(self):
+        return self._quantize((self.target_m - self.fixed_m) / self.ratio)
+
+    def next_requests(self, n, spread=0.04):
+        # A wave of n requests centered on the model's best guess
+        center = (self.target_m - self.fixed_m) / self.ratio
+        return [self._quantize(center * (1 + spread * (i - (n - 1) / 2))) for i in range(n)]
+
+    def commit(self):
+        # Feed what this request learned back into the shared priors
+        if self.priors is None or self.prior_key is None:
+            return
+        with self._lock:
+            observations = list(self.observations)
+        if observations:
+            ratio = sum(r * q for q, r in observations) / sum(q * q for q, _ in observations)
+            if ratio > 0:
+                self.priors.update(self.prior_key, ratio)
+
+
+def distance_controller_for(kind, target_m, origin, profile="foot-walking", fixed_m=0.0, min_request_m=500):
+    priors = get_distance_priors()
+    key = region_key(kind, profile, origin[0], origin[1])
+    prior = priors.get(key) or DEFAULT_RATIOS[kind]
+    return DistanceController(target_m, fixed_m=fixed_m, prior_ratio=prior, min_request_m=min_request_m,
+                              priors=priors, prior_key=key)
+
+
+# 🔁 Drive build_candidate((requested_m, seed)) → (coords, total_meters) until a route lands in range.
+# Every completed candidate — accepted or not — refines the controller before the next wave.
+# Quota first: each round sends one prediction until single_guess_rounds of them have missed (one miss
+# usually pins the ratio down), then rounds fan out retry_wave_size candidates concurrently so the rare
+# hard case doesn't take eight sequential round trips.
+def solve_distance(build_candidate, controller, allowed_range, max_attempts=8,
+                   single_guess_rounds=SINGLE_GUESS_ROUNDS, retry_wave_size=RETRY_WAVE_SIZE, seeds=None):
+    seeds = seeds or random
+    best_coords, best_meters = None, None
+    attempts = rounds = 0
+
+    def observed(params):
+        result = build_candidate(params)
+        if result and result[0]:
+            controller.observe(params[0], result[1])
+        return result
+
+    while attempts < max_attempts:
+        n = min(1 if rounds < single_guess_rounds else retry_wave_size, max_attempts - attempts)
+        params = [(requested, seeds.randint(0, 10000)) for requested in controller.next_requests(n)]
+        coords, meters = pick_first_acceptable(observed, params, allowed_range, controller.target_m,
+                                               max_concurrency=n)
+        attempts += n
+        rounds += 1
+        tracing.incr("attempts", n)
+        if coords is None:
+            continue
+        if allowed_range[0] <= meters <= allowed_range[1]:
+            best_coords, best_meters = coords, meters
+            break
+        if best_meters is None or abs(meters - controller.target_m) < abs(best_meters - controller.target_m):
+            best_coords, best_meters = coords, meters
+
+    controller.commit()
+    print(f"🎯 Distance controller: {attempts} attempt(s), learned ratio {controller.ratio:.3f}")
+    return best_coords, best_meters
@@ -0,0 +1,132 @@
+# distance_utils.py
+# 📏 Vectorized route distance math on (N, 2) arrays of (lat, lon)
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8  # mean Earth radius (IUGG)
+METERS_PER_MILE = 1609.34
+
+# WGS-84 ellipsoid (same model geopy's geodesic() uses)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+DEFAULT_METHOD = "vincenty"
+DEFAULT_TOLERANCE = 1e-12  # Vincenty convergence tolerance on lambda (radians)
+MAX_VINCENTY_ITERATIONS = 200
+
+
+def as_coord_array(coords):
+    # Accepts a list of (lat, lon) tuples or an existing array and returns a float64 (N, 2) view
+    arr = np.asarray(coords, dtype=np.float64)
+    if arr.size == 0:
+        return arr.reshape(0, 2)
+    if arr.ndim != 2 or arr.shape[1] < 2:
+        raise ValueError(f"❌ Expected (N, 2) array of (lat, lon), got shape {arr.shape}")
+    return arr[:, :2]
+
+
+# 🌐 Great-circle segment lengths (fast, ~0.5% worst-case error)
+def haversine_segments(coords):
+    arr = as_coord_array(coords)
+    if len(arr) < 2:
+        return np.zeros(0)
+
+    lat = np.radians(arr[:, 0])
+    lon = np.radians(arr[:, 1])
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+# 🌐 Ellipsoidal segment lengths (Vincenty inverse, batched across all segments)
+def vincenty_segments(coords, tolerance=DEFAULT_TOLERANCE, max_iterations=MAX_VINCENTY_ITERATIONS):
+    arr = as_coord_array(coords)
+    if len(arr) < 2:
+        return np.zeros(0)
+
+    f, a, b = WGS84_F, WGS84_A, WGS84_B
+    lat = np.radians(arr[:, 0])
+    lon = np.radians(arr[:, 1])
+
+    L = np.diff(lon)
+    U = np.arctan((1 - f) * np.tan(lat))
+    sinU1, cosU1 = np.sin(U[:-1]), np.cos(U[:-1])
+    sinU2, cosU2 = np.sin(U[1:]), np.cos(U[1:])
+
+    lam = L.copy()
+    active = np.ones(len(L), dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            sin_alpha = np.where(sin_sigma > 0, cosU1 * cosU2 * sin_lam / sin_sigma, 0.0)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha != 0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha, 0.0)
+
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+
+            converged = np.abs(lam_next - lam) <= tolerance
+            lam = np.where(active, lam_next, lam)
+            active &= ~converged
+            if not active.any():
+                break
+
+        u2 = cos2_alpha * (a ** 2 - b ** 2) / b ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+            )
+        )
+        meters = b * A * (sigma - delta_sigma)
+
+    # Near-antipodal pairs can fail to converge — fall back to great-circle for those
+    bad = active | ~np.isfinite(meters)
+    if bad.any():
+        meters = np.where(bad, haversine_segments(arr), meters)
+    return meters
+
+
+# 📏 Segment lengths in meters (len N-1)
+def segment_lengths(coords, method=DEFAULT_METHOD, tolerance=DEFAULT_TOLERANCE):
+    method = method.lower()
+    if method == "haversine":
+        return haversine_segments(coords)
+    if method == "vincenty":
+        return vincenty_segments(coords, tolerance=tolerance)
+    raise ValueError(f"❌ Unknown distance method: {method} — expected 'haversine' or 'vincenty'.")
+
+
+# 📏 Cumulative distance in meters (len N, starts at 0)
+def cumulative_distance(coords, method=DEFAULT_METHOD, tolerance=DEFAULT_TOLERANCE):
+    segments = segment_lengths(coords, method=method, tolerance=tolerance)
+    cumulative = np.zeros(len(segments) + 1)
+    np.cumsum(segments, out=cumulative[1:])
+    return cumulative
+
+
+# 📏 Total route length in meters
+def route_distance(coords, method=DEFAULT_METHOD, tolerance=DEFAULT_TOLERANCE):
+    return float(segment_lengths(coords, method=method, tolerance=tolerance).sum())
+
+
+# 📍 Indices of the first point at or past each whole mile (for mile markers)
+def mile_marker_indices(cumulative_m):
+    cumulative_miles = np.asarray(cumulative_m) / METERS_PER_MILE
+    if len(cumulative_miles) < 2:
+        return []
+    miles = np.arange(1, int(cumulative_miles[-1]) + 1)
+    return list(np.searchsorted(cumulative_miles, miles, side="left"))
@@ -0,0 +1,61 @@
+# elevation_analytics.py
+# 📊 Single vectorized pass over an elevation profile — feeds the run summary and all three charts
+
+import numpy as np
+
+import distance_utils as du
+from route import Route
+
+FEET_PER_METER = 3.28084
+FEET_PER_MILE = 5280
+DEFAULT_GRADE_WINDOW = 5
+
+
+def centered_rolling_mean(values, window):
+    # Same result as pandas .rolling(window, min_periods=1, center=True).mean()
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values
+    before = window // 2
+    after = window - before - 1
+    idx = np.arange(n)
+    lo = np.clip(idx - before, 0, n)
+    hi = np.clip(idx + after + 1, 0, n)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    return (sums[hi] - sums[lo]) / (hi - lo)
+
+
+class ElevationProfile:
+    def __init__(self, route, window_size=DEFAULT_GRADE_WINDOW):
+        self.route = route
+        self.window_size = window_size
+
+        self.elevation_ft = route.elevation * FEET_PER_METER
+        self.distance_mi = route.cumulative_m / du.METERS_PER_MILE
+
+        deltas_ft = np.diff(self.elevation_ft)
+        self.cumulative_gain_ft = np.concatenate(([0.0], np.cumsum(np.clip(deltas_ft, 0, None))))
+        self.ascent_ft = float(self.cumulative_gain_ft[-1])
+        self.descent_ft = float(-deltas_ft[deltas_ft < 0].sum())
+        self.net_change_ft = self.ascent_ft - self.descent_ft
+
+        # Grade per segment (%), flat where two points share a location
+        segment_ft = np.diff(self.distance_mi) * FEET_PER_MILE
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.grade_pct = np.where(segment_ft > 0, deltas_ft / segment_ft * 100, 0.0)
+        self.grade_pct_smoothed = centered_rolling_mean(self.grade_pct, window_size)
+
+    @property
+    def total_miles(self):
+        return float(self.distance_mi[-1]) if len(self.distance_mi) else 0.0
+
+
+def analyze_elevation(elevation_data, window_size=DEFAULT_GRADE_WINDOW):
+    # Accepts an ElevationProfile (returned as-is), a Route with elevation, or a raw ORS elevation_line response
+    if isinstance(elevation_data, ElevationProfile):
+        return elevation_data
+    route = Route.from_elevation_data(elevation_data)
+    if route is None or route.elevation is None or not len(route):
+        return None
+    return ElevationProfile(route, window_size=window_size)
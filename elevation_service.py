@@ -0,0 +1,182 @@
+# elevation_service.py
+# ⛰️ Elevation service — local DEM first, then chunked + concurrent ORS elevation_line calls,
+# per-leg prefetch, stitched profiles
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import tracing
+from route import Route
+
+MAX_POINTS_PER_REQUEST = 2000   # ORS elevation_line vertex limit
+MAX_TOTAL_POINTS = 10000        # longer routes are sampled, then interpolated back by distance
+MAX_WORKERS = 4
+CACHE_SIZE = 256
+
+
+class ElevationService:
+    # fetch_line([[lon, lat], ...]) -> [[lon, lat, ele], ...]
+    # local_provider.sample(latlon) -> meters per point, NaN where not covered (e.g. DEMElevationProvider)
+    def __init__(self, fetch_line, max_points=MAX_POINTS_PER_REQUEST, max_total_points=MAX_TOTAL_POINTS,
+                 max_workers=MAX_WORKERS, cache_size=CACHE_SIZE, local_provider=None):
+        self.fetch_line = fetch_line
+        self.local_provider = local_provider
+        self.max_points = max_points
+        self.max_total_points = max_total_points
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()   # route fingerprint -> elevation array (meters)
+        self._pending = {}            # route fingerprint -> Future
+        self._lock = threading.Lock()
+        # Separate pools so leg-level jobs never wait on chunk jobs queued behind them
+        self._leg_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="where2run-elev-leg")
+        self._chunk_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="where2run-elev-chunk")
+
+    # 🧠 Cache
+    def _cached(self, key):
+        with self._lock:
+            elevation = self._cache.get(key)
+            if elevation is not None:
+                self._cache.move_to_end(key)
+            return elevation
+
+    def _store(self, key, elevation):
+        with self._lock:
+            self._cache[key] = elevation
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # 🏔️ Local DEM — only used when it covers every point, so profiles never mix sources
+    def _sample_local(self, route):
+        if self.local_provider is None:
+            return None
+        try:
+            elevation = self.local_provider.sample(route.latlon)
+        except Exception as e:
+            print("⚠️ Local DEM sampling failed:", e)
+            return None
+        covered = bool(np.isfinite(elevation).all())
+        tracing.incr("dem.hit" if covered else "dem.miss")
+        return elevation if covered else None
+
+    # 🌐 Network — one chunk
+    def _fetch_chunk(self, latlon):
+        with tracing.span("ors.elevation_line", points=len(latlon)):
+            points = self.fetch_line(latlon[:, ::-1].tolist())
+        elevation = np.asarray([pt[2] for pt in points if len(pt) > 2], dtype=np.float64)
+        if len(elevation) == len(latlon):
+            return elevation
+        if len(elevation) < 2:
+            raise ValueError(f"Elevation response had {len(elevation)} points for {len(latlon)} requested")
+        # Response was resampled server-side — spread it back over the requested points
+        return np.interp(np.linspace(0, 1, len(latlon)), np.linspace(0, 1, len(elevation)), elevation)
+
+    def _fetch_route(self, route):
+        n = len(route)
+        if n > self.max_total_points:
+            sample_idx = np.unique(np.linspace(0, n - 1, self.max_total_points).round().astype(int))
+        else:
+            sample_idx = np.arange(n)
+        sample = route.latlon[sample_idx]
+
+        # Chunks overlap by one point so the stitched profile has no gaps
+        step = self.max_points - 1
+        chunks = [sample[start:start + self.max_points] for start in range(0, max(len(sample) - 1, 1), step)]
+        if len(chunks) > 1:
+            print(f"⛰️ Fetching elevation in {len(chunks)} chunks ({len(sample)} points)")
+        results = list(self._chunk_pool.map(tracing.bind(self._fetch_chunk), chunks))
+        sampled = np.concatenate([results[0]] + [chunk[1:] for chunk in results[1:]])
+
+        if len(sample_idx) == n:
+            return sampled
+        return np.interp(route.cumulative_m, route.cumulative_m[sample_idx], sampled)
+
+    def _fetch_leg(self, route):
+        elevation = self._cached(route.fingerprint)
+        if elevation is not None:
+            return elevation
+        elevation = self._sample_local(route)
+        if elevation is not None:
+            self._store(route.fingerprint, elevation)
+            return elevation
+        try:
+            elevation = self._fetch_route(route)
+        except Exception as e:
+            print("❌ Elevation fetch error:", e)
+            return None
+        self._store(route.fingerprint, elevation)
+        return elevation
+
+    def _elevation_array(self, route):
+        elevation = self._cached(route.fingerprint)
+        if elevation is not None:
+            tracing.incr("cache.hit")
+            return elevation
+
+        # Local sampling is cheaper than any thread handoff — try it on the whole route first
+        elevation = self._sample_local(route)
+        if elevation is not None:
+            self._store(route.fingerprint, elevation)
+            return elevation
+
+        if not getattr(route, "parts", None):
+            # Joins an in-flight prefetch for this leg if there is one
+            return self.prefetch(route).result()
+
+        # Stitch from legs — prefetched ones are usually done already
+        futures = [self.prefetch(leg) for leg in self._legs(route)]
+        arrays = [future.result() for future in futures]
+        if all(array is not None for array in arrays):
+            elevation = np.concatenate(arrays)
+            self._store(route.fingerprint, elevation)
+            return elevation
+        return self._fetch_leg(route)
+
+    def _legs(self, route):
+        # Flatten Route.concat() parts down to the original legs
+        parts = getattr(route, "parts", None)
+        if not parts:
+            return [route]
+        return [leg for part in parts for leg in self._legs(part)]
+
+    # 🚀 Public API
+    def prefetch(self, coords):
+        # Start fetching a leg's elevation in the background as soon as its directions return.
+        # Concatenated routes prefetch each of their legs (and return None).
+        route = Route.from_coords(coords)
+        if getattr(route, "parts", None):
+            for leg in self._legs(route):
+                self.prefetch(leg)
+            return None
+        key = route.fingerprint
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._leg_pool.submit(tracing.bind(self._fetch_leg), route)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._forget_pending(key))
+        return future
+
+    def _forget_pending(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def close(self, wait=True):
+        # Let in-flight prefetches finish (or not) and release the pools
+        self._leg_pool.shutdown(wait=wait)
+        self._chunk_pool.shutdown(wait=wait)
+
+    def elevation_for(self, coords):
+        # Route with .elevation filled in, or None if elevation could not be fetched
+        route = Route.from_coords(coords)
+        if not route:
+            return None
+        if route.elevation is not None:
+            return route
+        elevation = self._elevation_array(route)
+        return route.with_elevation(elevation) if elevation is not None else None
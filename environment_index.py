@@ -0,0 +1,230 @@
+# environment_index.py
+# 🗂️ Offline environment tile index — packed per-mode feature counts, memory-mapped for lookups
+#
+# Build once from an OSM extract (.osm XML, .osm.pbf with pyosmium, or an Overpass JSON dump
+# fetched with `out tags bb;`):
+#     python environment_index.py charlotte.osm.pbf
+# The index lands in cache/environment_index.{npy,json} and is picked up by environment_probe.
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from environment_probe import (
+    DEFAULT_RADIUS_M, ENVIRONMENT_MODES, TILE_ZOOM, _area_km2, _padded_bounds, classify_tags, tile_for
+)
+
+ENVIRONMENT_INDEX_PATH = "cache/environment_index"
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("counts", "<u4", (len(ENVIRONMENT_MODES),))])
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def tile_key(x, y):
+    return (int(x) << 32) | int(y)
+
+
+# 🔍 Lookup side
+class EnvironmentIndex:
+    def __init__(self, path=ENVIRONMENT_INDEX_PATH):
+        with open(f"{path}.json", "r") as f:
+            self.meta = json.load(f)
+        if tuple(self.meta["modes"]) != ENVIRONMENT_MODES:
+            raise ValueError(f"❌ Environment index modes {self.meta['modes']} do not match {ENVIRONMENT_MODES}")
+        if "radius_m" not in self.meta:
+            raise ValueError("❌ Environment index predates per-tile way extents — rebuild it")
+
+        self.zoom = self.meta["zoom"]
+        self.radius_m = self.meta["radius_m"]
+        self.bounds = self.meta["bounds"]   # list of [south, west, north, east]
+        records = np.load(f"{path}.npy", mmap_mode="r")
+        self.keys = records["key"]
+        self.counts = records["counts"]
+
+    def covers(self, lat, lon):
+        return any(s <= lat <= n and w <= lon <= e for s, w, n, e in self.bounds)
+
+    def scores(self, lat, lon):
+        # Each tile already counts every way reaching its radius-padded bounds — the same set the
+        # Overpass probe for that tile returns — so one lookup, no double-counted neighbours
+        tile = tile_for(lat, lon, self.zoom)
+        key = tile_key(tile[1], tile[2])
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i < len(self.keys) and int(self.keys[i]) == key:
+            totals = self.counts[i]
+        else:
+            totals = np.zeros(len(ENVIRONMENT_MODES))
+        area_km2 = _area_km2(_padded_bounds(tile, self.radius_m))
+        return {mode: float(totals[i]) / area_km2 for i, mode in enumerate(ENVIRONMENT_MODES)}
+
+
+def get_environment_index(path=ENVIRONMENT_INDEX_PATH):
+    # Loaded lazily once per process; a missing index just means "always use Overpass"
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if not _index_loaded:
+            if os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json"):
+                try:
+                    _index = EnvironmentIndex(path)
+                    print(f"🗂️ Loaded environment index: {len(_index.keys)} tiles")
+                except Exception as e:
+                    print(f"⚠️ Could not load environment index: {e}")
+            _index_loaded = True
+    return _index
+
+
+# 🏗️ Build side — each reader yields (south, west, north, east, tags) per way, plus the extract bounds
+def _extent(points):
+    lats = [p[0] for p in points]
+    lons = [p[1] for p in points]
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def _iter_osm_xml(path, bounds):
+    node_coords = {}
+    way_refs, way_tags = None, None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "way":
+                way_refs, way_tags = [], {}
+            continue
+
+        if elem.tag == "bounds":
+            bounds.append([float(elem.get(k)) for k in ("minlat", "minlon", "maxlat", "maxlon")])
+        elif elem.tag == "node":
+            node_coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "nd" and way_refs is not None:
+            way_refs.append(int(elem.get("ref")))
+        elif elem.tag == "tag" and way_tags is not None:
+            way_tags[elem.get("k")] = elem.get("v")
+        elif elem.tag == "way":
+            points = [node_coords[ref] for ref in way_refs if ref in node_coords]
+            if points and way_tags:
+                yield (*_extent(points), way_tags)
+            way_refs, way_tags = None, None
+            elem.clear()
+
+
+def _iter_osm_pbf(path, bounds):
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("❌ Reading .osm.pbf extracts needs pyosmium (pip install osmium).")
+
+    ways = []
+
+    class WayHandler(osmium.SimpleHandler):
+        def way(self, w):
+            tags = {tag.k: tag.v for tag in w.tags}
+            if not tags or not classify_tags(tags):
+                return
+            points = [(n.location.lat, n.location.lon) for n in w.nodes if n.location.valid()]
+            if points:
+                ways.append((*_extent(points), tags))
+
+    reader_header = osmium.io.Reader(path, osmium.osm.osm_entity_bits.NOTHING).header()
+    box = reader_header.box()
+    if box.valid():
+        bounds.append([box.bottom_left.lat, box.bottom_left.lon, box.top_right.lat, box.top_right.lon])
+
+    WayHandler().apply_file(path, locations=True)
+    yield from ways
+
+
+def _iter_overpass_json(path, bounds):
+    with open(path, "r") as f:
+        data = json.load(f)
+    for element in data.get("elements", []):
+        # `out bb` gives the way's bounds, `out geom` its points; `out center` is a single point
+        box = element.get("bounds")
+        if box:
+            yield box["minlat"], box["minlon"], box["maxlat"], box["maxlon"], element.get("tags", {})
+            continue
+        points = [(p["lat"], p["lon"]) for p in element.get("geometry") or [] if p]
+        center = element.get("center") or element
+        if not points and "lat" in center and "lon" in center:
+            points = [(center["lat"], center["lon"])]
+        if points:
+            yield (*_extent(points), element.get("tags", {}))
+
+
+def _tiles_reached(south, west, north, east, zoom, radius_m):
+    # Every tile whose radius-padded bounds overlap the way's extent
+    pad_lat = radius_m / 111320
+    pad_lon = radius_m / (111320 * math.cos(math.radians((south + north) / 2)))
+    _, x0, y0 = tile_for(north + pad_lat, west - pad_lon, zoom)
+    _, x1, y1 = tile_for(south - pad_lat, east + pad_lon, zoom)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+def build_index(source_path, out_path=ENVIRONMENT_INDEX_PATH, zoom=TILE_ZOOM, radius_m=DEFAULT_RADIUS_M):
+    if source_path.endswith(".pbf"):
+        reader = _iter_osm_pbf
+    elif source_path.endswith(".json"):
+        reader = _iter_overpass_json
+    else:
+        reader = _iter_osm_xml
+
+    bounds = []
+    tile_counts = {}
+    lat_range = [90.0, -90.0]
+    lon_range = [180.0, -180.0]
+    mode_slots = {mode: i for i, mode in enumerate(ENVIRONMENT_MODES)}
+
+    for south, west, north, east, tags in reader(source_path, bounds):
+        lat_range = [min(lat_range[0], south), max(lat_range[1], north)]
+        lon_range = [min(lon_range[0], west), max(lon_range[1], east)]
+        modes = classify_tags(tags)
+        if not modes:
+            continue
+        # A long trail or a big park counts in every tile it runs through, not just its centroid's
+        for x, y in _tiles_reached(south, west, north, east, zoom, radius_m):
+            counts = tile_counts.setdefault(tile_key(x, y), [0] * len(ENVIRONMENT_MODES))
+            for mode in modes:
+                counts[mode_slots[mode]] += 1
+
+    if not bounds and lat_range[0] <= lat_range[1]:
+        bounds.append([lat_range[0], lon_range[0], lat_range[1], lon_range[1]])
+
+    records = np.zeros(len(tile_counts), dtype=INDEX_DTYPE)
+    for i, key in enumerate(sorted(tile_counts)):
+        records[i] = (key, tile_counts[key])
+
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    np.save(f"{out_path}.npy", records)
+    with open(f"{out_path}.json", "w") as f:
+        json.dump({
+            "zoom": zoom,
+            "radius_m": radius_m,
+            "modes": list(ENVIRONMENT_MODES),
+            "bounds": bounds,
+            "source": os.path.basename(source_path),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }, f, indent=2)
+
+    print(f"✅ Environment index built: {len(records)} tiles → {out_path}.npy")
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline environment tile index from an OSM extract.")
+    parser.add_argument("source", help=".osm, .osm.pbf or Overpass JSON (out tags bb) file")
+    parser.add_argument("--out", default=ENVIRONMENT_INDEX_PATH, help="output path prefix (.npy/.json)")
+    parser.add_argument("--zoom", type=int, default=TILE_ZOOM)
+    parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS_M, help="probe radius each tile is padded by (m)")
+    args = parser.parse_args()
+    build_index(args.source, args.out, args.zoom, args.radius)
@@ -0,0 +1,208 @@
+# environment_probe.py
+# 🌿 Environment classification — one combined Overpass query per map tile, scored for every mode
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+ENVIRONMENT_CACHE_DIR = "cache/environment"
+TILE_ZOOM = 16                        # ~500 m tiles at our latitudes
+ENVIRONMENT_TTL_MINUTES = 7 * 24 * 60
+DEFAULT_RADIUS_M = 300
+MEMORY_CACHE_TILES = 4096             # tiles kept in memory (LRU); older ones reload from disk
+
+# (key, operator, value) — "~" is an unanchored regex, same semantics as Overpass
+ENVIRONMENT_TAG_GROUPS = {
+    "trail": [
+        ("highway", "~", "path|footway|bridleway"),
+        ("surface", "~", "dirt|gravel|unpaved"),
+        ("leisure", "=", "park"),
+    ],
+    "suburban": [("highway", "=", "residential")],
+    "urban": [("highway", "~", "primary|secondary|tertiary")],
+    "scenic": [
+        ("leisure", "=", "park"),
+        ("natural", "~", "wood|water"),
+        ("tourism", "~", "viewpoint"),
+    ],
+    "shaded": [
+        ("natural", "=", "wood"),
+        ("landuse", "=", "forest"),
+    ],
+}
+ENVIRONMENT_MODES = tuple(ENVIRONMENT_TAG_GROUPS)
+# UI labels → mode ("Prefer Trails" arrives as "prefer trails")
+ENVIRONMENT_ALIASES = {
+    "prefer trails": "trail",
+    "trails": "trail",
+    "none": None,
+    "": None,
+}
+
+_memory_cache = OrderedDict()   # (tile, radius_m) -> (stored_at, scores), LRU
+_lock = threading.Lock()
+
+
+def normalize_environment(route_environment):
+    # Any UI/CLI spelling → one of ENVIRONMENT_MODES, or None for "no preference"
+    if route_environment is None:
+        return None
+    key = " ".join(str(route_environment).split()).lower()
+    return ENVIRONMENT_ALIASES.get(key, key)
+
+
+# 🧩 Slippy-map tiles
+def tile_for(lat, lon, zoom=TILE_ZOOM):
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_id(tile):
+    return "{}/{}/{}".format(*tile)
+
+
+def tile_bounds(tile):
+    zoom, x, y = tile
+    n = 2 ** zoom
+
+    def lat_at(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    south, north = lat_at(y + 1), lat_at(y)
+    west, east = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    return south, west, north, east
+
+
+def _padded_bounds(tile, radius_m):
+    # Pad by the probe radius so any start inside the tile sees features within radius
+    south, west, north, east = tile_bounds(tile)
+    pad_lat = radius_m / 111320
+    pad_lon = radius_m / (111320 * math.cos(math.radians((south + north) / 2)))
+    return south - pad_lat, west - pad_lon, north + pad_lat, east + pad_lon
+
+
+def _area_km2(bounds):
+    south, west, north, east = bounds
+    height = (north - south) * 111.32
+    width = (east - west) * 111.32 * math.cos(math.radians((south + north) / 2))
+    return max(height * width, 1e-9)
+
+
+# 🛰️ Combined query over every tag group of every mode
+def _unique_filters():
+    seen = []
+    for filters in ENVIRONMENT_TAG_GROUPS.values():
+        for tag_filter in filters:
+            if tag_filter not in seen:
+                seen.append(tag_filter)
+    return seen
+
+
+def build_environment_query(bounds):
+    bbox = "{:.6f},{:.6f},{:.6f},{:.6f}".format(*bounds)
+    statements = "\n".join(
+        f'way["{key}"{op}"{value}"]({bbox});' for key, op, value in _unique_filters()
+    )
+    return f"[out:json][timeout:25];({statements});out tags;"
+
+
+def _tag_matches(tags, tag_filter):
+    key, op, value = tag_filter
+    if key not in tags:
+        return False
+    if op == "=":
+        return tags[key] == value
+    return re.search(value, tags[key]) is not None
+
+
+def classify_tags(tags):
+    return [
+        mode for mode, filters in ENVIRONMENT_TAG_GROUPS.items()
+        if any(_tag_matches(tags, tag_filter) for tag_filter in filters)
+    ]
+
+
+def score_elements(elements, area_km2):
+    counts = {mode: 0 for mode in ENVIRONMENT_MODES}
+    for element in elements:
+        for mode in classify_tags(element.get("tags", {})):
+            counts[mode] += 1
+    # Matching ways per km² of probed area
+    return {mode: counts[mode] / area_km2 for mode in ENVIRONMENT_MODES}
+
+
+# 💾 Tile score cache (memory + cache/environment)
+def _cache_path(tile, radius_m):
+    zoom, x, y = tile
+    return os.path.join(ENVIRONMENT_CACHE_DIR, f"{zoom}_{x}_{y}_r{int(radius_m)}.json")
+
+
+def _load_cached(tile, radius_m, ttl_minutes):
+    key = (tile, int(radius_m))
+    with _lock:
+        cached = _memory_cache.get(key)
+        if cached:
+            _memory_cache.move_to_end(key)
+    if cached and time.time() - cached[0] < ttl_minutes * 60:
+        return cached[1]
+
+    path = _cache_path(tile, radius_m)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl_minutes * 60:
+        try:
+            with open(path, "r") as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            return None
+        _remember(key, os.path.getmtime(path), scores)
+        return scores
+    return None
+
+
+def _remember(key, stored_at, scores):
+    with _lock:
+        _memory_cache[key] = (stored_at, scores)
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_TILES:
+            _memory_cache.popitem(last=False)
+
+
+def _store_cached(tile, radius_m, scores):
+    _remember((tile, int(radius_m)), time.time(), scores)
+    try:
+        os.makedirs(ENVIRONMENT_CACHE_DIR, exist_ok=True)
+        with open(_cache_path(tile, radius_m), "w") as f:
+            json.dump(scores, f)
+    except OSError as e:
+        print(f"⚠️ Could not write environment cache: {e}")
+
+
+# 🌿 Per-mode density scores for the tile containing (lat, lon).
+# run_query(query) returns parsed Overpass JSON or None. Returns None when Overpass is unavailable.
+def environment_scores(lat, lon, run_query, radius=DEFAULT_RADIUS_M, ttl_minutes=ENVIRONMENT_TTL_MINUTES):
+    # Offline tile index first — covered metro areas never touch the network
+    from environment_index import get_environment_index
+    index = get_environment_index()
+    if index is not None and index.covers(lat, lon):
+        return index.scores(lat, lon)
+
+    tile = tile_for(lat, lon)
+    scores = _load_cached(tile, radius, ttl_minutes)
+    if scores is not None:
+        return scores
+
+    bounds = _padded_bounds(tile, radius)
+    result = run_query(build_environment_query(bounds))
+    if result is None:
+        return None
+
+    scores = score_elements(result.get("elements", []), _area_km2(bounds))
+    print(f"🌿 Environment scores for tile {tile_id(tile)}: " + ", ".join(f"{m}={s:.1f}" for m, s in scores.items()))
+    _store_cached(tile, radius, scores)
+    return scores
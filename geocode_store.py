@@ -0,0 +1,137 @@
+# geocode_store.py
+# 🧠 SQLite-backed geocode cache (WAL mode) with a small in-process LRU in front
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+GEOCODE_DB_PATH = "cache/geocode_cache.sqlite3"
+LEGACY_JSON_PATH = "cache/geocode_cache.json"
+GEOCODE_TTL_DAYS = 90
+LRU_SIZE = 512
+
+
+def normalize_address(place_name):
+    # "400 E Morehead St,  Charlotte" and "400 e morehead st, charlotte" share a key
+    return " ".join(str(place_name).replace(",", ", ").split()).lower()
+
+
+class GeocodeStore:
+    def __init__(self, db_path=GEOCODE_DB_PATH, ttl_days=GEOCODE_TTL_DAYS, lru_size=LRU_SIZE):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days else None
+        self.lru_size = lru_size
+        self._lru = OrderedDict()   # key -> (stored_at, coords)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " address_key TEXT PRIMARY KEY,"
+            " place_name TEXT NOT NULL,"
+            " lat REAL NOT NULL,"
+            " lon REAL NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.commit()
+
+        # Expired rows would otherwise only ever be skipped, never dropped
+        purged = self.purge_expired()
+        if purged:
+            print(f"🧹 Purged {purged} expired geocode entries")
+
+    # One connection per thread — Streamlit serves each session on its own thread
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _fresh(self, stored_at):
+        return self.ttl_seconds is None or time.time() - stored_at <= self.ttl_seconds
+
+    def _remember(self, key, stored_at, coords):
+        with self._lock:
+            self._lru[key] = (stored_at, coords)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def get(self, place_name):
+        key = normalize_address(place_name)
+        with self._lock:
+            cached = self._lru.get(key)
+            if cached and self._fresh(cached[0]):
+                self._lru.move_to_end(key)
+                return cached[1]
+
+        row = self._conn().execute(
+            "SELECT lat, lon, stored_at FROM geocode WHERE address_key = ?", (key,)
+        ).fetchone()
+        if not row or not self._fresh(row[2]):
+            return None
+        coords = [row[0], row[1]]
+        self._remember(key, row[2], coords)
+        return coords
+
+    def put(self, place_name, coords):
+        key = normalize_address(place_name)
+        stored_at = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO geocode (address_key, place_name, lat, lon, stored_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(address_key) DO UPDATE SET"
+                " place_name = excluded.place_name, lat = excluded.lat, lon = excluded.lon, stored_at = excluded.stored_at",
+                (key, place_name, float(coords[0]), float(coords[1]), stored_at)
+            )
+        self._remember(key, stored_at, [float(coords[0]), float(coords[1])])
+
+    # 📥 One-time bulk import of the old whole-file JSON cache ({place_name: [lat, lon]}).
+    # A marker in `meta` keeps later startups from re-adding entries that have since expired.
+    def import_json(self, json_path=LEGACY_JSON_PATH):
+        marker = f"imported:{os.path.abspath(json_path)}"
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            return 0
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r") as f:
+            legacy = json.load(f)
+
+        stored_at = time.time()
+        rows = [
+            (normalize_address(name), name, float(coords[0]), float(coords[1]), stored_at)
+            for name, coords in legacy.items() if coords
+        ]
+        with conn:
+            # Existing rows win — they are at least as fresh as the legacy file
+            conn.executemany(
+                "INSERT OR IGNORE INTO geocode (address_key, place_name, lat, lon, stored_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (marker, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(stored_at)))
+            )
+        return len(rows)
+
+    def purge_expired(self):
+        if self.ttl_seconds is None:
+            return 0
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("DELETE FROM geocode WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+        with self._lock:
+            self._lru.clear()
+        return cur.rowcount
@@ -0,0 +1,70 @@
+# gpx_export.py
+# 📁 GPX serialization straight to bytes — streamed in chunks, no per-point GPXTrackPoint objects
+
+import datetime
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from route import Route
+
+GPX_CREATOR = "Where2Run"
+CHUNK_POINTS = 5000
+
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="{creator}" xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd">\n'
+    '  <trk>\n'
+    '    <name>{name}</name>\n'
+    '    <trkseg>\n'
+)
+GPX_FOOTER = "    </trkseg>\n  </trk>\n</gpx>\n"
+
+
+def _timestamps(start_time, seconds, index):
+    return [
+        (start_time + datetime.timedelta(seconds=float(seconds[i]))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for i in index
+    ]
+
+
+# 🚿 Yields the GPX document in byte chunks. Elevation (meters) is written when the route has it;
+# timestamps are written when start_time is given, spaced by distance at pace_min_per_mile.
+def iter_gpx_bytes(coords, name="Where2Run route", start_time=None, pace_min_per_mile=10.0, chunk_points=CHUNK_POINTS):
+    route = Route.from_coords(coords)
+    yield GPX_HEADER.format(creator=GPX_CREATOR, name=escape(name)).encode("utf-8")
+
+    elevation = route.elevation
+    seconds = None
+    if start_time is not None:
+        if start_time.tzinfo is not None:
+            start_time = start_time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        seconds = route.cumulative_m / 1609.34 * pace_min_per_mile * 60
+
+    for start in range(0, len(route), chunk_points):
+        stop = min(start + chunk_points, len(route))
+        lat = np.char.mod("%.7f", route.latlon[start:stop, 0])
+        lon = np.char.mod("%.7f", route.latlon[start:stop, 1])
+
+        if elevation is None and seconds is None:
+            lines = [f'      <trkpt lat="{a}" lon="{b}"/>\n' for a, b in zip(lat, lon)]
+        else:
+            ele = np.char.mod("%.1f", elevation[start:stop]) if elevation is not None else None
+            times = _timestamps(start_time, seconds, range(start, stop)) if seconds is not None else None
+            lines = []
+            for i in range(stop - start):
+                inner = ""
+                if ele is not None:
+                    inner += f"<ele>{ele[i]}</ele>"
+                if times is not None:
+                    inner += f"<time>{times[i]}</time>"
+                lines.append(f'      <trkpt lat="{lat[i]}" lon="{lon[i]}">{inner}</trkpt>\n')
+        yield "".join(lines).encode("utf-8")
+
+    yield GPX_FOOTER.encode("utf-8")
+
+
+def route_to_gpx_bytes(coords, name="Where2Run route", start_time=None, pace_min_per_mile=10.0):
+    return b"".join(iter_gpx_bytes(coords, name=name, start_time=start_time, pace_min_per_mile=pace_min_per_mile))
@@ -0,0 +1,81 @@
+# http_client.py
+# 🌐 One pooled HTTP session for every upstream (ORS, Mapbox, LocationIQ, Overpass) — keep-alive
+# connection pools plus a per-host cap on in-flight requests, shared by the sync backend and the
+# asyncio API (async_backend.py), so many concurrent route requests can't flood a single API
+
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+ORS_HOST = "api.openrouteservice.org"
+
+# Max in-flight requests per host; extra callers wait for a free slot
+HOST_LIMITS = {
+    ORS_HOST: 8,
+    "api.mapbox.com": 10,
+    "us1.locationiq.com": 4,
+}
+DEFAULT_HOST_LIMIT = 4          # Overpass mirrors and anything else
+POOL_CONNECTIONS = 16           # hosts kept in the connection pool
+MAX_RETRIES = 1
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class LimitedSession(requests.Session):
+    def __init__(self, host_limits=None, default_limit=DEFAULT_HOST_LIMIT,
+                 pool_connections=POOL_CONNECTIONS, max_retries=MAX_RETRIES):
+        super().__init__()
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self.default_limit = default_limit
+        self._slots = {}              # host -> BoundedSemaphore
+        self._in_flight = {}          # host -> current in-flight count
+        self._peak = {}               # host -> highest in-flight count seen
+        self._lock = threading.Lock()
+
+        pool_maxsize = max([default_limit, *self.host_limits.values()])
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def _slot(self, host):
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.default_limit))
+            return slot
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(url).netloc
+        slot = self._slot(host)
+        if not slot.acquire(blocking=False):
+            tracing.incr("http.queued")
+            slot.acquire()
+        with self._lock:
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._peak[host] = max(self._peak.get(host, 0), self._in_flight[host])
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight[host] -= 1
+            slot.release()
+
+    def stats(self):
+        with self._lock:
+            return {host: {"limit": self.host_limits.get(host, self.default_limit),
+                           "in_flight": self._in_flight.get(host, 0), "peak": peak}
+                    for host, peak in self._peak.items()}
+
+
+def get_http_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = LimitedSession()
+    return _session
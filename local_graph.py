@@ -0,0 +1,494 @@
+# local_graph.py
+# 🕸️ Local pedestrian routing — memory-mapped CSR street graph, A* for point-to-point legs,
+# and a seeded loop solver that sizes round trips to a target length in one pass
+#
+# Build once from a metro OSM extract (.osm XML, or .osm.pbf with pyosmium):
+#     python local_graph.py charlotte.osm.pbf
+# The graph lands in cache/route_graph/*.npy + meta.json and is picked up by get_directions().
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+import distance_utils as du
+
+ROUTE_GRAPH_DIR = "cache/route_graph"
+GRID_CELL_DEG = 0.01            # node lookup grid (~1.1 km cells)
+MAX_SNAP_METERS = 250           # endpoints farther than this from the graph go to ORS
+WALKING_SPEED_MPS = 5000 / 3600
+
+# 🔁 Loop solver
+LOOP_TOLERANCE_METERS = 1207    # same ±0.75 mi window the generators accept
+OVERLAP_PENALTY = 4.0           # cost multiplier on edges already used by the outbound leg
+TURN_DEGREES = 60               # second waypoint sits this far round from the first (equilateral loop)
+
+# 🛤️ Edge classes and per-profile cost multipliers (inf = not allowed on that profile)
+EDGE_CLASSES = ("path", "street", "arterial", "track", "alpine")
+PROFILE_COSTS = {
+    "foot-walking": (1.0, 1.0, 1.2, 1.1, math.inf),
+    "foot-hiking": (0.9, 1.0, 1.4, 0.8, 1.2),
+}
+
+PATH_HIGHWAYS = {"footway", "pedestrian", "path", "steps", "cycleway", "bridleway", "corridor"}
+STREET_HIGHWAYS = {"residential", "living_street", "service", "unclassified", "road"}
+ARTERIAL_HIGHWAYS = {
+    "tertiary", "tertiary_link", "secondary", "secondary_link", "primary", "primary_link", "trunk", "trunk_link",
+}
+EASY_SAC_SCALES = {"hiking"}
+
+_graph = None
+_graph_loaded = False
+_graph_lock = threading.Lock()
+
+
+def edge_class(tags):
+    # Index into EDGE_CLASSES, or None when the way is not walkable
+    highway = tags.get("highway")
+    if not highway or tags.get("foot") == "no":
+        return None
+    if tags.get("access") in ("private", "no") and tags.get("foot") not in ("yes", "designated"):
+        return None
+    if tags.get("area") == "yes":
+        return None
+    sac_scale = tags.get("sac_scale")
+    if sac_scale and sac_scale not in EASY_SAC_SCALES:
+        return 4
+    if highway == "track":
+        return 3
+    if highway == "path" and tags.get("surface") in ("dirt", "ground", "grass", "gravel", "unpaved", "earth", "mud"):
+        return 3
+    if highway in PATH_HIGHWAYS:
+        return 0
+    if highway in STREET_HIGHWAYS:
+        return 1
+    if highway in ARTERIAL_HIGHWAYS:
+        return 2
+    return None
+
+
+def grid_key(lat, lon, cell_deg=GRID_CELL_DEG):
+    row = np.floor((np.asarray(lat) + 90) / cell_deg).astype(np.int64)
+    col = np.floor((np.asarray(lon) + 180) / cell_deg).astype(np.int64)
+    return (row << 32) | col
+
+
+# 🔍 Lookup side
+class RouteGraph:
+    def __init__(self, graph_dir=ROUTE_GRAPH_DIR):
+        with open(os.path.join(graph_dir, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.cell_deg = self.meta["cell_deg"]
+        self.bounds = self.meta["bounds"]   # [south, west, north, east]
+
+        load = lambda name: np.load(os.path.join(graph_dir, f"{name}.npy"), mmap_mode="r")
+        self.latlon = load("latlon")          # (N, 2) float64, nodes sorted by grid cell
+        self.indptr = load("indptr")          # (N + 1,) int64
+        self.indices = load("indices")        # (E,) int32 neighbor node ids
+        self.length_m = load("length_m")      # (E,) float32
+        self.edge_class = load("edge_class")  # (E,) uint8 into EDGE_CLASSES
+        self.cell_keys = load("cell_keys")    # sorted unique grid keys
+        self.cell_start = load("cell_start")  # node offset of each cell (+ end sentinel)
+
+        # memoryviews hand back plain Python numbers, which keeps the A* inner loop cheap
+        self._indptr = memoryview(np.ascontiguousarray(self.indptr))
+        self._indices = memoryview(np.ascontiguousarray(self.indices))
+        self._lat = memoryview(np.ascontiguousarray(self.latlon[:, 0]))
+        self._lon = memoryview(np.ascontiguousarray(self.latlon[:, 1]))
+        self._length = memoryview(np.ascontiguousarray(self.length_m, dtype=np.float64))
+        self._costs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def node_count(self):
+        return len(self.latlon)
+
+    def covers(self, lat, lon):
+        south, west, north, east = self.bounds
+        return south <= lat <= north and west <= lon <= east
+
+    def _profile_costs(self, profile):
+        # Per-edge cost in meters for a profile, computed once and kept in memory
+        costs = self._costs.get(profile)
+        if costs is None:
+            with self._lock:
+                costs = self._costs.get(profile)
+                if costs is None:
+                    factors = np.asarray(PROFILE_COSTS[profile], dtype=np.float64)
+                    costs = memoryview(self.length_m.astype(np.float64) * factors[self.edge_class])
+                    self._costs[profile] = costs
+        return costs
+
+    def nearest_node(self, lat, lon, max_snap_m=MAX_SNAP_METERS):
+        center = int(grid_key(lat, lon, self.cell_deg))
+        row, col = center >> 32, center & 0xFFFFFFFF
+        candidates = []
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                key = ((row + dr) << 32) | (col + dc)
+                i = int(np.searchsorted(self.cell_keys, key))
+                if i < len(self.cell_keys) and self.cell_keys[i] == key:
+                    candidates.append(np.arange(self.cell_start[i], self.cell_start[i + 1]))
+        if not candidates:
+            return None
+        nodes = np.concatenate(candidates)
+        pts = self.latlon[nodes]
+        dlat = np.radians(pts[:, 0] - lat)
+        dlon = np.radians(pts[:, 1] - lon) * math.cos(math.radians(lat))
+        dist = np.hypot(dlat, dlon) * du.EARTH_RADIUS_M
+        best = int(np.argmin(dist))
+        return int(nodes[best]) if dist[best] <= max_snap_m else None
+
+    def _heuristic_scale(self, profile):
+        return min(f for f in PROFILE_COSTS[profile] if math.isfinite(f)) * 0.999
+
+    def shortest_path(self, source, target, profile="foot-walking"):
+        # A* over the CSR graph; returns (node list, profile-weighted meters) or (None, inf)
+        if source == target:
+            return [source], 0.0
+        costs = self._profile_costs(profile)
+        indptr, indices, lat, lon = self._indptr, self._indices, self._lat, self._lon
+        scale = self._heuristic_scale(profile) * du.EARTH_RADIUS_M
+        t_lat, t_lon = math.radians(lat[target]), math.radians(lon[target])
+        cos_t = math.cos(t_lat)
+
+        def h(node):
+            n_lat, n_lon = math.radians(lat[node]), math.radians(lon[node])
+            a = math.sin((t_lat - n_lat) / 2) ** 2 + math.cos(n_lat) * cos_t * math.sin((t_lon - n_lon) / 2) ** 2
+            return 2 * scale * math.asin(min(1.0, math.sqrt(a)))
+
+        best = {source: 0.0}
+        parent = {source: -1}
+        heap = [(h(source), 0.0, source)]
+        done = set()
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in done:
+                continue
+            done.add(node)
+            for e in range(indptr[node], indptr[node + 1]):
+                cost = costs[e]
+                if cost == math.inf:
+                    continue
+                nxt = indices[e]
+                ng = g + cost
+                if ng < best.get(nxt, math.inf):
+                    best[nxt] = ng
+                    parent[nxt] = node
+                    heapq.heappush(heap, (ng + h(nxt), ng, nxt))
+        else:
+            return None, math.inf
+
+        path = [target]
+        while parent[path[-1]] != -1:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path, best[target]
+
+    def route_nodes(self, latlon_points, profile="foot-walking"):
+        # Node path through each waypoint in order, or None if any leg cannot be routed locally
+        if profile not in PROFILE_COSTS:
+            return None
+        snapped = []
+        for lat, lon in latlon_points:
+            if not self.covers(lat, lon):
+                return None
+            node = self.nearest_node(lat, lon)
+            if node is None:
+                return None
+            snapped.append(node)
+
+        nodes = [snapped[0]]
+        for source, target in zip(snapped[:-1], snapped[1:]):
+            path, _ = self.shortest_path(source, target, profile)
+            if path is None:
+                return None
+            nodes.extend(path[1:])
+        return nodes
+
+    def directions(self, coordinates, profile="foot-walking", format="geojson"):
+        # Same shape as an ORS geojson directions response, or None so the caller falls back to ORS
+        if format != "geojson" or len(coordinates) < 2:
+            return None
+        nodes = self.route_nodes([(lat, lon) for lon, lat in coordinates], profile)
+        if nodes is None:
+            return None
+        latlon = np.asarray(self.latlon[nodes])
+        distance = float(du.haversine_segments(latlon).sum())
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": latlon[:, ::-1].tolist()},
+                "properties": {
+                    "summary": {"distance": distance, "duration": distance / WALKING_SPEED_MPS},
+                    "source": "local_graph",
+                },
+            }],
+        }
+
+
+    # 🔁 Loops of a requested length, solved directly on the graph
+    def _dijkstra(self, source, profile, max_length_m, penalized=None):
+        # One-to-all search bounded by real path length; returns ({node: meters}, {node: parent})
+        costs = self._profile_costs(profile)
+        indptr, indices, length = self._indptr, self._indices, self._length
+        best = {source: 0.0}
+        meters = {source: 0.0}
+        parent = {source: -1}
+        settled = {}
+        heap = [(0.0, source)]
+        while heap:
+            g, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = meters[node]
+            if meters[node] > max_length_m:
+                continue
+            for e in range(indptr[node], indptr[node + 1]):
+                cost = costs[e]
+                if cost == math.inf:
+                    continue
+                nxt = indices[e]
+                if penalized and ((node, nxt) in penalized or (nxt, node) in penalized):
+                    cost *= OVERLAP_PENALTY
+                ng = g + cost
+                if ng < best.get(nxt, math.inf):
+                    best[nxt] = ng
+                    meters[nxt] = meters[node] + length[e]
+                    parent[nxt] = node
+                    heapq.heappush(heap, (ng, nxt))
+        return settled, parent
+
+    @staticmethod
+    def _path_to(parent, node):
+        path = [node]
+        while parent[path[-1]] != -1:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
+
+    def _bearings(self, source, nodes):
+        lat0 = math.radians(self._lat[source])
+        pts = self.latlon[nodes]
+        dy = np.radians(pts[:, 0]) - lat0
+        dx = (np.radians(pts[:, 1]) - math.radians(self._lon[source])) * math.cos(lat0)
+        return np.degrees(np.arctan2(dx, dy)) % 360
+
+    @staticmethod
+    def _angle_off(bearings, heading):
+        return np.abs((bearings - heading + 180) % 360 - 180)
+
+    def round_trip(self, lat, lon, length_m, profile="foot-walking", seed=0, tolerance_m=LOOP_TOLERANCE_METERS):
+        # Triangle loop start → A → B → start sized to length_m in one solve.
+        # The seed picks the heading and turn direction, so the same seed always gives the same loop.
+        # Returns ((N, 2) lat/lon array, meters) or None when the graph cannot host the loop.
+        if profile not in PROFILE_COSTS or length_m <= 0 or not self.covers(lat, lon):
+            return None
+        source = self.nearest_node(lat, lon)
+        if source is None:
+            return None
+        rng = random.Random(seed)
+        heading = rng.uniform(0, 360)
+        turn = rng.choice((-1, 1))
+
+        # Outbound leg: the node ~1/3 of the loop away, as close to the seeded heading as possible
+        from_start, start_parent = self._dijkstra(source, profile, length_m * 0.5)
+        nodes = np.fromiter(from_start.keys(), dtype=np.int64, count=len(from_start))
+        meters = np.fromiter(from_start.values(), dtype=np.float64, count=len(from_start))
+        if len(nodes) < 3:
+            return None
+        off_heading = self._angle_off(self._bearings(source, nodes), heading)
+        a_score = np.abs(meters - length_m / 3) + (off_heading > 30) * length_m
+        waypoint_a = int(nodes[int(np.argmin(a_score))])
+        outbound = self._path_to(start_parent, waypoint_a)
+        out_edges = set(zip(outbound[:-1], outbound[1:]))
+
+        # Middle and return legs both avoid the outbound streets, so the loop doesn't retrace a shared stem
+        from_a, a_parent = self._dijkstra(waypoint_a, profile, length_m * 0.6, penalized=out_edges)
+        to_start, return_parent = self._dijkstra(source, profile, length_m * 0.5, penalized=out_edges)
+        outbound_nodes = set(outbound)
+        candidates = np.array(
+            [n for n in from_a if n in to_start and n not in outbound_nodes], dtype=np.int64
+        )
+        if not len(candidates):
+            return None
+        totals = from_start[waypoint_a] + np.array([from_a[n] + to_start[n] for n in candidates.tolist()])
+        error = np.abs(totals - length_m)
+        off_turn = self._angle_off(self._bearings(source, candidates), heading + turn * TURN_DEGREES)
+        in_sector = off_turn <= 45
+        if in_sector.any() and error[in_sector].min() <= tolerance_m:
+            error = np.where(in_sector, error, np.inf)
+        waypoint_b = int(candidates[int(np.argmin(error))])
+
+        middle = self._path_to(a_parent, waypoint_b)
+        used_edges = out_edges | set(zip(middle[:-1], middle[1:]))
+        to_start, return_parent = self._dijkstra(source, profile, length_m * 0.5, penalized=used_edges)
+        if waypoint_b not in to_start:
+            return None
+        inbound = self._path_to(return_parent, waypoint_b)[::-1]
+        nodes = outbound + middle[1:] + inbound[1:]
+        latlon = np.asarray(self.latlon[nodes])
+        total = float(du.haversine_segments(latlon).sum())
+        if abs(total - length_m) > tolerance_m:
+            return None   # the graph around the start can't host a loop this long (or short)
+        return latlon, total
+
+
+def get_route_graph(graph_dir=ROUTE_GRAPH_DIR):
+    # Loaded lazily once per process; a missing graph just means "always use ORS"
+    global _graph, _graph_loaded
+    if _graph_loaded:
+        return _graph
+    with _graph_lock:
+        if not _graph_loaded:
+            if os.path.exists(os.path.join(graph_dir, "meta.json")):
+                try:
+                    _graph = RouteGraph(graph_dir)
+                    print(f"🕸️ Loaded local route graph: {_graph.node_count} nodes, {len(_graph.indices)} edges")
+                except Exception as e:
+                    print(f"⚠️ Could not load local route graph: {e}")
+            _graph_loaded = True
+    return _graph
+
+
+# 🏗️ Build side — each reader yields (node refs, tags) per walkable way and fills node_coords
+def _iter_osm_xml(path, node_coords):
+    way_refs, way_tags = None, None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "way":
+                way_refs, way_tags = [], {}
+            continue
+
+        if elem.tag == "node":
+            node_coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "nd" and way_refs is not None:
+            way_refs.append(int(elem.get("ref")))
+        elif elem.tag == "tag" and way_tags is not None:
+            way_tags[elem.get("k")] = elem.get("v")
+        elif elem.tag == "way":
+            if edge_class(way_tags) is not None:
+                yield way_refs, way_tags
+            way_refs, way_tags = None, None
+            elem.clear()
+
+
+def _iter_osm_pbf(path, node_coords):
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("❌ Reading .osm.pbf extracts needs pyosmium (pip install osmium).")
+
+    ways = []
+
+    class WayHandler(osmium.SimpleHandler):
+        def way(self, w):
+            tags = {tag.k: tag.v for tag in w.tags}
+            if edge_class(tags) is None:
+                return
+            refs = []
+            for n in w.nodes:
+                if n.location.valid():
+                    node_coords[n.ref] = (n.location.lat, n.location.lon)
+                    refs.append(n.ref)
+            ways.append((refs, tags))
+
+    WayHandler().apply_file(path, locations=True)
+    yield from ways
+
+
+def build_graph(source_path, out_dir=ROUTE_GRAPH_DIR, cell_deg=GRID_CELL_DEG):
+    reader = _iter_osm_pbf if source_path.endswith(".pbf") else _iter_osm_xml
+
+    node_coords = {}
+    edge_src, edge_dst, edge_cls = [], [], []
+    node_ids = {}
+    for refs, tags in reader(source_path, node_coords):
+        cls = edge_class(tags)
+        refs = [ref for ref in refs if ref in node_coords]
+        for a, b in zip(refs[:-1], refs[1:]):
+            if a == b:
+                continue
+            # Pedestrians ignore oneway — store both directions
+            ia = node_ids.setdefault(a, len(node_ids))
+            ib = node_ids.setdefault(b, len(node_ids))
+            edge_src += (ia, ib)
+            edge_dst += (ib, ia)
+            edge_cls += (cls, cls)
+
+    if not node_ids:
+        raise ValueError(f"❌ No walkable ways found in {source_path}")
+
+    latlon = np.empty((len(node_ids), 2), dtype=np.float64)
+    for osm_id, i in node_ids.items():
+        latlon[i] = node_coords[osm_id]
+    edge_src = np.asarray(edge_src, dtype=np.int64)
+    edge_dst = np.asarray(edge_dst, dtype=np.int64)
+    edge_cls = np.asarray(edge_cls, dtype=np.uint8)
+
+    # Renumber nodes by grid cell so each cell is a contiguous node range (and neighbors share pages)
+    keys = grid_key(latlon[:, 0], latlon[:, 1], cell_deg)
+    order = np.argsort(keys, kind="stable")
+    new_id = np.empty_like(order)
+    new_id[order] = np.arange(len(order))
+    latlon, keys = latlon[order], keys[order]
+    edge_src, edge_dst = new_id[edge_src], new_id[edge_dst]
+
+    # CSR adjacency sorted by source node
+    edge_order = np.lexsort((edge_dst, edge_src))
+    edge_src, edge_dst, edge_cls = edge_src[edge_order], edge_dst[edge_order], edge_cls[edge_order]
+    indptr = np.zeros(len(latlon) + 1, dtype=np.int64)
+    np.add.at(indptr, edge_src + 1, 1)
+    indptr = np.cumsum(indptr)
+    lengths = du.haversine_segments(np.stack([latlon[edge_src], latlon[edge_dst]], axis=1).reshape(-1, 2))[::2]
+
+    cell_keys, cell_start = np.unique(keys, return_index=True)
+    cell_start = np.append(cell_start, len(latlon)).astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "latlon": latlon,
+        "indptr": indptr,
+        "indices": edge_dst.astype(np.int32),
+        "length_m": lengths.astype(np.float32),
+        "edge_class": edge_cls,
+        "cell_keys": cell_keys.astype(np.int64),
+        "cell_start": cell_start,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array)
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({
+            "cell_deg": cell_deg,
+            "bounds": [float(latlon[:, 0].min()), float(latlon[:, 1].min()),
+                       float(latlon[:, 0].max()), float(latlon[:, 1].max())],
+            "edge_classes": list(EDGE_CLASSES),
+            "profiles": list(PROFILE_COSTS),
+            "nodes": int(len(latlon)),
+            "edges": int(len(edge_dst)),
+            "source": os.path.basename(source_path),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }, f, indent=2)
+
+    print(f"✅ Route graph built: {len(latlon)} nodes, {len(edge_dst)} edges → {out_dir}")
+    return len(latlon), len(edge_dst)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local pedestrian routing graph from an OSM extract.")
+    parser.add_argument("source", help=".osm or .osm.pbf extract")
+    parser.add_argument("--out", default=ROUTE_GRAPH_DIR, help=f"output directory (default {ROUTE_GRAPH_DIR})")
+    parser.add_argument("--cell-deg", type=float, default=GRID_CELL_DEG, help="node lookup grid cell size in degrees")
+    args = parser.parse_args()
+    build_graph(args.source, args.out, args.cell_deg)
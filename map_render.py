@@ -0,0 +1,88 @@
+# map_render.py
+# 🗺️ Compact route rendering — Douglas-Peucker simplification + a few color-bucketed polylines
+
+import math
+
+import numpy as np
+
+COLOR_BUCKETS = 12            # distinct elevation colors → at most this many Leaflet layers
+SIMPLIFY_ZOOM = 16            # keep detail that is visible up to this zoom level
+SIMPLIFY_TOLERANCE_PX = 1.0
+
+
+def meters_per_pixel(lat, zoom):
+    return 156543.03392 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+# ✂️ Douglas-Peucker on (lat, lon) — returns the sorted indices of the points to keep
+def douglas_peucker_indices(latlon, tolerance_m):
+    latlon = np.asarray(latlon, dtype=np.float64)
+    n = len(latlon)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+
+    # Local equirectangular projection is plenty accurate at route scale
+    lat0 = math.radians(latlon[:, 0].mean())
+    xy = np.empty((n, 2))
+    xy[:, 0] = np.radians(latlon[:, 1]) * math.cos(lat0) * 6371008.8
+    xy[:, 1] = np.radians(latlon[:, 0]) * 6371008.8
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = xy[start], xy[end]
+        seg = b - a
+        pts = xy[start + 1:end] - a
+        seg_len = math.hypot(seg[0], seg[1])
+        if seg_len == 0:
+            dists = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            dists = np.abs(seg[0] * pts[:, 1] - seg[1] * pts[:, 0]) / seg_len
+        i = int(np.argmax(dists))
+        if dists[i] > tolerance_m:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def simplify_for_zoom(latlon, zoom=SIMPLIFY_ZOOM, tolerance_px=SIMPLIFY_TOLERANCE_PX):
+    latlon = np.asarray(latlon, dtype=np.float64)
+    if len(latlon) <= 2:
+        return np.arange(len(latlon))
+    tolerance_m = tolerance_px * meters_per_pixel(float(latlon[:, 0].mean()), zoom)
+    return douglas_peucker_indices(latlon, tolerance_m)
+
+
+# 🎨 Group simplified segments by color bucket: {bucket: [[(lat, lon), ...], ...]}
+def bucketed_polylines(latlon, color_scale, buckets=COLOR_BUCKETS, zoom=SIMPLIFY_ZOOM):
+    latlon = np.asarray(latlon, dtype=np.float64)
+    color_scale = np.asarray(color_scale, dtype=np.float64)
+    kept = simplify_for_zoom(latlon, zoom=zoom)
+    if len(kept) < 2:
+        return {}
+
+    # Each simplified segment takes the average color of the original segments it replaces
+    seg_sums = np.concatenate(([0.0], np.cumsum(color_scale[:-1])))
+    seg_colors = (seg_sums[kept[1:]] - seg_sums[kept[:-1]]) / (kept[1:] - kept[:-1])
+    seg_buckets = np.minimum((seg_colors * buckets).astype(int), buckets - 1)
+
+    points = latlon[kept].tolist()
+    lines = {}
+    run_start = 0
+    for i in range(1, len(seg_buckets) + 1):
+        # Close the run when the bucket changes (or at the end); consecutive runs share endpoints
+        if i == len(seg_buckets) or seg_buckets[i] != seg_buckets[run_start]:
+            lines.setdefault(int(seg_buckets[run_start]), []).append(points[run_start:i + 1])
+            run_start = i
+    return lines
+
+
+def bucket_value(bucket, buckets=COLOR_BUCKETS):
+    # Bucket midpoint on the 0..1 color scale
+    return (bucket + 0.5) / buckets
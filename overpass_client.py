@@ -0,0 +1,138 @@
+# overpass_client.py
+# 🛰️ Hedged Overpass requests — race mirrors, track per-endpoint health, trip a circuit breaker on bad ones
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+import tracing
+
+HEDGE_DELAY_S = 2.0          # start the next mirror if the first hasn't answered by then
+REQUEST_TIMEOUT_S = 30
+EWMA_ALPHA = 0.3
+FAILURE_THRESHOLD = 3        # consecutive failures before the circuit opens
+CIRCUIT_OPEN_S = 120
+
+
+class EndpointHealth:
+    def __init__(self, url):
+        self.url = url
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, ok, latency_s, alpha=EWMA_ALPHA, failure_threshold=FAILURE_THRESHOLD, open_s=CIRCUIT_OPEN_S):
+        self.requests += 1
+        self.error_ewma = alpha * (0.0 if ok else 1.0) + (1 - alpha) * self.error_ewma
+        if ok:
+            self.latency_ewma = latency_s if self.latency_ewma is None else alpha * latency_s + (1 - alpha) * self.latency_ewma
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= failure_threshold:
+                self.open_until = time.time() + open_s
+
+    def is_open(self):
+        return time.time() < self.open_until
+
+    def score(self):
+        # Lower is better: expected latency, inflated by recent error rate
+        latency = self.latency_ewma if self.latency_ewma is not None else 1.0
+        return latency * (1 + 4 * self.error_ewma)
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "latency_ewma_s": self.latency_ewma,
+            "error_ewma": self.error_ewma,
+            "requests": self.requests,
+            "failures": self.failures,
+            "circuit_open": self.is_open(),
+        }
+
+
+class OverpassClient:
+    def __init__(self, endpoints, hedge_delay_s=HEDGE_DELAY_S, timeout=REQUEST_TIMEOUT_S, session=None):
+        self.hedge_delay_s = hedge_delay_s
+        self.timeout = timeout
+        self.health = {url: EndpointHealth(url) for url in endpoints}
+        self.order = list(endpoints)
+        self.last_endpoint = None
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+
+    def ranked_endpoints(self):
+        with self._lock:
+            closed = [url for url in self.order if not self.health[url].is_open()]
+            if not closed:
+                # Everything tripped — half-open the one that has been resting longest
+                closed = [min(self.order, key=lambda url: self.health[url].open_until)]
+            return sorted(closed, key=lambda url: (self.health[url].score(), self.order.index(url)))
+
+    def _fetch(self, url, query):
+        started = time.monotonic()
+        with tracing.span("overpass.fetch", endpoint=url) as span:
+            try:
+                resp = self.session.get(url, params={"data": query}, timeout=self.timeout)
+                resp.raise_for_status()
+                span.incr("bytes", len(resp.content))
+                result = resp.json()
+            except Exception as e:
+                span.set("error", str(e))
+                with self._lock:
+                    self.health[url].record(False, time.monotonic() - started)
+                print(f"Overpass API failed at {url}: {e}")
+                return None
+        with self._lock:
+            self.health[url].record(True, time.monotonic() - started)
+        return result
+
+    def query(self, query):
+        endpoints = self.ranked_endpoints()
+        executor = ThreadPoolExecutor(max_workers=len(endpoints), thread_name_prefix="where2run-overpass")
+        in_flight = {}
+        launched = 0
+
+        def launch_next():
+            nonlocal launched
+            url = endpoints[launched]
+            in_flight[executor.submit(tracing.bind(self._fetch), url, query)] = url
+            launched += 1
+
+        try:
+            launch_next()
+            while in_flight:
+                hedge = launched < len(endpoints)
+                done, _ = wait(in_flight, timeout=self.hedge_delay_s if hedge else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    print(f"⏳ Overpass slow at {in_flight[next(iter(in_flight))]} — hedging with {endpoints[launched]}")
+                    launch_next()
+                    continue
+
+                for future in done:
+                    url = in_flight.pop(future)
+                    result = future.result()
+                    if result is not None:
+                        self.last_endpoint = url
+                        return result
+
+                # A failure is as good as a timeout for starting the next mirror
+                if launched < len(endpoints):
+                    launch_next()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "last_endpoint": self.last_endpoint,
+                "endpoints": [self.health[url].as_dict() for url in self.order],
+            }
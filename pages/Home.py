@@ -1,10 +1,67 @@
 # app.py (FINAL Polished UI + Tabs + Large Map + Safe Download + Session State)
 
+import contextlib
+import functools
+import uuid
+
 import streamlit as st
 import Where2Run_backend as wr
+import tracing
 from streamlit.components.v1 import html
 from streamlit_searchbox import st_searchbox
 
+# 🖼️ Route display — map, summary, charts and GPX come from the backend render cache,
+# so reruns of an already-generated route skip elevation, plotting and GPX work
+def show_route(route_coords, download_key):
+    rendered = wr.render_route(route_coords)
+
+    if rendered.map_html:
+        html(rendered.map_html, height=rendered.map_height, scrolling=True)
+    else:
+        st.warning("⚠️ Elevation data unavailable — map and charts skipped.")
+
+    st.markdown(rendered.summary_markdown)
+    st.caption("📌 Routes start from the nearest shared start point (within ~75 m of your location) "
+               "so nearby runners reuse cached routes — 🎲 gives you a different one.")
+
+    if rendered.charts:
+        with st.expander("📈 Elevation Charts (click to expand)"):
+            for chart_png in rendered.charts.values():
+                st.image(chart_png, use_column_width=True)
+
+    st.download_button(label="Download GPX", data=rendered.gpx_bytes, file_name="Where2Run_route.gpx", key=download_key)
+
+
+# ⌨️ Each searchbox gets its own stale-query channel, per browser session, so typing in one box
+# (or another user's box) never cancels a search in flight for a different widget
+st.session_state.setdefault("search_session_id", uuid.uuid4().hex)
+
+def search_channel(widget_key):
+    return functools.partial(wr.search_places, channel=f"{st.session_state.search_session_id}:{widget_key}")
+
+
+# 🔬 Optional debug panel — where this session's last request spent its time (span timings, cache
+# hits, bytes). The trace is kept in session_state; tracing's recent-trace buffer is process-wide.
+show_debug = st.sidebar.checkbox("🔬 Show debug panel", key="debug_panel")
+
+@contextlib.contextmanager
+def traced_request(name):
+    with tracing.trace(name) as root:
+        st.session_state.debug_trace = root.trace
+        yield root
+
+def show_debug_panel():
+    if not show_debug:
+        return
+    last = st.session_state.get("debug_trace")
+    if last is None or last.wall_ms is None:
+        st.sidebar.caption("No traced requests yet — generate a route.")
+        return
+    with st.sidebar.expander(f"🔬 {last.name} — {last.wall_ms:.0f} ms", expanded=True):
+        st.dataframe(last.summary(), use_container_width=True)
+        st.code(last.tree())
+
+
 # App title
 st.markdown("<h1 style='text-align: center;'>🏃‍♂️ Where2Run - Run Route Generator</h1>", unsafe_allow_html=True)
 st.markdown("### 🚗 Powered by OpenRouteService + OpenStreetMap + Elevation Data")
@@ -24,7 +81,8 @@ with tab_loop:
     with st.container():
         # 📍 Searchbox Input (Mapbox UI — returns lat/lon and stores label)
         st_searchbox(
-            search_function=wr.search_places,
+            search_function=search_channel("loop_start_search"),
+            debounce=wr.AUTOCOMPLETE_DEBOUNCE_MS,
             placeholder="Start typing your starting address (e.g., 400 E Morehead St, Charlotte, NC)",
             label="📍 Enter your starting location",
             key="loop_start_search"
@@ -43,8 +101,14 @@ with tab_loop:
             key="loop_distance"
         )
 
-        # 🌉 Bridges preset
-        use_preset = st.checkbox("🌉 Include Bridges preset?", key="loop_preset")
+        # 🧭 Preset route picker — presets starting near the start location (all of them until one is set)
+        preset_choices = {"None": None}
+        for meta, meters_away in wr.nearby_presets(start_coords):
+            away = f", starts {meters_away / 1609.34:.1f} mi away" if meters_away is not None else ""
+            preset_choices[f"{meta['label']} ({meta['length_m'] / 1609.34:.1f} mi{away})"] = meta["name"]
+        preset_name = preset_choices[st.selectbox("🧭 Include a preset route?", list(preset_choices), key="loop_preset")]
+        if start_coords and len(preset_choices) == 1:
+            st.caption(f"No preset routes start within {wr.PRESET_RADIUS_MILES:.0f} miles of this location.")
 
         # 🧭 Route Environment Preference (Expanded Options)
         route_env = st.selectbox(
@@ -60,7 +124,8 @@ with tab_loop:
 
         if include_destination:
             st_searchbox(
-                search_function=wr.search_places,
+                search_function=search_channel("loop_dest_search"),
+                debounce=wr.AUTOCOMPLETE_DEBOUNCE_MS,
                 placeholder="Enter destination location (e.g., Freedom Park, Charlotte, NC)",
                 label="🏁 Destination address",
                 key="loop_dest_search"
@@ -73,10 +138,17 @@ with tab_loop:
 
     st.markdown("---")
 
-    if st.button("Generate Loop Route 🚀", key="loop_button"):
+    # 🎲 Same inputs → same (shared, cached) route; re-rolling asks for the next variant
+    generate_col, reroll_col = st.columns([3, 2])
+    generate = generate_col.button("Generate Loop Route 🚀", key="loop_button")
+    if reroll_col.button("🎲 Try a different route", key="loop_reroll"):
+        st.session_state.loop_variant = st.session_state.get("loop_variant", 0) + 1
+        generate = True
+
+    if generate:
         if start_coords:
-            with st.spinner("Generating loop route..."):
-                preset_coords = wr.bridges_route_coords if use_preset else None
+            with st.spinner("Generating loop route..."), traced_request("request.loop"):
+                preset_coords = wr.get_preset_route(preset_name) if preset_name else None
 
                 if include_destination and destination_coords:
                     route_coords = wr.generate_loop_with_included_destination_v3(
@@ -84,39 +156,28 @@ with tab_loop:
                         target_miles=distance_miles,
                         dest_coords=destination_coords,
                         bridges_coords=preset_coords,
-                        route_environment=route_env 
+                        route_environment=route_env,
+                        variant=st.session_state.get("loop_variant", 0)
                     )
                 else:
                     route_coords = wr.generate_loop_route_with_preset_retry(
                         start_coords=start_coords,
                         distance_miles=distance_miles,
                         bridges_coords=preset_coords,
-                        route_environment=route_env
+                        route_environment=route_env,
+                        variant=st.session_state.get("loop_variant", 0)
                     )
 
+                st.session_state.loop_route = route_coords
                 if route_coords:
-                    elevation_data = wr.get_elevation_for_coords(route_coords)
-                    m = wr.plot_route_with_elevation(route_coords, elevation_data)
-
-                    route_length_miles = wr.calculate_route_distance(route_coords) / 1609.34
-                    map_height = min(800, 400 + int(route_length_miles * 20))
-
-                    html(m.get_root().render(), height=map_height, scrolling=True)
-
-                    wr.print_run_summary(route_coords, elevation_data, st)
-
-                    with st.expander("📈 Elevation Charts (click to expand)"):
-                        st.pyplot(wr.plot_elevation_area_chart(elevation_data))
-                        st.pyplot(wr.plot_cumulative_elevation_gain(elevation_data))
-                        st.pyplot(wr.plot_moving_average_grade(elevation_data))
-
-                    wr.save_route_as_gpx(route_coords, filename="Where2Run_route.gpx")
-                    with open("Where2Run_route.gpx", "rb") as file:
-                        st.download_button(label="Download GPX", data=file, file_name="Where2Run_route.gpx", key="loop_gpx_download")
+                    show_route(route_coords, download_key="loop_gpx_download")
                 else:
                     st.error("❌ Route could not be generated.")
         else:
             st.error("❌ Please enter a valid starting location.")
+    # 🔁 Reruns (widget changes, downloads) re-display the last route from the render cache
+    elif st.session_state.get("loop_route"):
+        show_route(st.session_state.loop_route, download_key="loop_gpx_download")
 
 
 
@@ -127,7 +188,8 @@ with tab_out_and_back:
     with st.container():
         # 📍 Start Location with Mapbox Searchbox
         st_searchbox(
-            search_function=wr.search_places,
+            search_function=search_channel("out_start_search"),
+            debounce=wr.AUTOCOMPLETE_DEBOUNCE_MS,
             placeholder="📍 Start typing your location (e.g., 400 E Morehead St, Charlotte, NC)",
             label="Starting Location",
             key="out_start_search"
@@ -160,36 +222,26 @@ with tab_out_and_back:
 
     st.markdown("---")
 
-    if st.button("Generate Out-and-Back Route 🚀", key="out_button"):
+    generate_col, reroll_col = st.columns([3, 2])
+    generate = generate_col.button("Generate Out-and-Back Route 🚀", key="out_button")
+    if reroll_col.button("🎲 Try a different route", key="out_reroll"):
+        st.session_state.out_variant = st.session_state.get("out_variant", 0) + 1
+        generate = True
+
+    if generate:
         if start_coords:
-            with st.spinner("Generating out-and-back route..."):
+            with st.spinner("Generating out-and-back route..."), traced_request("request.out_and_back"):
                 try:
                     route_coords = wr.generate_out_and_back_directional_route(
                         start_coords=start_coords,
                         distance_miles=distance_miles,
                         direction=direction_preference.lower() if direction_preference != "None" else "n",
-                        route_environment=route_env
+                        route_environment=route_env,
+                        variant=st.session_state.get("out_variant", 0)
                     )
+                    st.session_state.out_route = route_coords
                     if route_coords:
-                        elevation_data = wr.get_elevation_for_coords(route_coords)
-                        m = wr.plot_route_with_elevation(route_coords, elevation_data)
-
-                        route_length_miles = wr.calculate_route_distance(route_coords) / 1609.34
-                        map_height = min(800, 400 + int(route_length_miles * 20))
-
-                        map_html = m.get_root().render()
-                        html(map_html, height=map_height, scrolling=True)
-
-                        wr.print_run_summary(route_coords, elevation_data, st)
-
-                        with st.expander("📈 Elevation Charts (click to expand)"):
-                            st.pyplot(wr.plot_elevation_area_chart(elevation_data))
-                            st.pyplot(wr.plot_cumulative_elevation_gain(elevation_data))
-                            st.pyplot(wr.plot_moving_average_grade(elevation_data))
-
-                        wr.save_route_as_gpx(route_coords, filename="Where2Run_route.gpx")
-                        with open("Where2Run_route.gpx", "rb") as file:
-                            st.download_button(label="Download GPX", data=file, file_name="Where2Run_route.gpx", key="out_gpx_download")
+                        show_route(route_coords, download_key="out_gpx_download")
                     else:
                         st.error("❌ Route could not be generated.")
                         st.info("Try changing direction, distance, or environment preference.")
@@ -204,6 +256,8 @@ with tab_out_and_back:
                     st.code(str(e))
         else:
             st.error("❌ Please enter a valid starting location.")
+    elif st.session_state.get("out_route"):
+        show_route(st.session_state.out_route, download_key="out_gpx_download")
 
 
 # --- DESTINATION TAB ---
@@ -217,13 +271,15 @@ with tab_destination:
     with st.container():
         # 📍 Searchbox Inputs (Mapbox UI — returns lat/lon and stores label)
         st_searchbox(
-            search_function=wr.search_places,
+            search_function=search_channel("dest_start_search"),
+            debounce=wr.AUTOCOMPLETE_DEBOUNCE_MS,
             placeholder="Start typing your starting address (e.g., 400 E Morehead St, Charlotte, NC)",
             label="📍 Enter your starting location",
             key="dest_start_search"
         )
         st_searchbox(
-            search_function=wr.search_places,
+            search_function=search_channel("dest_dest_search"),
+            debounce=wr.AUTOCOMPLETE_DEBOUNCE_MS,
             placeholder="Enter destination location (e.g., Freedom Park, Charlotte, NC)",
             label="🏁 Destination address",
             key="dest_dest_search"
@@ -241,32 +297,17 @@ with tab_destination:
 
     if st.button("Generate Destination Route 🚀", key="dest_button"):
         if start_coords and destination_coords:
-            with st.spinner("Generating destination route..."):
+            with st.spinner("Generating destination route..."), traced_request("request.destination"):
                 route_coords, one_way_miles = wr.generate_destination_route(
                     start_coords=start_coords,
                     dest_coords=destination_coords,
                     elevation_preference="Normal",
                 )
 
+                st.session_state.dest_route = route_coords
+                st.session_state.dest_extended_route = None
                 if route_coords:
-                    elevation_data = wr.get_elevation_for_coords(route_coords)
-                    m = wr.plot_route_with_elevation(route_coords, elevation_data)
-
-                    route_length_miles = wr.calculate_route_distance(route_coords) / 1609.34
-                    map_height = min(800, 400 + int(route_length_miles * 20))
-
-                    html(m.get_root().render(), height=map_height, scrolling=True)
-
-                    wr.print_run_summary(route_coords, elevation_data, st)
-
-                    with st.expander("📈 Elevation Charts (click to expand)"):
-                        st.pyplot(wr.plot_elevation_area_chart(elevation_data))
-                        st.pyplot(wr.plot_cumulative_elevation_gain(elevation_data))
-                        st.pyplot(wr.plot_moving_average_grade(elevation_data))
-
-                    wr.save_route_as_gpx(route_coords, filename="Where2Run_route.gpx")
-                    with open("Where2Run_route.gpx", "rb") as file:
-                        st.download_button("Download GPX", data=file, file_name="Where2Run_route.gpx", key="dest_gpx_download_initial")
+                    show_route(route_coords, download_key="dest_gpx_download_initial")
 
                     st.session_state.dest_flow_stage = "post_initial"
                     st.session_state.dest_one_way_miles = one_way_miles
@@ -276,6 +317,8 @@ with tab_destination:
                     st.error("❌ Route could not be generated.")
         else:
             st.error("❌ Please enter both a valid starting location and destination.")
+    elif st.session_state.get("dest_route"):
+        show_route(st.session_state.dest_route, download_key="dest_gpx_download_initial")
 
     # Post-initial logic
     if st.session_state.dest_flow_stage == "post_initial":
@@ -289,29 +332,13 @@ with tab_destination:
             second_decision = st.radio("🔀 Do you want to 'extend' the route or make it a 'round trip'?", ["Extend", "Round Trip"], key="dest_second_decision_radio")
 
             if second_decision == "Round Trip":
-                rt_coords = wr.generate_destination_round_trip(
-                    st.session_state.dest_start_coords,
-                    st.session_state.dest_destination_coords
-                )
-                if rt_coords:
-                    elevation_data = wr.get_elevation_for_coords(rt_coords)
-                    m = wr.plot_route_with_elevation(rt_coords, elevation_data)
-
-                    route_length_miles = wr.calculate_route_distance(rt_coords) / 1609.34
-                    map_height = min(800, 400 + int(route_length_miles * 20))
-
-                    html(m.get_root().render(), height=map_height, scrolling=True)
-
-                    wr.print_run_summary(rt_coords, elevation_data, st)
-
-                    with st.expander("📈 Elevation Charts (click to expand)"):
-                        st.pyplot(wr.plot_elevation_area_chart(elevation_data))
-                        st.pyplot(wr.plot_cumulative_elevation_gain(elevation_data))
-                        st.pyplot(wr.plot_moving_average_grade(elevation_data))
-
-                    wr.save_route_as_gpx(rt_coords, filename="Where2Run_route.gpx")
-                    with open("Where2Run_route.gpx", "rb") as file:
-                        st.download_button("Download GPX", data=file, file_name="Where2Run_route.gpx", key="dest_gpx_download_roundtrip")
+                with traced_request("request.destination_round_trip"):
+                    rt_coords = wr.generate_destination_round_trip(
+                        st.session_state.dest_start_coords,
+                        st.session_state.dest_destination_coords
+                    )
+                    if rt_coords:
+                        show_route(rt_coords, download_key="dest_gpx_download_roundtrip")
 
             elif second_decision == "Extend":
                 target_miles = st.number_input(
@@ -323,28 +350,18 @@ with tab_destination:
                 )
 
                 if st.button("Generate Extended Destination Route 🚀", key="dest_extend_button"):
-                    extended_coords = wr.generate_extended_destination_route(
-                        st.session_state.dest_start_coords,
-                        st.session_state.dest_destination_coords,
-                        target_miles
-                    )
-                    if extended_coords:
-                        elevation_data = wr.get_elevation_for_coords(extended_coords)
-                        m = wr.plot_route_with_elevation(extended_coords, elevation_data)
-
-                        route_length_miles = wr.calculate_route_distance(extended_coords) / 1609.34
-                        map_height = min(800, 400 + int(route_length_miles * 20))
-
-                        html(m.get_root().render(), height=map_height, scrolling=True)
-
-                        wr.print_run_summary(extended_coords, elevation_data, st)
-
-                        with st.expander("📈 Elevation Charts (click to expand)"):
-                            st.pyplot(wr.plot_elevation_area_chart(elevation_data))
-                            st.pyplot(wr.plot_cumulative_elevation_gain(elevation_data))
-                            st.pyplot(wr.plot_moving_average_grade(elevation_data))
-
-                        wr.save_route_as_gpx(extended_coords, filename="Where2Run_route.gpx")
-                        with open("Where2Run_route.gpx", "rb") as file:
-                            st.download_button("Download GPX", data=file, file_name="Where2Run_route.gpx", key="dest_gpx_download_extended")
-                            
\ No newline at end of file
+                    with traced_request("request.extended_destination"):
+                        extended_coords = wr.generate_extended_destination_route(
+                            st.session_state.dest_start_coords,
+                            st.session_state.dest_destination_coords,
+                            target_miles
+                        )
+                        st.session_state.dest_extended_route = extended_coords
+                        if extended_coords:
+                            show_route(extended_coords, download_key="dest_gpx_download_extended")
+                elif st.session_state.get("dest_extended_route"):
+                    show_route(st.session_state.dest_extended_route, download_key="dest_gpx_download_extended")
+
+
+# 🔬 Rendered last so it shows the request that just ran
+show_debug_panel()
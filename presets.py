@@ -0,0 +1,231 @@
+# presets.py
+# 🧭 Preset route registry — every preset packed into one memory-mapped array with precomputed
+# metadata (length, bounds, start/end, ascent/descent) and a grid index over start points
+#
+# Build after adding or editing a CSV in "Preset Routes" (any CSV with Latitude/Longitude columns;
+# an Elevation/Altitude column in meters is kept, otherwise local DEM tiles are sampled if present):
+#     python presets.py
+# The pack lands in "Preset Routes/presets.{npy,json}". Without a pack the CSVs are parsed on
+# first use instead, so a fresh checkout still works.
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+import distance_utils as du
+from route import Route
+
+PRESET_DIR = "Preset Routes"
+PRESET_PACK_NAME = "presets"
+PRESET_CELL_DEG = 0.05              # start-point grid cells (~5 km)
+PRESET_RADIUS_MILES = 5.0           # default "near me" radius for the picker
+ELEVATION_COLUMNS = ("Elevation", "Altitude", "Ele")
+PRESET_LABELS = {
+    "bridges": "🌉 Bridges",
+}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def preset_name(filename):
+    # "bridges_preset_route.csv" → "bridges"
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    for suffix in ("_preset_route", "_preset", "_route"):
+        if stem.endswith(suffix):
+            return stem[: -len(suffix)]
+    return stem
+
+
+def preset_label(name):
+    return PRESET_LABELS.get(name, name.replace("_", " ").title())
+
+
+def load_preset_csv(path):
+    # (N, 3) float64 of lat, lon, elevation meters (NaN when the CSV has none)
+    with open(path, "r") as f:
+        header = [column.strip() for column in f.readline().split(",")]
+    try:
+        columns = [header.index("Latitude"), header.index("Longitude")]
+    except ValueError:
+        raise ValueError(f"❌ {path} has no Latitude/Longitude columns")
+    elevation_column = next((header.index(c) for c in ELEVATION_COLUMNS if c in header), None)
+    if elevation_column is not None:
+        columns.append(elevation_column)
+
+    data = np.loadtxt(path, delimiter=",", skiprows=1, usecols=columns, dtype=np.float64, ndmin=2)
+    points = np.full((len(data), 3), np.nan)
+    points[:, : data.shape[1]] = data
+    return points
+
+
+def _sample_dem(latlon):
+    from dem_elevation import get_dem_provider
+    provider = get_dem_provider()
+    if provider is None:
+        return None
+    elevation = provider.sample(latlon)
+    return None if np.isnan(elevation).any() else elevation
+
+
+def preset_metadata(name, points, offset=0):
+    route = Route(points[:, :2], elevation=None if np.isnan(points[:, 2]).any() else points[:, 2])
+    meta = {
+        "name": name,
+        "label": preset_label(name),
+        "offset": int(offset),
+        "count": len(route),
+        "length_m": round(float(route.length_m), 1),
+        "bounds": [round(float(v), 6) for v in route.bounds],
+        "start": [round(float(v), 6) for v in route[0]],
+        "end": [round(float(v), 6) for v in route[-1]],
+        "has_elevation": route.elevation is not None,
+        "ascent_ft": None,
+        "descent_ft": None,
+    }
+    if route.elevation is not None:
+        from elevation_analytics import analyze_elevation
+        profile = analyze_elevation(route)
+        meta["ascent_ft"] = round(profile.ascent_ft, 1)
+        meta["descent_ft"] = round(profile.descent_ft, 1)
+    return meta
+
+
+def _read_presets(preset_dir, sample_dem=False):
+    # name -> (N, 3) points for every CSV in the preset directory
+    presets = {}
+    for filename in sorted(os.listdir(preset_dir)):
+        if not filename.endswith(".csv"):
+            continue
+        points = load_preset_csv(os.path.join(preset_dir, filename))
+        if sample_dem and np.isnan(points[:, 2]).any():
+            elevation = _sample_dem(points[:, :2])
+            if elevation is not None:
+                points[:, 2] = elevation
+        presets[preset_name(filename)] = points
+    return presets
+
+
+# 🔍 Lookup side
+class PresetRegistry:
+    def __init__(self, points, presets, cell_deg=PRESET_CELL_DEG):
+        self.points = points                  # (N, 3) lat, lon, elevation — all presets back to back
+        self.presets = {meta["name"]: meta for meta in presets}
+        self.cell_deg = cell_deg
+        self._routes = {}
+        self._lock = threading.Lock()
+
+        self._names = list(self.presets)
+        self._starts = np.array([self.presets[name]["start"] for name in self._names], dtype=np.float64).reshape(-1, 2)
+        self._cells = {}
+        for i, (lat, lon) in enumerate(self._starts):
+            self._cells.setdefault(self._cell(lat, lon), []).append(i)
+
+    @classmethod
+    def load(cls, preset_dir=PRESET_DIR):
+        path = os.path.join(preset_dir, PRESET_PACK_NAME)
+        if os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json"):
+            with open(f"{path}.json", "r") as f:
+                meta = json.load(f)
+            packed = {preset["name"] for preset in meta["presets"]}
+            missing = [f for f in os.listdir(preset_dir) if f.endswith(".csv") and preset_name(f) not in packed]
+            if not missing:
+                return cls(np.load(f"{path}.npy", mmap_mode="r"), meta["presets"], cell_deg=meta["cell_deg"])
+            print(f"⚠️ Preset pack is missing {', '.join(missing)} — parsing CSVs (rebuild with: python presets.py)")
+        return cls.from_csv_dir(preset_dir)
+
+    @classmethod
+    def from_csv_dir(cls, preset_dir=PRESET_DIR, sample_dem=False):
+        presets = _read_presets(preset_dir, sample_dem=sample_dem) if os.path.isdir(preset_dir) else {}
+        metas, offset = [], 0
+        for name, points in presets.items():
+            metas.append(preset_metadata(name, points, offset))
+            offset += len(points)
+        points = np.concatenate(list(presets.values())) if presets else np.zeros((0, 3))
+        return cls(points, metas)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def names(self):
+        return list(self._names)
+
+    def metadata(self, name):
+        return self.presets[name]
+
+    def get(self, name):
+        route = self._routes.get(name)
+        if route is not None:
+            return route
+        if name not in self.presets:
+            raise KeyError(f"Unknown preset route: {name}")
+        with self._lock:
+            if name not in self._routes:
+                meta = self.presets[name]
+                points = np.array(self.points[meta["offset"]: meta["offset"] + meta["count"]])
+                self._routes[name] = Route(points[:, :2], elevation=points[:, 2] if meta["has_elevation"] else None)
+            return self._routes[name]
+
+    def nearby(self, lat, lon, radius_miles=PRESET_RADIUS_MILES):
+        # [(metadata, meters from (lat, lon) to the preset start)] within the radius, nearest first
+        radius_m = radius_miles * du.METERS_PER_MILE
+        dlat = radius_m / 111320
+        dlon = radius_m / (111320 * max(math.cos(math.radians(lat)), 1e-6))
+        lat_lo, lon_lo = self._cell(lat - dlat, lon - dlon)
+        lat_hi, lon_hi = self._cell(lat + dlat, lon + dlon)
+
+        candidates = [i for cy in range(lat_lo, lat_hi + 1) for cx in range(lon_lo, lon_hi + 1)
+                      for i in self._cells.get((cy, cx), ())]
+        if not candidates:
+            return []
+        starts = self._starts[candidates]
+        pairs = np.empty((len(candidates) * 2, 2))
+        pairs[0::2] = (lat, lon)
+        pairs[1::2] = starts
+        distances = du.haversine_segments(pairs)[0::2]
+
+        found = [(self.presets[self._names[i]], float(d)) for i, d in zip(candidates, distances) if d <= radius_m]
+        return sorted(found, key=lambda item: item[1])
+
+
+def get_preset_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PresetRegistry.load()
+            print(f"🧭 Preset registry: {len(_registry.names())} preset(s)")
+    return _registry
+
+
+# 🏗️ Build side
+def build_pack(preset_dir=PRESET_DIR, cell_deg=PRESET_CELL_DEG, sample_dem=True):
+    registry = PresetRegistry.from_csv_dir(preset_dir, sample_dem=sample_dem)
+    path = os.path.join(preset_dir, PRESET_PACK_NAME)
+    np.save(f"{path}.npy", np.ascontiguousarray(registry.points, dtype=np.float64))
+    with open(f"{path}.json", "w") as f:
+        json.dump({
+            "cell_deg": cell_deg,
+            "presets": [registry.presets[name] for name in registry.names()],
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }, f, indent=2)
+
+    for name in registry.names():
+        meta = registry.presets[name]
+        print(f"🧭 {meta['label']}: {meta['count']} points, {meta['length_m'] / du.METERS_PER_MILE:.2f} mi"
+              + (f", ⬆️ {meta['ascent_ft']:.0f} ft" if meta["has_elevation"] else ""))
+    print(f"✅ Preset pack built: {len(registry.names())} preset(s) → {path}.npy")
+    return len(registry.names())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack the preset route CSVs into an indexed binary registry.")
+    parser.add_argument("--dir", default=PRESET_DIR, help="directory holding the preset CSVs")
+    parser.add_argument("--cell-deg", type=float, default=PRESET_CELL_DEG, help="start-point grid cell size")
+    parser.add_argument("--no-dem", action="store_true", help="skip sampling local DEM tiles for elevation")
+    args = parser.parse_args()
+    build_pack(args.dir, args.cell_deg, sample_dem=not args.no_dem)
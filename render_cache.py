@@ -0,0 +1,198 @@
+# render_cache.py
+# 🖼️ Rendered-route cache — map HTML, chart PNGs, summary and GPX bytes keyed on the route's content hash
+
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import tracing
+
+MAX_ENTRIES = 32
+MAX_MEMORY_BYTES = 64 * 1024 * 1024
+RENDER_CACHE_DISK_DIR = None   # e.g. "cache/render" to keep renders across restarts
+MAX_DISK_BYTES = 512 * 1024 * 1024
+DISK_FORMAT = 1
+
+
+class RenderedRoute:
+    def __init__(self, key, map_html, map_height, summary, summary_markdown, charts, gpx_bytes):
+        self.key = key
+        self.map_html = map_html                  # str or None when elevation was unavailable
+        self.map_height = map_height
+        self.summary = summary                    # {"miles", "ascent_ft", "descent_ft", "net_change_ft"}
+        self.summary_markdown = summary_markdown
+        self.charts = charts                      # {chart name: PNG bytes}
+        self.gpx_bytes = gpx_bytes
+
+    @property
+    def complete(self):
+        # A render without elevation (map/charts skipped) is shown once but never cached
+        return self.map_html is not None
+
+    # 💾 Plain JSON on disk (bytes as base64) — reading an entry never runs code, unlike pickle
+    def to_json(self):
+        return json.dumps({
+            "format": DISK_FORMAT,
+            "key": self.key,
+            "map_html": self.map_html,
+            "map_height": self.map_height,
+            "summary": self.summary,
+            "summary_markdown": self.summary_markdown,
+            "charts": {name: base64.b64encode(png).decode("ascii") for name, png in self.charts.items()},
+            "gpx": base64.b64encode(self.gpx_bytes).decode("ascii") if self.gpx_bytes is not None else None,
+        }).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data, key):
+        # None unless the entry is in the current format and was stored under this key
+        record = json.loads(data)
+        if not isinstance(record, dict) or record.get("format") != DISK_FORMAT or record.get("key") != key:
+            return None
+        return cls(
+            key, record["map_html"], record["map_height"], record["summary"], record["summary_markdown"],
+            {name: base64.b64decode(png) for name, png in record["charts"].items()},
+            base64.b64decode(record["gpx"]) if record["gpx"] is not None else None,
+        )
+
+    @property
+    def nbytes(self):
+        return (
+            len(self.map_html or "")
+            + sum(len(png) for png in self.charts.values())
+            + len(self.gpx_bytes or b"")
+            + len(self.summary_markdown)
+        )
+
+
+class RenderCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_MEMORY_BYTES, disk_dir=RENDER_CACHE_DISK_DIR,
+                 max_disk_bytes=MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()     # _disk_bytes and the file swaps it counts
+        self._evict_lock = threading.Lock()    # one disk eviction sweep at a time
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(disk_dir) if entry.name.endswith(".json"))
+        else:
+            self._disk_bytes = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    # 💾 Disk tier — size-capped, least recently used first (mtime doubles as last-access time)
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                rendered = RenderedRoute.from_json(f.read(), key)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Could not read render cache entry: {e}")
+            rendered = None
+        if rendered is None:
+            self._remove_file(path)   # corrupt, foreign or stale-format entry
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return rendered
+
+    def _write_disk(self, rendered):
+        path = self._disk_path(rendered.key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        data = rendered.to_json()
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            with self._disk_lock:
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(data) - previous
+                over = self._disk_bytes > self.max_disk_bytes
+        except OSError as e:
+            print(f"⚠️ Could not write render cache entry: {e}")
+            return
+        if over:
+            self._evict_disk()
+
+    def _remove_file(self, path):
+        try:
+            with self._disk_lock:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = sorted(
+                (entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in entries:
+                with self._disk_lock:
+                    if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                        break
+                self._remove_file(entry.path)
+        finally:
+            self._evict_lock.release()
+
+    def _remember(self, rendered):
+        old = self._entries.pop(rendered.key, None)
+        if old:
+            self._bytes -= old.nbytes
+        self._entries[rendered.key] = rendered
+        self._bytes += rendered.nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get(self, key):
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                tracing.incr("cache.hit")
+                return rendered
+
+        rendered = self._read_disk(key) if self.disk_dir else None
+        if rendered is not None:
+            with self._lock:
+                self._remember(rendered)
+                self.hits += 1
+            tracing.incr("cache.hit")
+            return rendered
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, rendered):
+        with self._lock:
+            self._remember(rendered)
+        if self.disk_dir:
+            self._write_disk(rendered)
+
+    def get_or_render(self, key, render_fn):
+        rendered = self.get(key)
+        if rendered is None:
+            rendered = render_fn()
+            if rendered.complete:
+                self.put(rendered)
+        return rendered
@@ -0,0 +1,154 @@
+# route.py
+# 🧭 Route — contiguous float64 (lat, lon) storage shared by generation, elevation, plotting and GPX
+
+import hashlib
+from functools import cached_property
+
+import numpy as np
+
+import distance_utils as du
+
+
+class Route:
+    # Behaves like a sequence of (lat, lon) tuples, so older list-based callers keep working
+
+    def __init__(self, latlon, elevation=None):
+        latlon = np.ascontiguousarray(latlon, dtype=np.float64)
+        if latlon.size == 0:
+            latlon = latlon.reshape(0, 2)
+        if latlon.ndim != 2 or latlon.shape[1] != 2:
+            raise ValueError(f"❌ Route expects an (N, 2) array of (lat, lon), got shape {latlon.shape}")
+        if elevation is not None:
+            elevation = np.ascontiguousarray(elevation, dtype=np.float64)
+            if len(elevation) != len(latlon):
+                raise ValueError(f"❌ Elevation length {len(elevation)} does not match {len(latlon)} points")
+        self.latlon = latlon
+        self.elevation = elevation   # meters, or None until an elevation source fills it in
+
+    # 🏗️ Constructors
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 2)))
+
+    @classmethod
+    def from_coords(cls, coords):
+        # Accepts a Route (returned as-is), a list of (lat, lon) tuples or an (N, 2) array
+        if isinstance(coords, Route):
+            return coords
+        if coords is None:
+            return cls.empty()
+        return cls(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+
+    @classmethod
+    def from_lonlat(cls, points):
+        # ORS ordering: [[lon, lat], ...] or [[lon, lat, ele], ...]
+        arr = np.asarray(points, dtype=np.float64)
+        if arr.size == 0:
+            return cls.empty()
+        elevation = arr[:, 2] if arr.shape[1] > 2 else None
+        return cls(arr[:, 1::-1], elevation)
+
+    @classmethod
+    def from_ors_geojson(cls, response):
+        return cls.from_lonlat(response["features"][0]["geometry"]["coordinates"])
+
+    @classmethod
+    def from_elevation_data(cls, elevation_data):
+        # ORS elevation_line response ({"geometry": {"coordinates": [[lon, lat, ele], ...]}})
+        if isinstance(elevation_data, Route):
+            return elevation_data
+        if not elevation_data or "geometry" not in elevation_data:
+            return None
+        points = [pt for pt in elevation_data["geometry"]["coordinates"] if len(pt) > 2]
+        return cls.from_lonlat(points) if points else None
+
+    @classmethod
+    def concat(cls, segments):
+        # One allocation for the whole route instead of repeated list "+"
+        routes = [cls.from_coords(seg) for seg in segments if seg is not None and len(seg)]
+        if not routes:
+            return cls.empty()
+        if len(routes) == 1:
+            return routes[0]
+        latlon = np.concatenate([r.latlon for r in routes])
+        elevation = None
+        if all(r.elevation is not None for r in routes):
+            elevation = np.concatenate([r.elevation for r in routes])
+        combined = cls(latlon, elevation)
+        combined.parts = tuple(routes)   # lets per-leg work (e.g. elevation) be stitched instead of redone
+        return combined
+
+    def with_elevation(self, elevation):
+        return Route(self.latlon, elevation)
+
+    # 👀 Zero-copy views
+    @property
+    def lat(self):
+        return self.latlon[:, 0]
+
+    @property
+    def lon(self):
+        return self.latlon[:, 1]
+
+    @property
+    def lonlat(self):
+        return self.latlon[:, ::-1]
+
+    # 📏 Memoized derived metrics
+    @cached_property
+    def cumulative_m(self):
+        return du.cumulative_distance(self.latlon)
+
+    @property
+    def length_m(self):
+        return float(self.cumulative_m[-1]) if len(self) else 0.0
+
+    @property
+    def length_miles(self):
+        return self.length_m / du.METERS_PER_MILE
+
+    @cached_property
+    def fingerprint(self):
+        # Content hash of the geometry — keys the render cache
+        return hashlib.blake2b(self.latlon.tobytes(), digest_size=16).hexdigest()
+
+    @cached_property
+    def bounds(self):
+        # (south, west, north, east)
+        if not len(self):
+            return None
+        south, west = self.latlon.min(axis=0)
+        north, east = self.latlon.max(axis=0)
+        return float(south), float(west), float(north), float(east)
+
+    # 📜 Sequence protocol
+    def __len__(self):
+        return len(self.latlon)
+
+    def __bool__(self):
+        return len(self.latlon) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            elevation = self.elevation[index] if self.elevation is not None else None
+            return Route(self.latlon[index], elevation)
+        lat, lon = self.latlon[index]
+        return float(lat), float(lon)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __add__(self, other):
+        return Route.concat([self, other])
+
+    def __radd__(self, other):
+        return Route.concat([other, self])
+
+    def __array__(self, dtype=None, copy=None):
+        return self.latlon if dtype is None else self.latlon.astype(dtype)
+
+    def tolist(self):
+        return list(zip(self.latlon[:, 0].tolist(), self.latlon[:, 1].tolist()))
+
+    def __repr__(self):
+        return f"Route({len(self)} points, {self.length_miles:.2f} mi{', elevation' if self.elevation is not None else ''})"
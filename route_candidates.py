@@ -0,0 +1,82 @@
+# route_candidates.py
+# 🚀 Concurrent candidate routing — fan out seeds/headings, keep the first route in range
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import tracing
+
+MAX_CONCURRENT_CANDIDATES = 4   # per-request cap (keeps us under the ORS rate limit)
+CANDIDATE_DEADLINE_S = 45       # stop waiting and return the best route so far
+
+
+# 🏁 Run build_candidate(params) for every params entry, at most max_concurrency at a time.
+# build_candidate returns (coords, total_meters) or None. Returns (coords, total_meters) of the
+# lowest-index candidate inside allowed_range, else the closest one to target_meters, else (None, None).
+# It returns as soon as that winner is settled — every earlier candidate has missed — and cancels the
+# rest, so the result doesn't depend on which response happens to arrive first.
+def pick_first_acceptable(build_candidate, candidate_params, allowed_range, target_meters,
+                          max_concurrency=MAX_CONCURRENT_CANDIDATES, deadline_s=CANDIDATE_DEADLINE_S):
+    if not candidate_params:
+        return None, None
+
+    best_coords, best_meters, best_idx = None, None, None
+    accepted = {}   # idx -> (coords, total_meters)
+    missed = set()  # finished out of range, failed or empty
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(candidate_params))),
+        thread_name_prefix="where2run-candidate"
+    )
+    def traced_candidate(params):
+        with tracing.span("candidate"):
+            return build_candidate(params)
+
+    traced_candidate = tracing.bind(traced_candidate)
+    pending = {executor.submit(traced_candidate, params): idx for idx, params in enumerate(candidate_params)}
+
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                print("⏱️ Candidate deadline reached — using best route so far.")
+                break
+
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ Candidate {idx + 1} failed:", e)
+                    missed.add(idx)
+                    continue
+                if not result or not result[0]:
+                    missed.add(idx)
+                    continue
+
+                coords, total_meters = result
+                if allowed_range[0] <= total_meters <= allowed_range[1]:
+                    accepted[idx] = result
+                    continue
+                missed.add(idx)
+                # Lower attempt numbers win ties so results stay stable for a fixed seed list
+                if (best_meters is None or abs(total_meters - target_meters) < abs(best_meters - target_meters)
+                        or (abs(total_meters - target_meters) == abs(best_meters - target_meters) and idx < best_idx)):
+                    best_coords, best_meters, best_idx = coords, total_meters, idx
+
+            # Settled once every candidate before the lowest accepted one has missed
+            first_open = next(idx for idx in range(len(candidate_params) + 1) if idx not in missed)
+            if first_open in accepted:
+                print(f"✅ Candidate {first_open + 1} within acceptable range.")
+                return accepted[first_open]
+    finally:
+        # Drop anything not started yet; in-flight requests finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if accepted:
+        idx = min(accepted)
+        print(f"✅ Candidate {idx + 1} within acceptable range.")
+        return accepted[idx]
+    return best_coords, best_meters
@@ -0,0 +1,305 @@
+# route_library.py
+# 📚 Precomputed route library — K diverse loops per (start cell, distance bucket, environment),
+# generated ahead of time with the regular loop generator and served without any ORS calls
+#
+# Fill it for popular start areas (needs the usual API keys in .streamlit/secrets.toml):
+#     python route_library.py --start 35.1935,-80.8436 --start 35.2262,-80.8469 --miles 3-13
+#     python route_library.py --starts-file popular_starts.csv --environment none --environment trail
+# Rows land in cache/route_library.sqlite3; the loop generator checks it before generating live.
+
+import argparse
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import canonical
+import distance_utils as du
+from environment_probe import normalize_environment
+from route import Route
+
+ROUTE_LIBRARY_PATH = "cache/route_library.sqlite3"
+BUCKET_MILES = 0.5                  # distance buckets
+CANDIDATES_PER_KEY = 4              # K loops kept per (cell, bucket, environment)
+MAX_START_OFFSET_M = 75             # a library loop may start this far from the (snapped) start
+MAX_SIMILARITY = 0.6                # reject candidates sharing more of their footprint than this
+SIMILARITY_CELL_METERS = 50
+TOLERANCE_M = 1207                  # same window the live generator accepts
+MAX_TRIES_PER_CANDIDATE = 3
+DEFAULT_MILES = (3, 13)
+
+_library = None
+_library_loaded = False
+_library_lock = threading.Lock()
+
+
+def environment_key(route_environment):
+    # Same vocabulary as the environment modes, whatever label the UI or CLI used
+    return normalize_environment(route_environment) or "none"
+
+
+def distance_bucket(meters):
+    return int(round(meters / du.METERS_PER_MILE / BUCKET_MILES))
+
+
+def cell_key(lat, lon):
+    row, col = canonical.grid_cell(lat, lon, canonical.SNAP_GRID_METERS)
+    return f"{row}:{col}"
+
+
+def neighbor_cells(lat, lon, radius_m=MAX_START_OFFSET_M):
+    # Cells of every point on a small grid around (lat, lon) — covers the start-offset radius
+    dlat = radius_m / 111320
+    dlon = radius_m / (111320 * max(math.cos(math.radians(lat)), 1e-6))
+    steps = (-1.0, -0.5, 0.0, 0.5, 1.0)
+    return sorted({cell_key(lat + i * dlat, lon + j * dlon) for i in steps for j in steps})
+
+
+def footprint(latlon, cell_m=SIMILARITY_CELL_METERS):
+    # Set of ~cell_m grid cells a route passes through
+    latlon = np.asarray(latlon, dtype=np.float64)
+    lat0 = math.radians(float(latlon[:, 0].mean()))
+    rows = np.floor(latlon[:, 0] * 111320 / cell_m).astype(np.int64)
+    cols = np.floor(latlon[:, 1] * 111320 * math.cos(lat0) / cell_m).astype(np.int64)
+    return set(zip(rows.tolist(), cols.tolist()))
+
+
+def similarity(a, b):
+    return len(a & b) / max(len(a | b), 1)
+
+
+def _pack_geometry(latlon):
+    return zlib.compress(np.round(np.asarray(latlon) * 1e6).astype("<i4").tobytes())
+
+
+def _unpack_geometry(blob):
+    return np.frombuffer(zlib.decompress(blob), dtype="<i4").reshape(-1, 2) / 1e6
+
+
+class RouteLibrary:
+    def __init__(self, db_path=ROUTE_LIBRARY_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            " id INTEGER PRIMARY KEY,"
+            " cell TEXT NOT NULL,"
+            " environment TEXT NOT NULL,"
+            " bucket INTEGER NOT NULL,"
+            " start_lat REAL NOT NULL,"
+            " start_lon REAL NOT NULL,"
+            " length_m REAL NOT NULL,"
+            " ascent_ft REAL,"
+            " descent_ft REAL,"
+            " seed INTEGER,"
+            " fingerprint TEXT NOT NULL UNIQUE,"
+            " geometry BLOB NOT NULL,"
+            " elevation BLOB,"
+            " created_at REAL NOT NULL,"
+            " served INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS routes_lookup ON routes (cell, environment, bucket)")
+        conn.commit()
+
+    # One connection per thread — Streamlit serves each session on its own thread
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def count(self, start, environment, bucket):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM routes WHERE cell = ? AND environment = ? AND bucket = ?",
+            (cell_key(*start), environment_key(environment), bucket)
+        ).fetchone()
+        return row[0]
+
+    def add(self, start, environment, route, seed=None):
+        # False when the loop is a near-copy of one already stored for the same key
+        route = Route.from_coords(route)
+        if len(route) < 2:
+            return False
+        environment = environment_key(environment)
+        cell, bucket = cell_key(*start), distance_bucket(route.length_m)
+
+        existing = self._conn().execute(
+            "SELECT geometry FROM routes WHERE cell = ? AND environment = ? AND bucket = ?",
+            (cell, environment, bucket)
+        ).fetchall()
+        candidate = footprint(route.latlon)
+        if any(similarity(candidate, footprint(_unpack_geometry(blob))) > MAX_SIMILARITY for blob, in existing):
+            return False
+
+        ascent_ft = descent_ft = None
+        if route.elevation is not None:
+            from elevation_analytics import analyze_elevation
+            profile = analyze_elevation(route)
+            ascent_ft, descent_ft = profile.ascent_ft, profile.descent_ft
+
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO routes (cell, environment, bucket, start_lat, start_lon, length_m,"
+                " ascent_ft, descent_ft, seed, fingerprint, geometry, elevation, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (cell, environment, bucket, route[0][0], route[0][1], float(route.length_m),
+                 ascent_ft, descent_ft, seed, route.fingerprint, _pack_geometry(route.latlon),
+                 zlib.compress(route.elevation.astype("<f4").tobytes()) if route.elevation is not None else None,
+                 time.time())
+            )
+        return cur.rowcount > 0
+
+    def find(self, start, target_m, environment=None, tolerance_m=TOLERANCE_M):
+        # Least-served loop from a nearby start whose length fits the window (closest length breaks ties)
+        cells = neighbor_cells(*start)
+        lo, hi = distance_bucket(target_m - tolerance_m), distance_bucket(target_m + tolerance_m)
+        rows = self._conn().execute(
+            f"SELECT id, start_lat, start_lon, length_m, served FROM routes"
+            f" WHERE cell IN ({', '.join('?' * len(cells))}) AND environment = ? AND bucket BETWEEN ? AND ?",
+            (*cells, environment_key(environment), lo, hi)
+        ).fetchall()
+
+        fitting = []
+        for route_id, lat, lon, length_m, served in rows:
+            if abs(length_m - target_m) > tolerance_m:
+                continue
+            offset = du.haversine_segments([start, (lat, lon)])[0]
+            if offset <= MAX_START_OFFSET_M:
+                fitting.append((served, abs(length_m - target_m), route_id))
+        if not fitting:
+            self.misses += 1
+            return None
+
+        _, _, route_id = min(fitting)
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE routes SET served = served + 1 WHERE id = ?", (route_id,))
+        geometry, elevation = conn.execute(
+            "SELECT geometry, elevation FROM routes WHERE id = ?", (route_id,)
+        ).fetchone()
+        self.hits += 1
+        latlon = _unpack_geometry(geometry)
+        elevation = np.frombuffer(zlib.decompress(elevation), dtype="<f4").astype(np.float64) if elevation else None
+        return Route(latlon, elevation)
+
+    def stats(self):
+        total, keys = self._conn().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT cell || environment || bucket) FROM routes"
+        ).fetchone()
+        return {"routes": total, "keys": keys, "hits": self.hits, "misses": self.misses}
+
+
+def get_route_library(db_path=ROUTE_LIBRARY_PATH):
+    # Loaded lazily once per process; no library file just means "always generate live"
+    global _library, _library_loaded
+    if _library_loaded:
+        return _library
+    with _library_lock:
+        if not _library_loaded:
+            if os.path.exists(db_path):
+                try:
+                    _library = RouteLibrary(db_path)
+                    print(f"📚 Route library: {_library.stats()['routes']} precomputed loops")
+                except Exception as e:
+                    print(f"⚠️ Could not open route library: {e}")
+            _library_loaded = True
+    return _library
+
+
+# 🏗️ Fill side — generate(start, miles, environment, seed) → Route, elevate(route) → Route with elevation
+def fill(library, generate, elevate, start, miles_list, environments=(None,), k=CANDIDATES_PER_KEY):
+    start = canonical.snap_coords(start)
+    added = 0
+    for environment in environments:
+        for miles in miles_list:
+            bucket = distance_bucket(miles * du.METERS_PER_MILE)
+            tries = 0
+            while library.count(start, environment, bucket) < k and tries < k * MAX_TRIES_PER_CANDIDATE:
+                seed = canonical.request_seed("library", start, miles, environment_key(environment), tries)
+                tries += 1
+                try:
+                    route = generate(start, miles, environment, seed)
+                except Exception as e:
+                    print(f"⚠️ Library generation failed ({miles} mi, {environment_key(environment)}): {e}")
+                    continue
+                if not route or abs(route.length_m - miles * du.METERS_PER_MILE) > TOLERANCE_M:
+                    continue
+                if distance_bucket(route.length_m) != bucket:
+                    continue   # belongs to a neighboring bucket; that bucket gets its own candidates
+                route = elevate(route) or route
+                added += library.add(start, environment, route, seed=seed)
+            print(f"📚 {start} · {miles} mi · {environment_key(environment)}: "
+                  f"{library.count(start, environment, bucket)} loop(s)")
+    return added
+
+
+_fill_pool = None
+_fill_pool_lock = threading.Lock()
+
+
+def fill_in_background(library, generate, elevate, start, miles_list, environments=(None,), k=CANDIDATES_PER_KEY):
+    # One low-priority worker, so background fills never compete with each other for ORS quota
+    global _fill_pool
+    with _fill_pool_lock:
+        if _fill_pool is None:
+            _fill_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="where2run-library")
+    return _fill_pool.submit(fill, library, generate, elevate, start, miles_list, environments, k)
+
+
+def _parse_miles(text):
+    if "-" in text:
+        lo, hi = (float(v) for v in text.split("-", 1))
+        return [lo + i * BUCKET_MILES * 2 for i in range(int((hi - lo) / (BUCKET_MILES * 2)) + 1)]
+    return [float(v) for v in text.split(",")]
+
+
+def _read_starts(path):
+    with open(path, "r") as f:
+        header = [column.strip() for column in f.readline().split(",")]
+    columns = (header.index("Latitude"), header.index("Longitude"))
+    return [tuple(row) for row in np.loadtxt(path, delimiter=",", skiprows=1, usecols=columns, ndmin=2)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate diverse loops for popular start areas.")
+    parser.add_argument("--start", action="append", default=[], help="LAT,LON (repeatable)")
+    parser.add_argument("--starts-file", help="CSV with Latitude/Longitude columns")
+    parser.add_argument("--miles", default=f"{DEFAULT_MILES[0]}-{DEFAULT_MILES[1]}",
+                        help="range LO-HI (whole miles) or a comma list")
+    parser.add_argument("--environment", action="append", help="none, trail, scenic, shaded, suburban, urban")
+    parser.add_argument("--k", type=int, default=CANDIDATES_PER_KEY, help="loops per start/distance/environment")
+    parser.add_argument("--db", default=ROUTE_LIBRARY_PATH)
+    args = parser.parse_args()
+
+    import Where2Run_backend as wr
+
+    starts = [tuple(float(v) for v in s.split(",")) for s in args.start]
+    if args.starts_file:
+        starts += _read_starts(args.starts_file)
+    if not starts:
+        parser.error("give at least one --start or --starts-file")
+    environments = [normalize_environment(e) for e in (args.environment or ["none"])]
+
+    def generate(start, miles, environment, seed):
+        # An explicit seed makes the generator skip the library and generate live
+        return wr.generate_loop_route_with_preset_retry(start, miles, route_environment=environment, seed=seed)
+
+    library = RouteLibrary(args.db)
+    added = sum(fill(library, generate, wr.get_elevation_for_coords, start, _parse_miles(args.miles),
+                     environments, args.k) for start in starts)
+    print(f"✅ Added {added} loop(s) → {args.db} ({library.stats()['routes']} total)")
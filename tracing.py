@@ -0,0 +1,292 @@
+# tracing.py
+# 🔬 Request tracing — nested spans with wall/CPU time, counters (attempts, cache hits, bytes) and
+# attributes. Finished traces go to a structured log line, an optional OTLP/JSON file, and an
+# in-memory ring buffer for the Home debug panel. Outside a trace every call is a cheap no-op.
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_EXPORT_PATH = None    # e.g. "cache/traces.jsonl" — one OTLP/JSON document per trace
+RECENT_TRACE_COUNT = 20
+SERVICE_NAME = "where2run"
+
+logger = logging.getLogger("where2run.trace")
+
+_current_span = contextvars.ContextVar("where2run_span", default=None)
+_recent = deque(maxlen=RECENT_TRACE_COUNT)
+_recent_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attrs", "counters",
+                 "start_ns", "end_ns", "_wall_start", "_cpu_start", "wall_ms", "cpu_ms", "thread")
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attrs = dict(attrs)
+        self.counters = {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.thread = threading.current_thread().name
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self.wall_ms = None
+        self.cpu_ms = None
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+    def incr(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def finish(self, error=None):
+        self.wall_ms = (time.perf_counter() - self._wall_start) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu_start) * 1000
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.attrs["error"] = f"{type(error).__name__}: {error}"
+        self.trace.add(self)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread": self.thread,
+            "wall_ms": round(self.wall_ms, 3) if self.wall_ms is not None else None,
+            "cpu_ms": round(self.cpu_ms, 3) if self.cpu_ms is not None else None,
+            "attrs": self.attrs,
+            "counters": self.counters,
+        }
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+    def incr(self, key, n=1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.started_at = time.time()
+        self.spans = []          # finished spans, in finish order
+        self.root = None
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def wall_ms(self):
+        return self.root.wall_ms if self.root and self.root.wall_ms is not None else None
+
+    def summary(self):
+        # One row per span name: calls, wall/CPU totals and summed counters
+        rows = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault(span.name, {"span": span.name, "calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            row["calls"] += 1
+            row["wall_ms"] += span.wall_ms
+            row["cpu_ms"] += span.cpu_ms
+            for key, value in span.counters.items():
+                row[key] = row.get(key, 0) + value
+        for row in rows.values():
+            row["wall_ms"] = round(row["wall_ms"], 1)
+            row["cpu_ms"] = round(row["cpu_ms"], 1)
+        return sorted(rows.values(), key=lambda row: -row["wall_ms"])
+
+    def tree(self):
+        # Indented text view, children in start order
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        children = {}
+        for span in spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        lines = []
+
+        def walk(parent_id, depth):
+            for span in children.get(parent_id, []):
+                extras = " ".join(f"{k}={v}" for k, v in {**span.attrs, **span.counters}.items())
+                lines.append(f"{'  ' * depth}{span.name}  {span.wall_ms:.1f} ms wall / {span.cpu_ms:.1f} ms cpu  {extras}".rstrip())
+                walk(span.span_id, depth + 1)
+
+        walk(None, 0)
+        return "\n".join(lines)
+
+    def to_otlp(self):
+        def attributes(values):
+            out = []
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    out.append({"key": key, "value": {"boolValue": value}})
+                elif isinstance(value, int):
+                    out.append({"key": key, "value": {"intValue": str(value)}})
+                elif isinstance(value, float):
+                    out.append({"key": key, "value": {"doubleValue": value}})
+                else:
+                    out.append({"key": key, "value": {"stringValue": str(value)}})
+            return out
+
+        with self._lock:
+            spans = list(self.spans)
+        return {"resourceSpans": [{
+            "resource": {"attributes": attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": "where2run.tracing"},
+                "spans": [{
+                    "traceId": self.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": attributes({
+                        **span.attrs,
+                        **span.counters,
+                        "cpu_ms": round(span.cpu_ms, 3),
+                        "thread.name": span.thread,
+                    }),
+                } for span in spans],
+            }],
+        }]}
+
+
+# 🧵 Span API
+@contextmanager
+def span(name, **attrs):
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    current = Span(parent.trace, name, parent.span_id, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(error=e)
+        raise
+    else:
+        current.finish()
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name, **attrs):
+    # Starts a new trace (or nests as a span when one is already active)
+    if _current_span.get() is not None:
+        with span(name, **attrs) as current:
+            yield current
+        return
+
+    new_trace = Trace(name)
+    root = Span(new_trace, name, None, attrs)
+    new_trace.root = root
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.finish(error=e)
+        raise
+    else:
+        root.finish()
+    finally:
+        _current_span.reset(token)
+        _export(new_trace)
+
+
+def traced(name):
+    # Decorator form of span()
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def incr(key, n=1):
+    current = _current_span.get()
+    if current is not None:
+        current.incr(key, n)
+
+
+def set_attr(key, value):
+    current = _current_span.get()
+    if current is not None:
+        current.set(key, value)
+
+
+def bind(fn):
+    # Carry the caller's span into executor threads so worker spans nest under it
+    parent = _current_span.get()
+    if parent is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return wrapper
+
+
+# 📤 Export
+def _export(finished):
+    with _recent_lock:
+        _recent.append(finished)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            "trace_id": finished.trace_id,
+            "name": finished.name,
+            "wall_ms": round(finished.wall_ms or 0.0, 1),
+            "spans": finished.summary(),
+        }))
+    if TRACE_EXPORT_PATH:
+        try:
+            if os.path.dirname(TRACE_EXPORT_PATH):
+                os.makedirs(os.path.dirname(TRACE_EXPORT_PATH), exist_ok=True)
+            with open(TRACE_EXPORT_PATH, "a") as f:
+                f.write(json.dumps(finished.to_otlp()) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write trace export: {e}")
+
+
+def recent_traces():
+    with _recent_lock:
+        return list(reversed(_recent))
+
+
+def last_trace():
+    with _recent_lock:
+        return _recent[-1] if _recent else None